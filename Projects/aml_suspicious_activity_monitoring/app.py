@@ -1,24 +1,14 @@
 import streamlit as st
-import pandas as pd
 import numpy as np
 from pathlib import Path
 
 st.set_page_config(page_title="AML Suspicious Activity Monitor", layout="wide")
 
 DATA_DIR = Path("data")
-TX_PATH = DATA_DIR/"transactions.csv"
-CR_PATH = DATA_DIR/"country_risk.csv"
+MODEL_PATH = Path("models")/"iforest.joblib"
 
 st.title("🚨 AML Suspicious Activity Monitor")
 
-@st.cache_data
-def load_data():
-    tx = pd.read_csv(TX_PATH)
-    cr = pd.read_csv(CR_PATH)
-    return tx, cr
-
-tx, cr = load_data()
-
 # Load feature & detection utilities from local src
 import importlib.util, sys
 def import_from_path(module_name, path):
@@ -27,14 +17,26 @@ def import_from_path(module_name, path):
     spec.loader.exec_module(mod)
     return mod
 
+storage_mod = import_from_path("storage", "src/storage.py")
 feats_mod = import_from_path("feature_engineering", "src/feature_engineering.py")
 detect_mod = import_from_path("detect_anomalies", "src/detect_anomalies.py")
-
-with st.spinner("Building features & computing anomaly scores..."):
+registry_mod = import_from_path("model_registry", "src/model_registry.py")
+index_mod = import_from_path("score_index", "src/score_index.py")
+
+@st.cache_resource
+def load_index():
+    # built once per server process: widget changes below only query the index
+    tx = storage_mod.load_transactions(DATA_DIR)
+    cr = storage_mod.load_country_risk(DATA_DIR)
     feats = feats_mod.build_features(tx, cr)
     scored = detect_mod.apply_rules(feats)
-    scored["iforest_score"] = detect_mod.isolation_forest_scores(scored)
-    df = detect_mod.combine_scores(scored)
+    if not MODEL_PATH.exists():
+        registry_mod.save_model(registry_mod.fit_model(feats), MODEL_PATH)
+    scored["iforest_score"] = registry_mod.score_model(registry_mod.load_model(MODEL_PATH), scored)
+    return index_mod.ScoreIndex(scored)
+
+with st.spinner("Building features & computing anomaly scores..."):
+    index = load_index()
 
 st.sidebar.header("Filters & Thresholds")
 k = st.sidebar.slider("Top K rows", min_value=10, max_value=500, value=100, step=10)
@@ -42,29 +44,13 @@ min_rule = st.sidebar.slider("Min Rule Score", 0.0, 10.0, 0.0, 0.5)
 min_ifor = st.sidebar.slider("Min IsolationForest Score", 0.0, 2.5, 0.0, 0.05)
 alpha = st.sidebar.slider("Hybrid weight (model vs rules)", 0.0, 1.0, 0.6, 0.05)
 
-# Recompute hybrid if alpha changed
-df["hybrid_score"] = alpha*df["iforest_score"] + (1-alpha)*df["rule_score"]
-
 # Column filters
-countries = sorted(df["counterparty_country"].dropna().unique().tolist())
-sel_countries = st.sidebar.multiselect("Counterparty Countries", countries, default=[])
-
-channels = sorted(df["channel"].dropna().unique().tolist())
-sel_channels = st.sidebar.multiselect("Channels", channels, default=[])
-
-directions = sorted(df["direction"].dropna().unique().tolist())
-sel_dirs = st.sidebar.multiselect("Direction", directions, default=[])
-
-filtered = df.copy()
-if sel_countries:
-    filtered = filtered[filtered["counterparty_country"].isin(sel_countries)]
-if sel_channels:
-    filtered = filtered[filtered["channel"].isin(sel_channels)]
-if sel_dirs:
-    filtered = filtered[filtered["direction"].isin(sel_dirs)]
+sel_countries = st.sidebar.multiselect("Counterparty Countries", index.categories["counterparty_country"], default=[])
+sel_channels = st.sidebar.multiselect("Channels", index.categories["channel"], default=[])
+sel_dirs = st.sidebar.multiselect("Direction", index.categories["direction"], default=[])
 
-filtered = filtered[(filtered["rule_score"] >= min_rule) & (filtered["iforest_score"] >= min_ifor)]
-top = filtered.sort_values("hybrid_score", ascending=False).head(k)
+top = index.top_k(k, alpha=alpha, min_rule=min_rule, min_iforest=min_ifor,
+                  counterparty_country=sel_countries, channel=sel_channels, direction=sel_dirs)
 
 st.subheader("Top Flagged Transactions")
 show_cols = ["tx_id","client_id","ts","amount_usd","channel","direction","counterparty_country",
@@ -73,8 +59,8 @@ st.dataframe(top[show_cols], use_container_width=True)
 
 # Client profile drilldown
 st.subheader("Client Profile")
-cid = st.selectbox("Select Client ID", sorted(df["client_id"].unique().tolist()))
-client_df = df[df["client_id"]==cid].sort_values("ts")
+cid = st.selectbox("Select Client ID", index.client_ids.tolist())
+client_df = index.client_frame(cid)
 col1, col2, col3 = st.columns(3)
 col1.metric("Tx count (30D)", int(client_df["roll_cnt_30D"].tail(1).values[0]))
 col1.metric("Avg Tx (30D)", int(client_df["roll_cnt_30D"].mean()))
@@ -0,0 +1,80 @@
+"""
+bench_pipeline_runner.py
+------------------------
+Shard count vs wall time for `src.pipeline_runner.run_pipeline` on synthetic
+transactions, against the serial main.py path (features -> rules ->
+IsolationForest -> hybrid score in one process).
+
+The IsolationForest is fitted once by the serial run and reused, so every
+run only loads and scores. Each sharded run (one worker per shard by
+default) must return exactly the serial frame. It is reported with
+throughput, speed-up over the serial path and the summed in-worker time.
+Speed-up is bounded by the cores available (printed first).
+
+USAGE
+-----
+python benchmarks/bench_pipeline_runner.py --rows 2000000 --clients 50000 --shards 1 2 4
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from benchmarks.bench_storage import synthetic_transactions
+from src.detect_anomalies import apply_rules, combine_scores
+from src.feature_engineering import build_features
+from src.generate_synthetic_data import build_country_risk
+from src.model_registry import load_or_fit, score_model
+from src.pipeline_runner import run_pipeline
+from src.storage import to_typed
+
+
+def serial_pipeline(tx, country_risk, model_path, alpha=0.6):
+    """main.py, minus the I/O."""
+    feats = build_features(tx, country_risk)
+    scored = apply_rules(feats)
+    scored["iforest_score"] = score_model(load_or_fit(feats, model_path), scored)
+    return combine_scores(scored, alpha=alpha)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=2_000_000)
+    ap.add_argument("--clients", type=int, default=50_000)
+    ap.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    ap.add_argument("--workers", type=int, default=None, help="Default: one per shard")
+    ap.add_argument("--alpha", type=float, default=0.6)
+    args = ap.parse_args()
+
+    tx = to_typed(synthetic_transactions(args.rows, args.clients).reset_index(drop=True))
+    cr = build_country_risk()
+    print(f"{len(tx):,} transactions, {args.clients:,} clients, {os.cpu_count()} CPU(s)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = Path(tmp) / "iforest.joblib"
+        serial_pipeline(tx.head(10_000), cr, model_path, alpha=args.alpha)  # fit outside the timings
+
+        t0 = time.perf_counter()
+        ref = serial_pipeline(tx, cr, model_path, alpha=args.alpha)
+        serial_s = time.perf_counter() - t0
+        print(f"{'run':<12} {'workers':>7} {'wall s':>8} {'rows/s':>11} {'speed-up':>9} {'worker s':>9}  parity")
+        print(f"{'serial':<12} {1:>7} {serial_s:8.2f} {len(tx) / serial_s:11,.0f} {1.0:9.2f} {'':>9}  -")
+
+        for n_shards in args.shards:
+            workers = args.workers or n_shards
+            t0 = time.perf_counter()
+            final, timings = run_pipeline(tx, cr, n_shards=n_shards, workers=workers,
+                                          model_path=model_path, alpha=args.alpha)
+            wall_s = time.perf_counter() - t0
+            pd.testing.assert_frame_equal(final, ref)
+            print(f"{f'{n_shards} shards':<12} {workers:>7} {wall_s:8.2f} {len(tx) / wall_s:11,.0f} "
+                  f"{serial_s / wall_s:9.2f} {timings['worker_cpu_s']:9.2f}  identical", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+bench_score_index.py
+--------------------
+Latency of dashboard queries against src/score_index.py on a synthetic scored
+book, with parity against a brute-force filter + full sort.
+
+USAGE
+-----
+python benchmarks/bench_score_index.py --rows 10000000 --queries 20
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.generate_synthetic_data import build_country_risk
+from src.score_index import ScoreIndex
+
+
+def synthetic_book(n_rows: int, n_clients: int, seed: int = 3) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    rule = rng.choice([0, 1, 2, 3, 4, 5, 6], size=n_rows, p=[.85, .04, .04, .03, .02, .01, .01]).astype(float)
+    return pd.DataFrame({
+        "tx_id": np.arange(1, n_rows + 1),
+        "client_id": np.sort(rng.integers(1, n_clients + 1, size=n_rows)),
+        "ts": np.datetime64("2024-01-01T00:00:00", "s") + rng.integers(0, 670 * 86400, size=n_rows),
+        "amount_usd": np.round(rng.lognormal(10.5, 1.0, size=n_rows), 2),
+        "channel": pd.Categorical(rng.choice(["wire", "swift", "local", "cash", "crypto"], size=n_rows)),
+        "direction": pd.Categorical(rng.choice(["in", "out"], size=n_rows)),
+        "counterparty_country": pd.Categorical(rng.choice(build_country_risk()["country"].values, size=n_rows)),
+        "rule_score": rule,
+        "iforest_score": rng.beta(5, 12, size=n_rows) + 0.3,
+        "label_suspicious_injected": np.zeros(n_rows, dtype=int),
+        "roll_cnt_30D": 1.0, "roll_hrc_cnt_30D": 0.0, "roll_cash_cnt_7D": 0.0,
+    })
+
+
+def brute_force(book, k, alpha, min_rule, min_iforest, **filters):
+    mask = (book["rule_score"] >= min_rule) & (book["iforest_score"] >= min_iforest)
+    for col, values in filters.items():
+        if values:
+            mask &= book[col].isin(values)
+    hybrid = alpha * book["iforest_score"] + (1 - alpha) * book["rule_score"]
+    return np.sort(hybrid[mask].to_numpy())[::-1][:k]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=10_000_000)
+    ap.add_argument("--clients", type=int, default=500_000)
+    ap.add_argument("--queries", type=int, default=20)
+    args = ap.parse_args()
+
+    book = synthetic_book(args.rows, args.clients)
+    t0 = time.perf_counter()
+    index = ScoreIndex(book)
+    print(f"rows={args.rows:,}  index build={time.perf_counter() - t0:.2f}s")
+
+    rng = np.random.default_rng(0)
+    countries = index.categories["counterparty_country"]
+    lat = []
+    for _ in range(args.queries):
+        q = {
+            "k": int(rng.choice([10, 100, 500])),
+            "alpha": float(rng.choice(np.arange(0, 1.05, 0.05))),
+            "min_rule": float(rng.choice([0.0, 0.0, 2.0])),
+            "min_iforest": float(rng.choice([0.0, 0.5, 0.7])),
+            "counterparty_country": list(rng.choice(countries, size=rng.integers(0, 4), replace=False)),
+            "channel": list(rng.choice(index.categories["channel"], size=rng.integers(0, 2), replace=False)),
+            "direction": [],
+        }
+        t0 = time.perf_counter()
+        top = index.top_k(**q)
+        lat.append(time.perf_counter() - t0)
+        assert np.allclose(top["hybrid_score"].to_numpy(), brute_force(book, **q)), q
+
+    cids = rng.choice(index.client_ids, size=1000)
+    t0 = time.perf_counter()
+    for cid in cids:
+        index.client_frame(cid)
+    drill = (time.perf_counter() - t0) / len(cids)
+
+    lat_ms = np.array(lat) * 1000
+    print(f"top_k: p50={np.percentile(lat_ms, 50):.1f}ms  p99={np.percentile(lat_ms, 99):.1f}ms  parity=ok")
+    print(f"client drilldown: {drill * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+bench_sql_features.py
+---------------------
+Parity check + throughput for the DuckDB feature backend (src/sql_features.py)
+against the pandas path of `build_features`.
+
+USAGE
+-----
+python benchmarks/bench_sql_features.py --rows 1000000 5000000 --clients 100000 --memory-limit 1GB
+
+For each size: pandas in memory, DuckDB returning a DataFrame, and DuckDB
+streaming a partitioned Parquet dataset to a Parquet file under
+--memory-limit (the out-of-core path). Parity with pandas is asserted up to
+--parity-max-rows.
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from benchmarks.bench_rolling_features import synthetic_transactions
+from src.feature_engineering import build_features
+from src.generate_synthetic_data import build_country_risk
+from src.sql_features import build_features_sql, connect, export_features_sql
+from src.storage import write_transactions
+
+
+def assert_parity(expected: pd.DataFrame, got: pd.DataFrame):
+    assert list(expected.columns) == list(got.columns), "column order differs"
+    for c in expected.columns:
+        a, b = expected[c], got[c]
+        if a.dtype.kind in "fi":
+            assert np.allclose(a.to_numpy(float), b.to_numpy(float), rtol=1e-9, atol=1e-6), c
+        else:
+            assert (a.astype(str).to_numpy() == b.astype(str).to_numpy()).all(), c
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 5_000_000])
+    ap.add_argument("--clients", type=int, default=100_000)
+    ap.add_argument("--parity-max-rows", type=int, default=2_000_000)
+    ap.add_argument("--memory-limit", default="1GB")
+    args = ap.parse_args()
+
+    cr = build_country_risk()
+    for n in args.rows:
+        tx = synthetic_transactions(n, args.clients)
+        line = f"rows={n:>11,}"
+
+        t0 = time.perf_counter()
+        expected = build_features(tx, cr)
+        line += f"  pandas={time.perf_counter() - t0:7.2f}s"
+
+        if n <= args.parity_max_rows:
+            t0 = time.perf_counter()
+            got = build_features_sql(tx, cr)
+            line += f"  duckdb(df)={time.perf_counter() - t0:7.2f}s"
+            assert_parity(expected, got)
+            line += "  parity=ok"
+            del got
+        del expected
+
+        with tempfile.TemporaryDirectory() as tmp:
+            write_transactions(tx, Path(tmp) / "tx", partition_by="month")
+            del tx
+            con = connect(Path(tmp) / "spill.duckdb", memory_limit=args.memory_limit, temp_directory=tmp)
+            t0 = time.perf_counter()
+            export_features_sql(Path(tmp) / "tx", cr, Path(tmp) / "features.parquet", con=con)
+            secs = time.perf_counter() - t0
+            line += f"  duckdb(parquet->parquet, {args.memory_limit})={secs:7.2f}s  ({n / secs / 1e6:.2f}M rows/s)"
+        print(line, flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+bench_storage.py
+----------------
+Load time and peak RSS: transactions.csv vs the partitioned Parquet dataset
+written by src/storage.py, for a full load, one client and one month.
+
+USAGE
+-----
+python benchmarks/bench_storage.py --rows 5000000 --clients 100000 --workdir /tmp/aml_bench
+
+Each measurement runs in a child of a fork server started before any data is
+built (Linux carries ru_maxrss across fork/exec), so peak RSS reflects only the
+load being measured.
+"""
+import argparse
+import multiprocessing as mp
+import multiprocessing.forkserver
+import resource
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src import storage
+from src.generate_synthetic_data import build_country_risk
+
+
+def synthetic_transactions(n_rows: int, n_clients: int, seed: int = 11) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    start = np.datetime64("2024-01-01T00:00:00", "s")
+    return pd.DataFrame({
+        "tx_id": np.arange(1, n_rows + 1),
+        "client_id": rng.integers(1, n_clients + 1, size=n_rows),
+        "ts": start + rng.integers(0, 670 * 86400, size=n_rows),
+        "amount_usd": np.round(rng.lognormal(10.5, 1.0, size=n_rows), 2),
+        "currency": rng.choice(["USD", "EUR", "GBP", "CHF", "SGD", "HKD", "JPY", "AUD"], size=n_rows),
+        "channel": rng.choice(["wire", "swift", "local", "cash", "crypto"], size=n_rows),
+        "tx_type": rng.choice(["deposit", "withdrawal", "transfer", "payment", "fx"], size=n_rows),
+        "direction": rng.choice(["in", "out"], size=n_rows),
+        "counterparty_country": rng.choice(build_country_risk()["country"].values, size=n_rows),
+        "is_international": rng.integers(0, 2, size=n_rows),
+        "label_suspicious_injected": np.zeros(n_rows, dtype=int),
+    }).sort_values("ts", kind="mergesort")
+
+
+def _load_csv(path, client_id=None, month=None):
+    tx = pd.read_csv(path)
+    tx["ts"] = pd.to_datetime(tx["ts"])
+    if client_id is not None:
+        tx = tx[tx["client_id"] == client_id]
+    if month is not None:
+        tx = tx[tx["ts"].dt.strftime("%Y-%m") == month]
+    return tx
+
+
+def _load_parquet(root, client_id=None, month=None):
+    kwargs = {}
+    if client_id is not None:
+        kwargs["client_ids"] = [client_id]
+    if month is not None:
+        start = pd.Timestamp(month + "-01")
+        kwargs.update(start=start, end=start + pd.offsets.MonthEnd(1) + pd.Timedelta("23:59:59.999999"))
+    return storage.read_transactions(root, **kwargs)
+
+
+def _measure(queue, fn, args, kwargs):
+    t0 = time.perf_counter()
+    n = len(fn(*args, **kwargs))
+    queue.put((time.perf_counter() - t0, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, n))
+
+
+CTX = mp.get_context("forkserver")
+
+
+def measure(fn, *args, **kwargs):
+    queue = CTX.Queue()
+    p = CTX.Process(target=_measure, args=(queue, fn, args, kwargs))
+    p.start()
+    result = queue.get()
+    p.join()
+    return result
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=5_000_000)
+    ap.add_argument("--clients", type=int, default=100_000)
+    ap.add_argument("--workdir", default="/tmp/aml_storage_bench")
+    args = ap.parse_args()
+    multiprocessing.forkserver.ensure_running()
+
+    work = Path(args.workdir)
+    work.mkdir(parents=True, exist_ok=True)
+    tx = synthetic_transactions(args.rows, args.clients)
+    csv_path = work / "transactions.csv"
+    tx.to_csv(csv_path, index=False)
+    storage.write_transactions(tx, work / "by_month", partition_by="month")
+    storage.write_transactions(tx, work / "by_client", partition_by="client_hash")
+    client_id, month = int(tx["client_id"].iloc[0]), "2024-06"
+    del tx
+
+    cases = [
+        ("full load", "csv", _load_csv, (csv_path,), {}),
+        ("full load", "parquet/month", _load_parquet, (work / "by_month",), {}),
+        ("one client", "csv", _load_csv, (csv_path,), {"client_id": client_id}),
+        ("one client", "parquet/client_hash", _load_parquet, (work / "by_client",), {"client_id": client_id}),
+        ("one month", "csv", _load_csv, (csv_path,), {"month": month}),
+        ("one month", "parquet/month", _load_parquet, (work / "by_month",), {"month": month}),
+    ]
+    print(f"{'query':<11} {'format':<20} {'seconds':>8} {'peak RSS MB':>12} {'rows':>10}")
+    for query, fmt, fn, fargs, fkwargs in cases:
+        secs, rss, n = measure(fn, *fargs, **fkwargs)
+        print(f"{query:<11} {fmt:<20} {secs:8.2f} {rss:12.0f} {n:10,}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,20 @@
-import pandas as pd
 from pathlib import Path
 from src.feature_engineering import build_features
-from src.detect_anomalies import apply_rules, isolation_forest_scores, combine_scores
+from src.detect_anomalies import apply_rules, combine_scores
+from src.model_registry import load_or_fit, score_model
+from src.storage import load_country_risk, load_transactions
 
 base_dir = Path(__file__).resolve().parent
 
-tx = pd.read_csv(base_dir / "data/transactions.csv")
-cr = pd.read_csv(base_dir / "data/country_risk.csv")
+# partitioned Parquet under data/transactions/ when present, else transactions.csv
+tx = load_transactions(base_dir / "data")
+cr = load_country_risk(base_dir / "data")
 
 feats = build_features(tx, cr)
 scored = apply_rules(feats)
-scored["iforest_score"] = isolation_forest_scores(scored)
+# fitted once and persisted under models/; later runs only score
+model = load_or_fit(feats, base_dir / "models/iforest.joblib")
+scored["iforest_score"] = score_model(model, scored)
 final = combine_scores(scored)
 top_flags = final.sort_values("hybrid_score", ascending=False).head(25)
 top_flags[["client_id","ts","amount_usd","channel","direction","counterparty_country","rule_score","iforest_score","hybrid_score"]]
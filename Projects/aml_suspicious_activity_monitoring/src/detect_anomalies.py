@@ -1,36 +1,49 @@
 import pandas as pd
 import numpy as np
+from pathlib import Path
 from sklearn.ensemble import IsolationForest
 
-RULES = [
-    ("large_value", lambda df: df["amount_usd"] >= 100000, 2.0),
-    ("swift_out_high_risk", lambda df: (df["is_swift"]==1)&(df["direction"]=="out")&(df["counterparty_is_high_risk"]==1), 3.0),
-    ("cash_structuring", lambda df: (df["is_cash"]==1)&(df["amount_usd"].between(8000, 9999)), 1.5),
-    ("amount_spike", lambda df: df["amt_z"] >= 3.0, 2.0),
-    ("burst_activity_7d", lambda df: df["roll_cnt_7D"] >= 10, 1.5),
-    ("hrc_exposure_30d", lambda df: df["roll_hrc_cnt_30D"] >= 3, 1.8),
+from src.rule_engine import load_rule_plan
+
+# Rules are declared in rules.yaml and compiled once into a shared evaluation
+# plan; it takes any column mapping (DataFrame or dict of arrays), so the
+# streaming scorer can evaluate them without building a DataFrame.
+RULES_PATH = Path(__file__).resolve().with_name("rules.yaml")
+RULE_PLAN = load_rule_plan(RULES_PATH)
+
+IFOREST_FEATURES = [
+    "amount_usd","amt_z",
+    "roll_cnt_1D","roll_cnt_7D","roll_cnt_30D",
+    "roll_amt_sum_7D","roll_amt_sum_30D",
+    "roll_hrc_cnt_7D","roll_hrc_cnt_30D",
+    "roll_cash_cnt_7D","roll_swift_cnt_7D",
+    "counterparty_risk","is_international","is_cash","is_swift","is_transfer"
 ]
 
-def apply_rules(feats: pd.DataFrame) -> pd.DataFrame:
-    out = feats.copy()
-    score = np.zeros(len(out), dtype=float)
-    for name, fn, w in RULES:
-        mask = fn(out).astype(int)
-        out[f"rule__{name}"] = mask
-        score += w * mask
-    out["rule_score"] = score
-    return out
+def apply_rules(feats: pd.DataFrame, plan=None) -> pd.DataFrame:
+    """Add `rule_hits` (packed uint64 bitmask, one bit per rule) and `rule_score`.
+
+    With more than 64 rules the bitmask spans `rule_hits_0`, `rule_hits_1`, ...
+    Use `expand_rule_hits` to get one boolean column per rule.
+    """
+    plan = plan or RULE_PLAN
+    bits, score = plan.evaluate(feats)
+    if plan.n_words == 1:
+        hit_cols = {"rule_hits": bits[:, 0]}
+    else:
+        hit_cols = {f"rule_hits_{i}": bits[:, i] for i in range(plan.n_words)}
+    return feats.assign(**hit_cols, rule_score=score)
+
+def expand_rule_hits(scored: pd.DataFrame, plan=None) -> pd.DataFrame:
+    """One `rule__<name>` bool column per rule, unpacked from `rule_hits`."""
+    plan = plan or RULE_PLAN
+    cols = ["rule_hits"] if plan.n_words == 1 else [f"rule_hits_{i}" for i in range(plan.n_words)]
+    hits = plan.hit_matrix(scored[cols].to_numpy(dtype=np.uint64))
+    return pd.DataFrame(hits, index=scored.index, columns=[f"rule__{n}" for n in plan.names])
 
 def isolation_forest_scores(feats: pd.DataFrame, feature_cols=None, random_state=42):
     if feature_cols is None:
-        feature_cols = [
-            "amount_usd","amt_z",
-            "roll_cnt_1D","roll_cnt_7D","roll_cnt_30D",
-            "roll_amt_sum_7D","roll_amt_sum_30D",
-            "roll_hrc_cnt_7D","roll_hrc_cnt_30D",
-            "roll_cash_cnt_7D","roll_swift_cnt_7D",
-            "counterparty_risk","is_international","is_cash","is_swift","is_transfer"
-        ]
+        feature_cols = IFOREST_FEATURES
     X = feats[feature_cols].fillna(0.0).values
     clf = IsolationForest(n_estimators=200, contamination="auto", random_state=random_state)
     clf.fit(X)
@@ -1,12 +1,16 @@
 
 """
-feature_engineering.py (robust)
-Builds AML features with safe per-client time-based rolling that avoids
-"ValueError: cannot reindex on an axis with duplicate labels" across Pandas versions.
+feature_engineering.py (vectorized)
+Builds AML features with per-client time-based rolling windows computed in a
+single pass over the client/time-sorted frame: window start offsets come from
+searchsorted over (client, ts) keys and every aggregate is a difference of
+cumulative sums, so there is no Python loop over clients.
 """
 import pandas as pd
 import numpy as np
 
+WINDOWS = ("1D", "7D", "30D")
+
 def parse_dates(df, col="ts"):
     df = df.copy()
     df[col] = pd.to_datetime(df[col])
@@ -17,51 +21,110 @@ def add_basic_flags(tx: pd.DataFrame, country_risk: pd.DataFrame) -> pd.DataFram
     tx = tx.copy()
     risk_map = country_risk.set_index("country")["risk_score"].to_dict()
     hr_map = country_risk.set_index("country")["is_high_risk"].to_dict()
-    tx["counterparty_risk"] = tx["counterparty_country"].map(risk_map).fillna(5)
-    tx["counterparty_is_high_risk"] = tx["counterparty_country"].map(hr_map).fillna(0).astype(int)
+    cty = tx["counterparty_country"]
+    if isinstance(cty.dtype, pd.CategoricalDtype):
+        cty = cty.astype(object)  # mapping a categorical can return a categorical, which fillna rejects
+    tx["counterparty_risk"] = cty.map(risk_map).fillna(5)
+    tx["counterparty_is_high_risk"] = cty.map(hr_map).fillna(0).astype(int)
     tx["is_large_tx_abs"] = (tx["amount_usd"] >= 100000).astype(int)
     tx["is_cash"] = (tx["channel"]=="cash").astype(int)
     tx["is_swift"] = (tx["channel"]=="swift").astype(int)
     tx["is_transfer"] = (tx["tx_type"]=="transfer").astype(int)
     return tx
 
-def _safe_time_roll(group: pd.DataFrame, windows=("1D","7D","30D")) -> pd.DataFrame:
-    """Compute time-based rolling per client using a temporary DatetimeIndex,
-    returning arrays aligned to the original row order. Robust to duplicate labels.
+def ts_to_ns(ts) -> np.ndarray:
+    """int64 nanoseconds since epoch for a datetime-like column."""
+    return np.asarray(pd.to_datetime(ts)).astype("datetime64[ns]").view("int64")
+
+def window_starts(codes: np.ndarray, ts_ns: np.ndarray, windows_ns) -> list:
+    """First row of each row's (ts - window, ts] frame, one array per window.
+
+    Rows must be sorted by (codes, ts_ns). Timestamps are replaced by their rank
+    among all timestamps so that (code, rank) packs into one monotone int64 key,
+    which lets a single searchsorted find every frame start without crossing
+    client boundaries. Like pandas' time-based rolling, rows sharing a timestamp
+    only see the rows before them.
     """
-    g = group.sort_values("ts").copy()
-    g_idxed = g.set_index("ts")
-    out = g.copy()
-    for win in windows:
-        cnt = g_idxed["tx_id"].rolling(win).count().to_numpy(dtype=float)
-        ssum = g_idxed["amount_usd"].rolling(win).sum().to_numpy(dtype=float)
-        mean = g_idxed["amount_usd"].rolling(win).mean().to_numpy(dtype=float)
-        hrc = g_idxed["counterparty_is_high_risk"].rolling(win).sum().to_numpy(dtype=float)
-        cash = g_idxed["is_cash"].rolling(win).sum().to_numpy(dtype=float)
-        swift = g_idxed["is_swift"].rolling(win).sum().to_numpy(dtype=float)
+    # rank lookups run in time order so the binary searches stay cache-friendly
+    order = np.argsort(ts_ns, kind="stable")
+    sorted_ts = ts_ns[order]
+    base = codes.astype(np.int64) * (len(ts_ns) + 1)
+    rank = np.empty(len(ts_ns), dtype=np.int64)
+    rank[order] = np.searchsorted(sorted_ts, sorted_ts, side="right")
+    keys = base + rank
+    starts = []
+    for window_ns in windows_ns:
+        rank[order] = np.searchsorted(sorted_ts, sorted_ts - window_ns, side="right")
+        starts.append(np.searchsorted(keys, base + rank, side="right"))
+    return starts
+
+def _is_sorted(codes: np.ndarray, ts_ns: np.ndarray) -> bool:
+    same = codes[1:] == codes[:-1]
+    return bool(np.all((codes[1:] > codes[:-1]) | (same & (ts_ns[1:] >= ts_ns[:-1]))))
+
+def _window_sum(cumsum: np.ndarray, starts: np.ndarray, group_first: np.ndarray) -> np.ndarray:
+    """Sum over rows [start, i] from an inclusive per-group cumulative sum."""
+    prev = np.where(starts > group_first, cumsum[np.maximum(starts - 1, 0)], 0)
+    return cumsum - prev
+
+def rolling_features(tx: pd.DataFrame, windows=WINDOWS) -> pd.DataFrame:
+    """Per-client time-window counts/sums/means plus a per-client amount z-score.
+
+    Output rows are ordered by (client_id, ts) with a fresh RangeIndex and carry
+    the same columns, in the same order, as the former per-client
+    ``rolling(win)`` implementation.
+    """
+    codes, _ = pd.factorize(tx["client_id"], sort=True)
+    ts_ns = ts_to_ns(tx["ts"])
+    if not _is_sorted(codes, ts_ns):
+        order = np.lexsort((ts_ns, codes))
+        tx, codes, ts_ns = tx.iloc[order], codes[order], ts_ns[order]
+    tx = tx.reset_index(drop=True)
+    idx = np.arange(len(tx))
+    new_group = np.r_[True, codes[1:] != codes[:-1]] if len(tx) else np.zeros(0, dtype=bool)
+    group_first = np.maximum.accumulate(np.where(new_group, idx, 0))
+
+    amount = tx["amount_usd"].astype(float)
+    amt_cum = amount.groupby(codes).cumsum().to_numpy()
+    flag_cums = {
+        name: np.cumsum(tx[col].to_numpy(dtype=np.int64))
+        for name, col in (("hrc", "counterparty_is_high_risk"), ("cash", "is_cash"), ("swift", "is_swift"))
+    }
+    # global int cumsums are exact; restrict them to the group via the offset at group_first
+    flag_base = {name: np.where(group_first > 0, cs[group_first - 1], 0) for name, cs in flag_cums.items()}
+
+    out = {}
+    all_starts = window_starts(codes, ts_ns, [pd.Timedelta(win).value for win in windows])
+    for win, starts in zip(windows, all_starts):
+        cnt = (idx - starts + 1).astype(float)
+        ssum = _window_sum(amt_cum, starts, group_first)
+        counts = {}
+        for name, cs in flag_cums.items():
+            local = cs - flag_base[name]
+            counts[name] = _window_sum(local, starts, group_first).astype(float)
         out[f"roll_cnt_{win}"] = cnt
         out[f"roll_amt_sum_{win}"] = ssum
-        out[f"roll_amt_mean_{win}"] = mean
-        out[f"roll_hrc_cnt_{win}"] = hrc
-        out[f"roll_cash_cnt_{win}"] = cash
-        out[f"roll_swift_cnt_{win}"] = swift
+        out[f"roll_amt_mean_{win}"] = ssum / cnt
+        out[f"roll_hrc_cnt_{win}"] = counts["hrc"]
+        out[f"roll_cash_cnt_{win}"] = counts["cash"]
+        out[f"roll_swift_cnt_{win}"] = counts["swift"]
+
     # z-score per client
-    amt = out["amount_usd"].astype(float)
-    mu = amt.mean()
-    sd = amt.std(ddof=0)
-    z = (amt - mu) / (sd if sd != 0 else 1.0)
-    out["amt_z"] = z.clip(-5, 10)
-    return out
-
-def rolling_features(tx: pd.DataFrame, windows=("1D","7D","30D")) -> pd.DataFrame:
-    # apply per client to avoid reindex errors
-    parts = []
-    for _, g in tx.groupby("client_id", sort=False):
-        parts.append(_safe_time_roll(g, windows))
-    out = pd.concat(parts, axis=0, ignore_index=True)
-    return out
-
-def build_features(transactions: pd.DataFrame, country_risk: pd.DataFrame) -> pd.DataFrame:
+    grouped = amount.groupby(codes)
+    mu = grouped.transform("mean")
+    sd = grouped.transform("std", ddof=0)
+    z = (amount - mu) / sd.where(sd != 0, 1.0)
+    out["amt_z"] = z.clip(-5, 10).to_numpy()
+
+    return tx.assign(**out)
+
+def build_features(transactions: pd.DataFrame, country_risk: pd.DataFrame, engine="pandas") -> pd.DataFrame:
+    """engine="duckdb" computes the same frame with SQL window functions (src/sql_features.py)."""
+    if engine == "duckdb":
+        from src.sql_features import build_features_sql
+        return build_features_sql(transactions, country_risk)
+    if engine != "pandas":
+        raise ValueError(f"engine must be 'pandas' or 'duckdb', got {engine!r}")
     tx = parse_dates(transactions)
     tx = add_basic_flags(tx, country_risk)
     feats = rolling_features(tx)
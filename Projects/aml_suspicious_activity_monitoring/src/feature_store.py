@@ -0,0 +1,192 @@
+"""
+feature_store.py
+----------------------------------
+Append-only feature state for the AML rolling features, keyed by client_id.
+
+Instead of recomputing every window from the full transaction history, the
+store keeps, per client:
+
+- a window buffer: the client's most recent transactions that can still fall
+  inside the longest window (ts, amount, HRC/cash/SWIFT flags),
+- running amount moments (count, mean, M2) for the per-client z-score.
+
+`update(batch)` folds a new batch into that state and returns features for the
+batch rows only, so a daily run costs O(new rows + buffered rows) rather than
+O(all history). The rolling columns equal what `build_features` would produce
+over the full history; `amt_z` is scored against all history seen so far.
+
+USAGE
+-----
+# rebuild state from history, one batch per day
+python -m src.feature_store --state data/feature_state.pkl \
+  --replay data/transactions.csv --country-risk data/country_risk.csv
+
+# fold in a new day and write features for it
+python -m src.feature_store --state data/feature_state.pkl \
+  --batch data/new_transactions.csv --out data/new_features.csv
+"""
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.feature_engineering import WINDOWS, add_basic_flags, parse_dates, rolling_features
+
+STATE_COLS = ["client_id", "ts", "amount_usd", "counterparty_is_high_risk", "is_cash", "is_swift"]
+STATE_VERSION = 1
+
+
+class FeatureStore:
+    def __init__(self, country_risk: pd.DataFrame, windows=WINDOWS):
+        self.country_risk = country_risk
+        self.windows = tuple(windows)
+        self.horizon = max(pd.Timedelta(w) for w in self.windows)
+        self.buffer = pd.DataFrame({c: pd.Series(dtype="int64") for c in STATE_COLS})
+        self.buffer["ts"] = pd.Series(dtype="datetime64[ns]")
+        self.buffer["amount_usd"] = pd.Series(dtype="float64")
+        self.moments = pd.DataFrame(
+            {"n": pd.Series(dtype="int64"), "mean": pd.Series(dtype="float64"), "m2": pd.Series(dtype="float64")}
+        ).rename_axis("client_id")
+        self.watermark = None
+        self.n_rows = 0
+
+    # -------------------------------
+    # Updates
+    # -------------------------------
+    def update(self, batch: pd.DataFrame) -> pd.DataFrame:
+        """Fold `batch` into the state; return `build_features`-style rows for it."""
+        tx = add_basic_flags(parse_dates(batch), self.country_risk).reset_index(drop=True)
+        if tx.empty:
+            return rolling_features(tx, self.windows)
+        self._check_append_only(tx)
+
+        hist = self.buffer[self.buffer["client_id"].isin(tx["client_id"].unique())]
+        combined = pd.concat(
+            [hist.assign(_pos=-1), tx[STATE_COLS].assign(_pos=np.arange(len(tx)))],
+            ignore_index=True,
+        )
+        feats = rolling_features(combined, self.windows)
+        new = feats[feats["_pos"] >= 0].sort_values("_pos")
+        roll_cols = [c for c in feats.columns if c.startswith("roll_")]
+        out = tx.assign(**{c: new[c].to_numpy() for c in roll_cols})
+
+        self._update_moments(tx)
+        mom = self.moments.reindex(tx["client_id"])
+        sd = np.sqrt(mom["m2"].to_numpy() / mom["n"].to_numpy())
+        z = (tx["amount_usd"].to_numpy(dtype=float) - mom["mean"].to_numpy()) / np.where(sd != 0, sd, 1.0)
+        out["amt_z"] = np.clip(z, -5, 10)
+
+        self._update_buffer(feats[STATE_COLS])
+        self.watermark = max(self.watermark, tx["ts"].max()) if self.watermark is not None else tx["ts"].max()
+        self.n_rows += len(tx)
+        return out
+
+    def _check_append_only(self, tx: pd.DataFrame):
+        if self.buffer.empty:
+            return
+        last_ts = self.buffer.groupby("client_id")["ts"].max()
+        prev = tx["client_id"].map(last_ts)
+        late = prev.notna() & (tx["ts"] < prev)
+        if late.any():
+            raise ValueError(
+                f"{int(late.sum())} transactions are older than their client's latest state "
+                f"(first: tx_id={tx.loc[late.idxmax(), 'tx_id']}); replay from a checkpoint instead."
+            )
+
+    def _update_moments(self, tx: pd.DataFrame):
+        # Chan et al. parallel merge of (n, mean, M2) per client
+        amt = tx["amount_usd"].astype(float)
+        g = amt.groupby(tx["client_id"])
+        b = pd.DataFrame({"n": g.size(), "mean": g.mean()})
+        b["m2"] = ((amt - tx["client_id"].map(b["mean"])) ** 2).groupby(tx["client_id"]).sum()
+        a = self.moments.reindex(b.index)
+        a = a.fillna({"n": 0, "mean": 0.0, "m2": 0.0})
+        n = a["n"] + b["n"]
+        delta = b["mean"] - a["mean"]
+        merged = pd.DataFrame({
+            "n": n.astype("int64"),
+            "mean": a["mean"] + delta * b["n"] / n,
+            "m2": a["m2"] + b["m2"] + delta ** 2 * a["n"] * b["n"] / n,
+        })
+        rest = self.moments[~self.moments.index.isin(merged.index)]
+        self.moments = pd.concat([rest, merged]).sort_index()
+
+    def _update_buffer(self, rows: pd.DataFrame):
+        # keep only rows a future transaction's longest window can still reach
+        last_ts = rows.groupby("client_id")["ts"].transform("max")
+        keep = rows[rows["ts"] > last_ts - self.horizon]
+        rest = self.buffer[~self.buffer["client_id"].isin(rows["client_id"].unique())]
+        self.buffer = pd.concat([rest, keep], ignore_index=True)
+
+    # -------------------------------
+    # Checkpoints & replay
+    # -------------------------------
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        pd.to_pickle({
+            "version": STATE_VERSION,
+            "windows": self.windows,
+            "buffer": self.buffer.sort_values(["client_id", "ts"], kind="mergesort").reset_index(drop=True),
+            "moments": self.moments,
+            "watermark": self.watermark,
+            "n_rows": self.n_rows,
+        }, path)
+
+    @classmethod
+    def load(cls, path, country_risk: pd.DataFrame) -> "FeatureStore":
+        state = pd.read_pickle(path)
+        if state.get("version") != STATE_VERSION:
+            raise ValueError(f"Unsupported feature-state version {state.get('version')} in {path}")
+        store = cls(country_risk, windows=state["windows"])
+        store.buffer = state["buffer"]
+        store.moments = state["moments"]
+        store.watermark = state["watermark"]
+        store.n_rows = state["n_rows"]
+        return store
+
+    @classmethod
+    def replay(cls, transactions: pd.DataFrame, country_risk: pd.DataFrame, freq="D", windows=WINDOWS):
+        """Rebuild state by feeding `transactions` in `freq` batches, oldest first.
+
+        Returns (store, features). The same input and `freq` always give the
+        same state and the same emitted features.
+        """
+        store = cls(country_risk, windows=windows)
+        ts = pd.to_datetime(transactions["ts"])
+        parts = [store.update(batch) for _, batch in transactions.groupby(ts.dt.floor(freq), sort=True)]
+        feats = pd.concat(parts, ignore_index=True) if parts else store.update(transactions.iloc[:0])
+        return store, feats
+
+
+# -------------------------------
+# Main
+# -------------------------------
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--state", default="./data/feature_state.pkl")
+    ap.add_argument("--country-risk", default="./data/country_risk.csv")
+    ap.add_argument("--batch", help="CSV of new transactions to fold into the state")
+    ap.add_argument("--replay", help="CSV of full history to rebuild the state from")
+    ap.add_argument("--freq", default="D", help="Replay batch frequency. Default: D")
+    ap.add_argument("--out", help="Where to write features for the new rows (CSV)")
+    args = ap.parse_args()
+
+    cr = pd.read_csv(args.country_risk)
+    if args.replay:
+        store, feats = FeatureStore.replay(pd.read_csv(args.replay), cr, freq=args.freq)
+    else:
+        state = Path(args.state)
+        store = FeatureStore.load(state, cr) if state.exists() else FeatureStore(cr)
+        feats = store.update(pd.read_csv(args.batch)) if args.batch else None
+
+    store.save(args.state)
+    print(f"State: {store.n_rows:,} rows seen, {len(store.buffer):,} buffered, watermark {store.watermark}")
+    if args.out and feats is not None:
+        feats.to_csv(args.out, index=False)
+        print(f"Wrote: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
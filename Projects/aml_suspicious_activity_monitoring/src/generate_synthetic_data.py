@@ -25,6 +25,10 @@ PARAMETERS
 --seed           Base random seed. Default: 42
 --start          Start date (YYYY-MM-DD). Default: 2024-01-01
 --end            End date (YYYY-MM-DD). Default: 2025-10-31
+--format         csv | parquet | both. Default: csv
+--partition-by   Parquet layout: month | client_hash. Default: month
+--chunk-size     Rows per written chunk (whole days). Default: 1000000
+--workers        Generator processes. Default: 1
 
 NOTES
 -----
@@ -32,14 +36,24 @@ NOTES
   high-risk countries, rapid in/out, cash structuring/smurfing, bursts, high
   geographic diversity). The column `label_suspicious_injected` is for your
   validation ONLY; do not use it during model training in realistic settings.
+- Transactions are generated with array operations, one day at a time from
+  per-day SeedSequence children, and streamed to disk in chunks, so memory
+  stays bounded and a seed gives the same rows for any --chunk-size/--workers.
 """
 
 import argparse
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
 import numpy as np
 import pandas as pd
 
+if __package__ in (None, ""):  # run as a script: make `src.` imports resolvable
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.storage import write_country_risk, write_transactions
+
 
 # -------------------------------
 # Reference: toy country risk
@@ -111,6 +125,190 @@ def generate_clients(n_clients: int = 2000, seed: int = 123) -> pd.DataFrame:
 # -------------------------------
 # Transactions with archetypes
 # -------------------------------
+TX_COLUMNS = [
+    "tx_id","client_id","ts","amount_usd","currency","channel","tx_type","direction",
+    "counterparty_country","is_international","label_suspicious_injected"
+]
+CHANNELS = np.array(["wire","swift","local","cash","crypto"])
+P_CHANNELS = np.array([0.45,0.25,0.15,0.08,0.07])
+TX_TYPES = np.array(["deposit","withdrawal","transfer","payment","fx"])
+CURRENCIES = np.array(["USD","EUR","GBP","CHF","SGD","HKD","JPY","AUD"])
+DIRECTIONS = np.array(["in","out"])
+DOMESTIC_ALT = ["SG","HK","JP","US","GB","CH"]
+ARCHETYPES = np.array(["high_value_to_hrc","rapid_in_out","smurfing","burst_activity","high_geo_diversity"])
+
+
+def client_profiles(clients_df: pd.DataFrame, seed: int) -> dict:
+    """Per-client behaviour shared by every chunk: average amount, international
+    share, residency and suspicious archetype (-1 = none), as aligned arrays."""
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(0,)))
+    cr = build_country_risk()
+    client_ids = clients_df["client_id"].to_numpy()
+    n = len(client_ids)
+    resid = clients_df["residency_country"].to_numpy()
+    countries = np.concatenate([cr["country"].to_numpy(), np.setdiff1d(resid, cr["country"].to_numpy())])
+    is_high_risk = np.zeros(len(countries), dtype=bool)
+    is_high_risk[:len(cr)] = cr["is_high_risk"].to_numpy() == 1
+
+    archetype = np.full(n, -1, dtype=np.int8)
+    sus = rng.choice(n, size=min(n, max(1, int(n * 0.06))), replace=False)
+    archetype[sus] = rng.integers(0, len(ARCHETYPES), size=len(sus))
+    return {
+        "client_id": client_ids,
+        "avg_amt": np.clip(rng.lognormal(10.5, 0.7, size=n), 1000, 500000),
+        "intl_share": np.clip(rng.normal(0.35, 0.2, size=n), 0.0, 0.95),
+        "resid": pd.Index(countries).get_indexer(resid),
+        "archetype": archetype,
+        "countries": countries,
+        "is_high_risk": is_high_risk,
+        "cr_probs": cr["risk_score"].to_numpy() / cr["risk_score"].sum(),
+        "domestic_alt": pd.Index(countries).get_indexer(DOMESTIC_ALT),
+    }
+
+
+def _day_transactions(profile: dict, day: int, n: int, seed: int) -> dict:
+    """Column arrays for `n` transactions on day offset `day`.
+
+    Each day draws from its own SeedSequence child, so the output for a seed
+    does not depend on how days are grouped into chunks or spread over workers.
+    """
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(1, day)))
+    cidx = rng.integers(0, len(profile["client_id"]), size=n)
+    secs = rng.integers(0, 86400, size=n)
+    a = profile["avg_amt"][cidx]
+    amount = np.round(np.exp(rng.normal(np.log(a), 0.6)), 2)
+
+    # counterparty: risk-weighted abroad, else mostly home country
+    resid = profile["resid"][cidx]
+    cty = resid.copy()
+    intl = rng.random(n) < profile["intl_share"][cidx]
+    cty[intl] = rng.choice(len(profile["cr_probs"]), size=int(intl.sum()), p=profile["cr_probs"])
+    alt = ~intl & (rng.random(n) >= 0.8)
+    cty[alt] = rng.choice(profile["domestic_alt"], size=int(alt.sum()))
+
+    channel = rng.choice(len(CHANNELS), size=n, p=P_CHANNELS)
+    ttype = rng.integers(0, len(TX_TYPES), size=n)
+    curr = rng.integers(0, len(CURRENCIES), size=n)
+    direction = (rng.random(n) >= 0.45).astype(np.int8)  # P(out) = 0.55
+    is_intl = (cty != resid).astype(int)
+    label = np.zeros(n, dtype=int)
+
+    # Inject archetype behavior
+    at = profile["archetype"][cidx]
+    r = rng.random(n)
+
+    m = (at == 0) & (r < 0.35)  # high_value_to_hrc
+    k = int(m.sum())
+    amount[m] = np.round(a[m] * rng.uniform(3.5, 12.0, size=k), 2)
+    cty[m] = rng.choice(np.flatnonzero(profile["is_high_risk"]), size=k)
+    channel[m], ttype[m], direction[m], label[m] = 1, 2, 1, 1
+
+    m = (at == 1) & (r < 0.30)  # rapid_in_out: business hours, keep seconds
+    k = int(m.sum())
+    secs[m] = rng.integers(8, 18, size=k) * 3600 + rng.integers(0, 60, size=k) * 60 + secs[m] % 60
+    amount[m] = np.round(a[m] * rng.uniform(0.5, 2.0, size=k), 2)
+    ttype[m] = 2
+    direction[m] = rng.integers(0, 2, size=k)
+    label[m] = rng.random(k) < 0.6
+
+    m = (at == 2) & ((channel == 3) | (r < 0.3))  # smurfing: cash just under 10k
+    k = int(m.sum())
+    channel[m] = 3
+    amount[m] = np.round(rng.uniform(8000, 9990, size=k), 2)
+    label[m] = rng.random(k) < 0.5
+
+    m = (at == 3) & (r < 0.28)  # burst_activity: keep minutes/seconds
+    k = int(m.sum())
+    secs[m] = rng.integers(9, 17, size=k) * 3600 + secs[m] % 3600
+    amount[m] = np.round(a[m] * rng.uniform(1.2, 4.0, size=k), 2)
+    ttype[m] = 3
+    label[m] = amount[m] > a[m] * 1.8
+
+    m = (at == 4) & (r < 0.4)  # high_geo_diversity
+    k = int(m.sum())
+    cty[m] = rng.integers(0, len(profile["cr_probs"]), size=k)
+    label[m] = profile["is_high_risk"][cty[m]] & (rng.random(k) < 0.5)
+
+    return {
+        "client_idx": cidx, "secs": day * 86400 + secs, "amount_usd": amount, "currency": curr,
+        "channel": channel, "tx_type": ttype, "direction": direction, "counterparty_country": cty,
+        "is_international": is_intl, "label_suspicious_injected": label,
+    }
+
+
+def _chunk_transactions(profile: dict, days, counts, start: str, first_tx_id: int, seed: int) -> pd.DataFrame:
+    parts = [_day_transactions(profile, int(d), int(n), seed) for d, n in zip(days, counts)]
+    cols = {c: np.concatenate([p[c] for p in parts]) for c in parts[0]}
+    order = np.argsort(cols["secs"], kind="stable")
+    cols = {c: v[order] for c, v in cols.items()}
+
+    def cat(codes, labels):
+        return pd.Categorical.from_codes(codes, categories=labels)
+
+    tx = pd.DataFrame({
+        "tx_id": np.arange(first_tx_id, first_tx_id + len(order)),
+        "client_id": profile["client_id"][cols["client_idx"]],
+        "ts": np.datetime64(start, "s") + cols["secs"].astype("timedelta64[s]"),
+        "amount_usd": cols["amount_usd"],
+        "currency": cat(cols["currency"], CURRENCIES),
+        "channel": cat(cols["channel"], CHANNELS),
+        "tx_type": cat(cols["tx_type"], TX_TYPES),
+        "direction": cat(cols["direction"], DIRECTIONS),
+        "counterparty_country": cat(cols["counterparty_country"], profile["countries"]),
+        "is_international": cols["is_international"],
+        "label_suspicious_injected": cols["label_suspicious_injected"],
+    })
+    return tx[TX_COLUMNS]
+
+
+def iter_transaction_chunks(
+    clients_df: pd.DataFrame,
+    n_tx: int = 50000,
+    start_date: str = "2024-01-01",
+    end_date: str = "2025-10-31",
+    seed: int = 456,
+    chunk_size: int = 1_000_000,
+    workers: int = 1,
+):
+    """Yield transactions in ts order as DataFrames of whole days, ~`chunk_size` rows each.
+
+    A single day larger than `chunk_size` becomes its own chunk. `tx_id` runs
+    1..n_tx in ts order across chunks. Output depends only on the inputs and
+    `seed`, not on `chunk_size` or `workers`.
+    """
+    start = datetime.fromisoformat(start_date)
+    end = datetime.fromisoformat(end_date)
+    days = max(1, (end - start).days)  # robust if start==end
+
+    profile = client_profiles(clients_df, seed)
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(2,)))
+    per_day = rng.multinomial(n_tx, np.full(days, 1.0 / days))
+    active = np.flatnonzero(per_day)
+    if len(active) == 0:
+        yield pd.DataFrame({c: [] for c in TX_COLUMNS})
+        return
+    # cut the day axis wherever the running count crosses a multiple of chunk_size
+    cum = np.cumsum(per_day[active])
+    cuts = np.flatnonzero(np.diff(cum // max(1, chunk_size))) + 1
+    groups = np.split(active, cuts)
+    first_ids = np.r_[0, np.cumsum([per_day[g].sum() for g in groups])[:-1]] + 1
+    tasks = [(profile, g, per_day[g], start.isoformat(), int(f), seed) for g, f in zip(groups, first_ids)]
+
+    if workers <= 1:
+        for t in tasks:
+            yield _chunk_transactions(*t)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        # bounded look-ahead keeps at most ~2 chunks per worker in memory
+        pending = deque()
+        for t in tasks:
+            pending.append(ex.submit(_chunk_transactions, *t))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
 def generate_transactions(
     clients_df: pd.DataFrame,
     n_tx: int = 50000,
@@ -118,98 +316,22 @@ def generate_transactions(
     end_date: str = "2025-10-31",
     seed: int = 456
 ) -> pd.DataFrame:
-    rng = np.random.default_rng(seed)
-    start = datetime.fromisoformat(start_date)
-    end   = datetime.fromisoformat(end_date)
-    days = (end - start).days
-
-    country_risk = build_country_risk()
-    high_risk = country_risk[country_risk.is_high_risk==1].country.values
-    channels = np.array(["wire","swift","local","cash","crypto"])
-    p_channels = np.array([0.45,0.25,0.15,0.08,0.07])
-    tx_types = np.array(["deposit","withdrawal","transfer","payment","fx"])
-    currencies = np.array(["USD","EUR","GBP","CHF","SGD","HKD","JPY","AUD"])
-
-    # Pre-maps and per-client behavior
-    resid_map = dict(zip(clients_df["client_id"].values, clients_df["residency_country"].values))
-    client_ids = clients_df["client_id"].values
-    # behavior per client
-    avg_amt = np.clip(rng.lognormal(10.5, 0.7, size=len(client_ids)), 1000, 500000)
-    intl_share = np.clip(rng.normal(0.35, 0.2, size=len(client_ids)), 0.0, 0.95)
-    diversity = np.clip(rng.normal(4,2, size=len(client_ids)).astype(int), 1, 12)
-    behav = {int(cid):(float(a), float(i), int(d)) for cid,a,i,d in zip(client_ids, avg_amt, intl_share, diversity)}
-
-    # Mark a subset as suspicious archetypes
-    sus_set = set(rng.choice(client_ids, size=max(1, int(len(client_ids)*0.06)), replace=False))
-    archetypes = np.array(["high_value_to_hrc","rapid_in_out","smurfing","burst_activity","high_geo_diversity"])
-    arche_map = {int(cid): str(rng.choice(archetypes)) for cid in sus_set}
-
-    # Base arrays for speed
-    cids = rng.choice(client_ids, size=n_tx)
-    day_offsets = rng.integers(0, max(1, days), size=n_tx)  # robust if start==end
-    seconds = rng.integers(0, 86400, size=n_tx)
-    cr_probs = country_risk["risk_score"].values / country_risk["risk_score"].values.sum()
-
-    rows = []
-    for i in range(n_tx):
-        cid = int(cids[i])
-        ts = start + timedelta(days=int(day_offsets[i]), seconds=int(seconds[i]))
-        a, ishare, div = behav[cid]
-
-        # base amount ~ lognormal around client avg
-        amount = float(np.round(np.exp(rng.normal(np.log(a), 0.6)), 2))
-
-        # counterparty
-        resid = resid_map[cid]
-        if rng.random() < ishare:
-            cty = str(rng.choice(country_risk["country"].values, p=cr_probs))
-        else:
-            cty = resid if rng.random() < 0.8 else str(rng.choice(["SG","HK","JP","US","GB","CH"]))
-
-        channel = str(rng.choice(channels, p=p_channels))
-        ttype   = str(rng.choice(tx_types))
-        curr    = str(rng.choice(currencies))
-        direction = str(rng.choice(["in","out"], p=[0.45,0.55]))
-        is_intl = int(cty != resid)
-        label = 0
-
-        # Inject archetype behavior
-        r = rng.random()
-        if cid in arche_map:
-            at = arche_map[cid]
-            if at == "high_value_to_hrc" and r < 0.35:
-                amount = float(np.round(a * rng.uniform(3.5, 12.0), 2))
-                cty = str(rng.choice(high_risk))
-                channel = "swift"; ttype = "transfer"; direction = "out"; label = 1
-            elif at == "rapid_in_out" and r < 0.30:
-                ts = ts.replace(hour=int(rng.integers(8, 18)), minute=int(rng.integers(0,60)))
-                amount = float(np.round(a * rng.uniform(0.5, 2.0), 2))
-                ttype = "transfer"
-                direction = str(rng.choice(["in","out"]))
-                label = int(rng.random() < 0.6)
-            elif at == "smurfing" and (channel == "cash" or r < 0.3):
-                channel = "cash"
-                amount = float(np.round(rng.uniform(8000, 9990), 2))  # <10k
-                label = int(rng.random() < 0.5)
-            elif at == "burst_activity" and r < 0.28:
-                ts = ts.replace(hour=int(rng.integers(9, 17)))
-                amount = float(np.round(a * rng.uniform(1.2, 4.0), 2))
-                ttype = "payment"
-                label = int(amount > a * 1.8)
-            elif at == "high_geo_diversity" and r < 0.4:
-                cty = str(rng.choice(country_risk["country"].values))
-                label = int(country_risk.set_index("country").loc[cty, "is_high_risk"]==1 and rng.random()<0.5)
-
-        rows.append((
-            i+1, cid, ts.isoformat(sep=" "), amount, curr, channel, ttype, direction, cty, is_intl, label
-        ))
-
-    tx = pd.DataFrame(rows, columns=[
-        "tx_id","client_id","ts","amount_usd","currency","channel","tx_type","direction",
-        "counterparty_country","is_international","label_suspicious_injected"
-    ]).sort_values("ts").reset_index(drop=True)
-
-    return tx
+    chunks = iter_transaction_chunks(clients_df, n_tx, start_date, end_date, seed)
+    return pd.concat(list(chunks), ignore_index=True)
+
+
+def write_transaction_chunks(chunks, outdir, fmt="csv", partition_by="month") -> int:
+    """Stream chunks to transactions.csv and/or the Parquet dataset; returns rows written."""
+    outdir = Path(outdir)
+    n = 0
+    for i, tx in enumerate(chunks):
+        if fmt in ("csv", "both"):
+            tx.to_csv(outdir / "transactions.csv", index=False, mode="w" if i == 0 else "a", header=(i == 0))
+        if fmt in ("parquet", "both"):
+            write_transactions(tx, outdir / "transactions", partition_by=partition_by,
+                               basename_template=f"part-{i:05d}-{{i}}.parquet", overwrite=(i == 0))
+        n += len(tx)
+    return n
 
 
 # -------------------------------
@@ -223,6 +345,10 @@ def main():
     ap.add_argument("--seed", type=int, default=42)
     ap.add_argument("--start", default="2024-01-01")
     ap.add_argument("--end", default="2025-10-31")
+    ap.add_argument("--format", choices=["csv", "parquet", "both"], default="csv")
+    ap.add_argument("--partition-by", choices=["month", "client_hash"], default="month")
+    ap.add_argument("--chunk-size", type=int, default=1_000_000)
+    ap.add_argument("--workers", type=int, default=1)
     args = ap.parse_args()
 
     outdir = Path(args.outdir)
@@ -230,24 +356,29 @@ def main():
 
     # Build data
     clients = generate_clients(n_clients=args.clients, seed=args.seed)
-    tx = generate_transactions(
+    chunks = iter_transaction_chunks(
         clients_df=clients,
         n_tx=args.transactions,
         start_date=args.start,
         end_date=args.end,
-        seed=args.seed + 1
+        seed=args.seed + 1,
+        chunk_size=args.chunk_size,
+        workers=args.workers,
     )
     cr = build_country_risk()
 
     # Save
     clients.to_csv(outdir / "clients.csv", index=False)
-    tx.to_csv(outdir / "transactions.csv", index=False)
-    cr.to_csv(outdir / "country_risk.csv", index=False)
-
     print(f"Wrote: {outdir/'clients.csv'}")
-    print(f"Wrote: {outdir/'transactions.csv'}")
-    print(f"Wrote: {outdir/'country_risk.csv'}")
-
+    n = write_transaction_chunks(chunks, outdir, fmt=args.format, partition_by=args.partition_by)
+    if args.format in ("csv", "both"):
+        cr.to_csv(outdir / "country_risk.csv", index=False)
+        print(f"Wrote: {outdir/'transactions.csv'} ({n:,} rows)")
+        print(f"Wrote: {outdir/'country_risk.csv'}")
+    if args.format in ("parquet", "both"):
+        write_country_risk(cr, outdir / "country_risk.parquet")
+        print(f"Wrote: {outdir/'transactions'}/ (Parquet, by {args.partition_by}, {n:,} rows)")
+        print(f"Wrote: {outdir/'country_risk.parquet'}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,143 @@
+"""
+model_registry.py
+----------------------------------
+Fit-once / score-many artifacts for the AML IsolationForest.
+
+An artifact bundles the fitted forest with everything needed to score new data
+safely: the feature-column list, a hash of the feature schema (names + dtype
+kinds), the training window and the fit parameters. Loading is memoized on
+(path, mtime), so repeated loads (e.g. Streamlit reruns) never refit or re-read.
+
+USAGE
+-----
+python -m src.model_registry \
+  --out models/iforest.joblib \
+  --train-start 2024-01-01 --train-end 2025-06-30 \
+  --n-jobs -1 --max-samples 256
+"""
+import argparse
+import functools
+import hashlib
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+
+import joblib
+import pandas as pd
+import sklearn
+from sklearn.ensemble import IsolationForest
+
+from src.detect_anomalies import IFOREST_FEATURES
+
+ARTIFACT_VERSION = 1
+DEFAULT_MODEL_PATH = Path(__file__).resolve().parents[1] / "models" / "iforest.joblib"
+
+
+def schema_hash(feats: pd.DataFrame, feature_cols) -> str:
+    missing = [c for c in feature_cols if c not in feats.columns]
+    if missing:
+        raise ValueError(f"Feature frame is missing model columns: {missing}")
+    schema = [(c, feats[c].dtype.kind) for c in feature_cols]
+    return hashlib.sha256(json.dumps(schema).encode()).hexdigest()[:16]
+
+
+def fit_model(feats: pd.DataFrame, feature_cols=None, train_start=None, train_end=None,
+              n_estimators=200, max_samples="auto", n_jobs=-1, random_state=42) -> dict:
+    """Fit an IsolationForest on the [train_start, train_end] slice of `feats`."""
+    feature_cols = list(feature_cols or IFOREST_FEATURES)
+    train = feats
+    if train_start is not None:
+        train = train[train["ts"] >= pd.Timestamp(train_start)]
+    if train_end is not None:
+        train = train[train["ts"] <= pd.Timestamp(train_end)]
+    if train.empty:
+        raise ValueError(f"No rows in training window [{train_start}, {train_end}]")
+
+    clf = IsolationForest(n_estimators=n_estimators, max_samples=max_samples, contamination="auto",
+                          n_jobs=n_jobs, random_state=random_state)
+    clf.fit(train[feature_cols].fillna(0.0).values)
+    return {
+        "version": ARTIFACT_VERSION,
+        "model": clf,
+        "feature_cols": feature_cols,
+        "schema_hash": schema_hash(train, feature_cols),
+        "train_window": [str(train["ts"].min()), str(train["ts"].max())],
+        "n_train": int(len(train)),
+        "params": {"n_estimators": n_estimators, "max_samples": max_samples, "random_state": random_state},
+        "sklearn_version": sklearn.__version__,
+        "created_at_utc": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def save_model(artifact: dict, path=DEFAULT_MODEL_PATH) -> Path:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    joblib.dump(artifact, path)
+    return path
+
+
+@functools.lru_cache(maxsize=8)
+def _load_cached(path: str, mtime_ns: int) -> dict:
+    obj = joblib.load(path)
+    if isinstance(obj, IsolationForest):  # bare estimator dumped before the registry existed
+        obj = {"version": ARTIFACT_VERSION, "model": obj, "feature_cols": list(IFOREST_FEATURES),
+               "schema_hash": None}
+    if obj.get("version") != ARTIFACT_VERSION:
+        raise ValueError(f"Unsupported model artifact version {obj.get('version')} in {path}")
+    return obj
+
+
+def load_model(path=DEFAULT_MODEL_PATH) -> dict:
+    """Load an artifact; repeated calls return the cached object until the file changes."""
+    path = Path(path).resolve()
+    return _load_cached(str(path), path.stat().st_mtime_ns)
+
+
+def score_model(artifact: dict, feats: pd.DataFrame) -> pd.Series:
+    cols = artifact["feature_cols"]
+    expected = artifact.get("schema_hash")
+    if expected is not None and schema_hash(feats, cols) != expected:
+        raise ValueError("Feature schema does not match the one the model was trained on; refit the model.")
+    scores = -artifact["model"].score_samples(feats[cols].fillna(0.0).values)
+    return pd.Series(scores, index=feats.index, name="iforest_score")
+
+
+def load_or_fit(feats: pd.DataFrame, path=DEFAULT_MODEL_PATH, **fit_kwargs) -> dict:
+    """Load the artifact at `path`, fitting and saving it first if it does not exist."""
+    if not Path(path).exists():
+        save_model(fit_model(feats, **fit_kwargs), path)
+    return load_model(path)
+
+
+# -------------------------------
+# Main
+# -------------------------------
+def main():
+    from src.feature_engineering import build_features
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--transactions", default="./data/transactions.csv")
+    ap.add_argument("--country-risk", default="./data/country_risk.csv")
+    ap.add_argument("--out", default=str(DEFAULT_MODEL_PATH))
+    ap.add_argument("--train-start")
+    ap.add_argument("--train-end")
+    ap.add_argument("--n-estimators", type=int, default=200)
+    ap.add_argument("--max-samples", default="auto", help='"auto", a row count, or a fraction')
+    ap.add_argument("--n-jobs", type=int, default=-1)
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args()
+
+    max_samples = args.max_samples
+    if max_samples != "auto":
+        max_samples = float(max_samples) if "." in max_samples else int(max_samples)
+
+    feats = build_features(pd.read_csv(args.transactions), pd.read_csv(args.country_risk))
+    artifact = fit_model(feats, train_start=args.train_start, train_end=args.train_end,
+                         n_estimators=args.n_estimators, max_samples=max_samples,
+                         n_jobs=args.n_jobs, random_state=args.seed)
+    path = save_model(artifact, args.out)
+    print(f"Wrote: {path} (trained on {artifact['n_train']:,} rows, {artifact['train_window']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+"""
+realtime_scorer.py
+----------------------------------
+Long-lived, per-transaction AML scoring for the payment path.
+
+`StreamingScorer` loads a pre-fitted IsolationForest once, keeps the rolling
+feature state per client in memory and scores a single transaction (or a
+micro-batch) without building a DataFrame:
+
+- rolling 1D/7D/30D counts and sums come from per-client deques with running
+  totals (same (ts - window, ts] frames as `feature_engineering`),
+- `amt_z` uses running per-client amount moments (history up to and
+  including the event),
+- the compiled rule plan from `detect_anomalies` runs on a dict of small arrays,
+- the forest is flattened into node arrays and all trees are walked at once.
+
+Each client's events must arrive in timestamp order (ties are fine): the
+deques only ever evict from the front. An event older than the client's last
+seen event is rejected with a ValueError before any state changes; the JSONL
+front ends answer it with an {"error": ...} line.
+
+USAGE
+-----
+# JSON lines in on stdin, JSON lines out on stdout
+python -m src.realtime_scorer --model models/iforest.joblib < events.jsonl
+
+# or as a local TCP service speaking the same JSONL protocol
+python -m src.realtime_scorer --model models/iforest.joblib --serve 127.0.0.1:8765
+
+An event carries the `transactions.csv` columns, e.g.
+{"tx_id": 1, "client_id": 7, "ts": "2025-10-30 10:15:00", "amount_usd": 9500.0,
+ "channel": "cash", "tx_type": "deposit", "direction": "in",
+ "counterparty_country": "SG", "is_international": 0}
+"""
+import argparse
+import asyncio
+import json
+import math
+import sys
+from collections import deque
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from src.detect_anomalies import IFOREST_FEATURES, RULE_PLAN
+from src.feature_engineering import WINDOWS
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _average_path_length(n) -> np.ndarray:
+    """Expected path length of an unsuccessful BST search over n points."""
+    n = np.asarray(n, dtype=float)
+    out = np.zeros_like(n)
+    two = n == 2
+    big = n > 2
+    out[two] = 1.0
+    out[big] = 2.0 * (np.log(n[big] - 1.0) + np.euler_gamma) - 2.0 * (n[big] - 1.0) / n[big]
+    return out
+
+
+class CompiledForest:
+    """A fitted IsolationForest flattened into node arrays.
+
+    Leaves point back at themselves, so walking every tree `max_depth` steps in
+    lock-step lands each (row, tree) pair on its leaf; each leaf stores its depth
+    plus the average-path-length correction. Scores equal
+    `-IsolationForest.score_samples(X)`.
+    """
+
+    def __init__(self, forest):
+        left, right, feature, threshold, value, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for tree, feats in zip(forest.estimators_, forest.estimators_features_):
+            t = tree.tree_
+            n = t.node_count
+            is_leaf = t.children_left == -1
+            idx = np.arange(n)
+            depth = np.zeros(n, dtype=np.int64)
+            for node in range(n):  # parents precede children in sklearn trees
+                if not is_leaf[node]:
+                    depth[t.children_left[node]] = depth[node] + 1
+                    depth[t.children_right[node]] = depth[node] + 1
+            left.append(np.where(is_leaf, idx, t.children_left) + offset)
+            right.append(np.where(is_leaf, idx, t.children_right) + offset)
+            feature.append(np.where(is_leaf, 0, np.asarray(feats)[np.maximum(t.feature, 0)]))
+            threshold.append(np.where(is_leaf, np.inf, t.threshold))
+            value.append(np.where(is_leaf, depth + _average_path_length(t.n_node_samples), 0.0))
+            roots.append(offset)
+            max_depth = max(max_depth, int(depth.max()))
+            offset += n
+        self.left = np.concatenate(left)
+        self.right = np.concatenate(right)
+        self.feature = np.concatenate(feature)
+        self.threshold = np.concatenate(threshold)
+        self.value = np.concatenate(value)
+        self.roots = np.asarray(roots, dtype=np.int64)
+        self.max_depth = max_depth
+        self.n_features = forest.n_features_in_
+        self.denominator = len(roots) * float(_average_path_length([forest.max_samples_])[0])
+
+    def score(self, X: np.ndarray) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float32).reshape(-1, self.n_features)
+        rows = np.arange(len(X))[:, None]
+        node = np.broadcast_to(self.roots, (len(X), len(self.roots)))
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        depths = self.value[node].sum(axis=1)
+        if self.denominator == 0:
+            return np.full(len(X), 0.5)
+        return 2.0 ** (-depths / self.denominator)
+
+
+class _ClientState:
+    __slots__ = ("frames", "totals", "n", "mean", "m2", "last_ts")
+
+    def __init__(self, n_windows):
+        self.frames = [deque() for _ in range(n_windows)]
+        self.totals = [[0, 0.0, 0, 0, 0] for _ in range(n_windows)]  # cnt, amt, hrc, cash, swift
+        self.n, self.mean, self.m2 = 0, 0.0, 0.0
+        self.last_ts = None
+
+    def push(self, ts_ns, amount, hrc, cash, swift, windows_ns):
+        for frame, tot, win in zip(self.frames, self.totals, windows_ns):
+            frame.append((ts_ns, amount, hrc, cash, swift))
+            tot[0] += 1; tot[1] += amount; tot[2] += hrc; tot[3] += cash; tot[4] += swift
+            lower = ts_ns - win
+            while frame[0][0] <= lower:
+                _, a, h, c, s = frame.popleft()
+                tot[0] -= 1; tot[1] -= a; tot[2] -= h; tot[3] -= c; tot[4] -= s
+            if tot[0] == 1:
+                tot[1] = amount  # drop accumulated float drift whenever the frame restarts
+        self.last_ts = ts_ns
+
+    def observe(self, amount):
+        # Welford update of the running amount moments
+        self.n += 1
+        delta = amount - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (amount - self.mean)
+
+    def z(self, amount):
+        sd = math.sqrt(self.m2 / self.n) if self.n else 0.0
+        return min(max((amount - self.mean) / (sd if sd != 0 else 1.0), -5.0), 10.0)
+
+
+class StreamingScorer:
+    def __init__(self, forest, country_risk: pd.DataFrame, alpha=0.6, windows=WINDOWS,
+                 feature_cols=None, store=None, rules=None):
+        self.forest = forest if isinstance(forest, CompiledForest) else CompiledForest(forest)
+        self.alpha = alpha
+        self.windows = tuple(windows)
+        self.windows_ns = [pd.Timedelta(w).value for w in self.windows]
+        self.feature_cols = list(feature_cols or IFOREST_FEATURES)
+        self.rules = rules or RULE_PLAN
+        self.risk_map = country_risk.set_index("country")["risk_score"].to_dict()
+        self.hr_map = country_risk.set_index("country")["is_high_risk"].to_dict()
+        self.clients = {}
+        if store is not None:
+            self.warm_start(store)
+
+    @classmethod
+    def from_path(cls, model_path, country_risk: pd.DataFrame, **kwargs) -> "StreamingScorer":
+        """Build from a `model_registry` artifact (or a bare joblib-dumped forest)."""
+        from src.model_registry import load_model
+        artifact = load_model(model_path)
+        kwargs.setdefault("feature_cols", artifact["feature_cols"])
+        return cls(artifact["model"], country_risk, **kwargs)
+
+    def warm_start(self, store):
+        """Seed client state from a `feature_store.FeatureStore` checkpoint."""
+        buf = store.buffer.sort_values(["client_id", "ts"], kind="mergesort")
+        ts_ns = buf["ts"].to_numpy().astype("datetime64[ns]").view("int64")
+        cols = zip(buf["client_id"].to_numpy(), ts_ns, buf["amount_usd"].to_numpy(dtype=float),
+                   buf["counterparty_is_high_risk"].to_numpy(), buf["is_cash"].to_numpy(),
+                   buf["is_swift"].to_numpy())
+        for cid, t, a, h, c, s in cols:
+            state = self._state(int(cid))
+            state.push(int(t), float(a), int(h), int(c), int(s), self.windows_ns)
+        for cid, row in store.moments.iterrows():
+            state = self._state(int(cid))
+            state.n, state.mean, state.m2 = int(row["n"]), float(row["mean"]), float(row["m2"])
+
+    def _state(self, cid):
+        state = self.clients.get(cid)
+        if state is None:
+            state = self.clients[cid] = _ClientState(len(self.windows))
+        return state
+
+    @staticmethod
+    def _ts_ns(ts):
+        if isinstance(ts, (int, np.integer)):
+            return int(ts)
+        dt = datetime.fromisoformat(str(ts))
+        if dt.tzinfo is not None:
+            dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+        delta = dt - _EPOCH
+        return (delta.days * 86400 + delta.seconds) * 1_000_000_000 + delta.microseconds * 1000
+
+    def _check_order(self, events) -> list:
+        """Event timestamps (ns); ValueError if a client's events go back in time."""
+        ts_ns, last, late = [], {}, []
+        for e in events:
+            cid, t = int(e["client_id"]), self._ts_ns(e["ts"])
+            prev = last[cid] if cid in last else getattr(self.clients.get(cid), "last_ts", None)
+            if prev is not None and t < prev:
+                late.append(e.get("tx_id"))
+            last[cid] = max(t, prev) if prev is not None else t
+            ts_ns.append(t)
+        if late:
+            raise ValueError(f"Out-of-order events (older than the client's last event), tx_id: {late}")
+        return ts_ns
+
+    def _features(self, event, ts_ns) -> dict:
+        cid = int(event["client_id"])
+        amount = float(event["amount_usd"])
+        cty = event.get("counterparty_country")
+        channel = event.get("channel")
+        hrc = int(self.hr_map.get(cty, 0))
+        cash = int(channel == "cash")
+        swift = int(channel == "swift")
+
+        state = self._state(cid)
+        state.push(ts_ns, amount, hrc, cash, swift, self.windows_ns)
+        state.observe(amount)
+
+        f = {
+            "amount_usd": amount,
+            "direction": event.get("direction"),
+            "counterparty_risk": float(self.risk_map.get(cty, 5)),
+            "counterparty_is_high_risk": hrc,
+            "is_large_tx_abs": int(amount >= 100000),
+            "is_cash": cash,
+            "is_swift": swift,
+            "is_transfer": int(event.get("tx_type") == "transfer"),
+            "is_international": int(event.get("is_international", 0)),
+            "amt_z": state.z(amount),
+        }
+        for win, (cnt, amt, h, c, s) in zip(self.windows, state.totals):
+            f[f"roll_cnt_{win}"] = float(cnt)
+            f[f"roll_amt_sum_{win}"] = amt
+            f[f"roll_amt_mean_{win}"] = amt / cnt
+            f[f"roll_hrc_cnt_{win}"] = float(h)
+            f[f"roll_cash_cnt_{win}"] = float(c)
+            f[f"roll_swift_cnt_{win}"] = float(s)
+        return f
+
+    def score_batch(self, events) -> list:
+        """Score events in arrival order; state is updated as each one is seen.
+
+        Per client, events must not go back in time. Otherwise the whole batch
+        is rejected with a ValueError and no state changes.
+        """
+        feats = [self._features(e, t) for e, t in zip(events, self._check_order(events))]
+        if not feats:
+            return []
+        cols = {k: np.array([f[k] for f in feats]) for k in feats[0]}
+        bits, rule_score = self.rules.evaluate(cols)
+        X = np.column_stack([cols[c] for c in self.feature_cols])
+        iforest = self.forest.score(X)
+        hybrid = self.alpha * iforest + (1 - self.alpha) * rule_score
+        out = []
+        for i, e in enumerate(events):
+            out.append({
+                "tx_id": e.get("tx_id"),
+                "client_id": e["client_id"],
+                "rule_score": float(rule_score[i]),
+                "iforest_score": float(iforest[i]),
+                "hybrid_score": float(hybrid[i]),
+                "rules_hit": self.rules.hit_names(bits[i]),
+            })
+        return out
+
+    def score(self, event) -> dict:
+        return self.score_batch([event])[0]
+
+
+# -------------------------------
+# Front ends
+# -------------------------------
+def run_stdin(scorer: StreamingScorer, stdin=sys.stdin, stdout=sys.stdout):
+    for line in stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            result = scorer.score(json.loads(line))
+        except (ValueError, KeyError, TypeError) as exc:
+            result = {"error": str(exc)}
+        stdout.write(json.dumps(result) + "\n")
+        stdout.flush()
+
+
+async def serve(scorer: StreamingScorer, host="127.0.0.1", port=8765):
+    async def handle(reader, writer):
+        while line := await reader.readline():
+            if not line.strip():
+                continue
+            try:
+                result = scorer.score(json.loads(line))
+            except (ValueError, KeyError, TypeError) as exc:
+                result = {"error": str(exc)}
+            writer.write((json.dumps(result) + "\n").encode())
+            await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--model", required=True, help="model_registry artifact (models/iforest.joblib)")
+    ap.add_argument("--country-risk", default="./data/country_risk.csv")
+    ap.add_argument("--state", help="FeatureStore checkpoint to warm-start client state from")
+    ap.add_argument("--alpha", type=float, default=0.6)
+    ap.add_argument("--serve", help="host:port to listen on instead of reading stdin")
+    args = ap.parse_args()
+
+    cr = pd.read_csv(args.country_risk)
+    store = None
+    if args.state:
+        from src.feature_store import FeatureStore
+        store = FeatureStore.load(args.state, cr)
+    scorer = StreamingScorer.from_path(args.model, cr, alpha=args.alpha, store=store)
+
+    if args.serve:
+        host, port = args.serve.rsplit(":", 1)
+        asyncio.run(serve(scorer, host, int(port)))
+    else:
+        run_stdin(scorer)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+rule_engine.py
+----------------------------------
+A small declarative rule language for AML detection rules.
+
+Rules live in YAML (see `rules.yaml`) as conjunctions of `<column> <op> <value>`
+predicates. `compile_rules` turns them into a `RulePlan` that evaluates every
+distinct predicate once, combines them per rule and returns
+
+- a packed hit bitmask: uint64 words per row, bit r%64 of word r//64 = rule r,
+- the weighted rule score.
+
+The plan works on anything that maps column names to equal-length arrays
+(a DataFrame, or a dict of numpy arrays in the streaming scorer).
+"""
+import re
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+_PREDICATE = re.compile(r"^\s*(\w+)\s*(==|!=|>=|<=|>|<|between|in)\s*(.+?)\s*$")
+_COMPARE = {
+    "==": np.equal, "!=": np.not_equal,
+    ">=": np.greater_equal, ">": np.greater,
+    "<=": np.less_equal, "<": np.less,
+}
+
+
+@dataclass(frozen=True)
+class Predicate:
+    column: str
+    op: str
+    value: object
+
+    def evaluate(self, cols) -> np.ndarray:
+        x = np.asarray(cols[self.column])
+        if self.op == "between":
+            lo, hi = self.value
+            return (x >= lo) & (x <= hi)
+        if self.op == "in":
+            return np.isin(x, list(self.value))
+        return np.asarray(_COMPARE[self.op](x, self.value), dtype=bool)
+
+
+def parse_predicate(text: str, rule_name: str = "?") -> Predicate:
+    m = _PREDICATE.match(str(text))
+    if not m:
+        raise ValueError(f"Rule {rule_name!r}: cannot parse predicate {text!r}")
+    column, op, raw = m.groups()
+    value = yaml.safe_load(raw)
+    if op == "between" and not (isinstance(value, list) and len(value) == 2):
+        raise ValueError(f"Rule {rule_name!r}: 'between' needs [lo, hi], got {raw!r}")
+    if op == "in":
+        if not isinstance(value, list):
+            raise ValueError(f"Rule {rule_name!r}: 'in' needs a list, got {raw!r}")
+        value = tuple(value)
+    elif op == "between":
+        value = tuple(value)
+    return Predicate(column, op, value)
+
+
+class RulePlan:
+    def __init__(self, names, weights, predicates, rule_predicates):
+        self.names = list(names)
+        self.weights = np.asarray(weights, dtype=float)
+        self.predicates = list(predicates)
+        self.rule_predicates = [list(p) for p in rule_predicates]
+        self.n_words = max(1, (len(self.names) + 63) // 64)
+
+    @property
+    def columns(self):
+        return sorted({p.column for p in self.predicates})
+
+    def evaluate(self, cols):
+        """Return (bits, score): bits is (n_rows, n_words) uint64, score is float64."""
+        masks = [p.evaluate(cols) for p in self.predicates]
+        n = len(masks[0]) if masks else len(getattr(cols, "index", ()))
+        bits = np.zeros((n, self.n_words), dtype=np.uint64)
+        score = np.zeros(n, dtype=float)
+        for r, (preds, w) in enumerate(zip(self.rule_predicates, self.weights)):
+            hit = masks[preds[0]]
+            for p in preds[1:]:
+                hit = hit & masks[p]
+            score += w * hit
+            bits[:, r // 64] |= hit.astype(np.uint64) << np.uint64(r % 64)
+        return bits, score
+
+    def hit_matrix(self, bits: np.ndarray) -> np.ndarray:
+        """Unpack (n_rows, n_words) bits into an (n_rows, n_rules) bool matrix."""
+        bits = np.asarray(bits, dtype=np.uint64).reshape(len(bits), -1)
+        r = np.arange(len(self.names))
+        return ((bits[:, r // 64] >> (r % 64).astype(np.uint64)) & np.uint64(1)).astype(bool)
+
+    def hit_names(self, row_bits) -> list:
+        hits = self.hit_matrix(np.asarray(row_bits).reshape(1, -1))[0]
+        return [name for name, hit in zip(self.names, hits) if hit]
+
+
+def compile_rules(specs) -> RulePlan:
+    """Compile rule specs ({name, weight, when: [...]}) into a RulePlan."""
+    names, weights, rule_predicates = [], [], []
+    index = {}
+    for spec in specs:
+        name = spec["name"]
+        if name in names:
+            raise ValueError(f"Duplicate rule name {name!r}")
+        when = spec.get("when") or []
+        if isinstance(when, str):
+            when = [when]
+        if not when:
+            raise ValueError(f"Rule {name!r} has no predicates")
+        preds = []
+        for text in when:
+            pred = parse_predicate(text, name)
+            preds.append(index.setdefault(pred, len(index)))
+        names.append(name)
+        weights.append(float(spec["weight"]))
+        rule_predicates.append(preds)
+    predicates = sorted(index, key=index.get)
+    return RulePlan(names, weights, predicates, rule_predicates)
+
+
+def load_rule_specs(path) -> list:
+    with open(Path(path), "r") as f:
+        doc = yaml.safe_load(f)
+    return doc.get("rules", [])
+
+
+def load_rule_plan(path) -> RulePlan:
+    return compile_rules(load_rule_specs(path))
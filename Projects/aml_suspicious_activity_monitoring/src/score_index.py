@@ -0,0 +1,121 @@
+"""
+score_index.py
+----------------------------------
+Read-side index over a scored AML book, for interactive top-K and drilldowns.
+
+Built once from the scored frame (features + rule_score + iforest_score):
+
+- rows are kept client/time-sorted, with a client_id -> [start, end) row-range
+  table, so a client drilldown is a slice instead of a full scan,
+- row ids pre-sorted by iforest_score and by rule_score let `top_k` find the
+  best hybrid scores for any alpha by scanning only the head of both lists
+  (threshold algorithm), with argpartition for the partial sort,
+- filter columns are stored as categorical codes, so a country/channel/
+  direction filter is one lookup-table gather on the candidate rows.
+
+Slider and filter changes therefore cost O(candidates), not O(book).
+"""
+import numpy as np
+import pandas as pd
+
+INDEX_COLS = [
+    "tx_id", "client_id", "ts", "amount_usd", "channel", "direction", "counterparty_country",
+    "rule_score", "iforest_score", "label_suspicious_injected",
+    "roll_cnt_30D", "roll_hrc_cnt_30D", "roll_cash_cnt_7D",
+]
+FILTER_COLS = ["counterparty_country", "channel", "direction"]
+
+
+class ScoreIndex:
+    def __init__(self, scored: pd.DataFrame, columns=INDEX_COLS):
+        cols = [c for c in columns if c in scored.columns]
+        frame = scored[cols]
+        ids = frame["client_id"].to_numpy()
+        if len(ids) and not (np.all(ids[1:] >= ids[:-1])):
+            frame = frame.sort_values(["client_id", "ts"], kind="mergesort")
+        self.frame = frame.reset_index(drop=True)
+
+        ids = self.frame["client_id"].to_numpy()
+        self.client_ids, first = np.unique(ids, return_index=True)
+        self.offsets = np.r_[first, len(ids)]
+
+        self.rule = self.frame["rule_score"].to_numpy(dtype=float)
+        self.iforest = self.frame["iforest_score"].to_numpy(dtype=float)
+        row_dtype = np.int32 if len(self.frame) < 2**31 else np.int64
+        self.by_rule = np.argsort(-self.rule, kind="stable").astype(row_dtype)
+        self.by_iforest = np.argsort(-self.iforest, kind="stable").astype(row_dtype)
+        self._rule_desc = -self.rule[self.by_rule]  # ascending, for searchsorted
+        self._iforest_desc = -self.iforest[self.by_iforest]
+
+        self.codes, self.categories = {}, {}
+        for c in FILTER_COLS:
+            cat = self.frame[c].astype("category")
+            self.codes[c] = cat.cat.codes.to_numpy()
+            self.categories[c] = list(cat.cat.categories)
+
+    def __len__(self):
+        return len(self.frame)
+
+    # -------------------------------
+    # Client drilldown
+    # -------------------------------
+    def client_rows(self, client_id) -> slice:
+        i = np.searchsorted(self.client_ids, client_id)
+        if i == len(self.client_ids) or self.client_ids[i] != client_id:
+            return slice(0, 0)
+        return slice(int(self.offsets[i]), int(self.offsets[i + 1]))
+
+    def client_frame(self, client_id) -> pd.DataFrame:
+        """The client's rows in ts order."""
+        return self.frame.iloc[self.client_rows(client_id)]
+
+    # -------------------------------
+    # Top-K
+    # -------------------------------
+    def _keep(self, rows: np.ndarray, min_rule, min_iforest, filters) -> np.ndarray:
+        mask = (self.rule[rows] >= min_rule) & (self.iforest[rows] >= min_iforest)
+        for col, values in filters.items():
+            if values:
+                allowed = np.zeros(len(self.categories[col]) + 1, dtype=bool)  # last slot: code -1 (NaN)
+                allowed[[self.categories[col].index(v) for v in values if v in self.categories[col]]] = True
+                mask &= allowed[self.codes[col][rows]]
+        return rows[mask]
+
+    def top_k(self, k: int, alpha=0.6, min_rule=0.0, min_iforest=0.0, **filters) -> pd.DataFrame:
+        """Rows with the highest `alpha*iforest + (1-alpha)*rule` passing the filters.
+
+        `filters` maps a FILTER_COLS name to the allowed values (empty = all).
+        Returns the `frame` rows plus `hybrid_score`, best first.
+        """
+        unknown = set(filters) - set(FILTER_COLS)
+        if unknown:
+            raise ValueError(f"Unknown filter columns: {sorted(unknown)}")
+        if not 0.0 <= alpha <= 1.0:
+            raise ValueError(f"alpha must be in [0, 1], got {alpha}")
+        # rows passing the score floors all sit in the first n_i / n_r entries of the sorted lists
+        n_i = int(np.searchsorted(self._iforest_desc, -min_iforest, side="right"))
+        n_r = int(np.searchsorted(self._rule_desc, -min_rule, side="right"))
+        b = max(4 * k, 1024)
+        while True:
+            bi, br = min(b, n_i), min(b, n_r)
+            if bi == n_i or br == n_r:
+                # one list is exhausted: it holds every eligible row, so this pass is exact
+                heads = self.by_iforest[:bi] if bi == n_i else self.by_rule[:br]
+            else:
+                heads = np.concatenate([self.by_iforest[:bi], self.by_rule[:br]])
+            rows = self._keep(heads, min_rule, min_iforest, filters)
+            if len(heads) > max(bi, br):
+                rows = np.unique(rows)  # a row can head both lists; dedupe after filtering, it is cheaper
+            hybrid = alpha * self.iforest[rows] + (1 - alpha) * self.rule[rows]
+            if len(rows) > k:
+                part = np.argpartition(-hybrid, k - 1)[:k]
+                rows, hybrid = rows[part], hybrid[part]
+            if bi == n_i or br == n_r:
+                break
+            # any row outside both heads scores at most the hybrid of the two next-in-line scores
+            bound = alpha * self.iforest[self.by_iforest[bi]] + (1 - alpha) * self.rule[self.by_rule[br]]
+            if len(rows) == k and hybrid.min() >= bound:
+                break
+            b *= 4
+        order = np.lexsort((rows, -hybrid))
+        return self.frame.iloc[rows[order]].assign(hybrid_score=hybrid[order])
@@ -0,0 +1,196 @@
+"""
+sql_features.py
+----------------------------------
+DuckDB backend for `build_features`: the same flags, rolling windows and
+per-client z-score, computed with SQL window functions over the
+`transactions` / `country_risk` tables described in `src/schema.sql`.
+
+Sources can be DataFrames, CSV files, single Parquet files or the partitioned
+dataset written by `src/storage.py`. File sources are scanned lazily, so with
+`--memory-limit` / `--temp-dir` DuckDB spills to disk and datasets larger than
+RAM can be processed, writing features straight to Parquet.
+
+Window semantics match the pandas path: each frame is (ts - W, ts] within the
+client, and rows sharing a timestamp only see the rows before them (ties are
+ordered by `tx_id`, which the generator assigns in file order).
+
+USAGE
+-----
+python -m src.sql_features \
+  --transactions data/transactions \
+  --country-risk data/country_risk.csv \
+  --out data/features.parquet \
+  --memory-limit 2GB --temp-dir /tmp/duckdb
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from src.feature_engineering import WINDOWS
+from src.storage import LAYOUT_FILE, PARTITION_COLS
+
+FLAG_COLS = ["counterparty_risk", "counterparty_is_high_risk", "is_large_tx_abs", "is_cash", "is_swift", "is_transfer"]
+SUMMED = {"amt": "amount_usd", "hrc": "counterparty_is_high_risk", "cash": "is_cash", "swift": "is_swift"}
+
+
+def connect(db_path=":memory:", memory_limit=None, temp_directory=None, threads=None):
+    import duckdb
+
+    con = duckdb.connect(str(db_path))
+    if memory_limit:
+        con.execute(f"SET memory_limit = '{memory_limit}'")
+    if temp_directory:
+        con.execute(f"SET temp_directory = '{temp_directory}'")
+    if threads:
+        con.execute(f"SET threads = {int(threads)}")
+    # window output must come back in ORDER BY order, not parallel-scan order
+    con.execute("SET preserve_insertion_order = true")
+    return con
+
+
+def _scan(con, source, name: str) -> str:
+    """SQL relation for a DataFrame or a CSV / Parquet file / partitioned dataset."""
+    if isinstance(source, pd.DataFrame):
+        con.register(f"_{name}_df", source)
+        return f"_{name}_df"
+    path = Path(source)
+    if path.is_dir():
+        layout = json.loads((path / LAYOUT_FILE).read_text())
+        part_col = PARTITION_COLS[layout["partition_by"]]
+        return (f"(SELECT * EXCLUDE ({part_col}) FROM "
+                f"read_parquet('{path.as_posix()}/**/*.parquet', hive_partitioning = true))")
+    if path.suffix == ".parquet":
+        return f"read_parquet('{path.as_posix()}')"
+    return f"read_csv_auto('{path.as_posix()}')"
+
+
+def register_sources(con, transactions, country_risk):
+    """Expose the inputs as `transactions` / `country_risk` views typed per schema.sql."""
+    con.execute(f"""
+        CREATE OR REPLACE VIEW transactions AS
+        SELECT * REPLACE (CAST(ts AS TIMESTAMP) AS ts, CAST(amount_usd AS DOUBLE) AS amount_usd)
+        FROM {_scan(con, transactions, 'transactions')}
+    """)
+    con.execute(f"""
+        CREATE OR REPLACE VIEW country_risk AS
+        SELECT CAST(country AS VARCHAR) AS country, risk_score, is_high_risk
+        FROM {_scan(con, country_risk, 'country_risk')}
+    """)
+
+
+def _interval(win: str) -> str:
+    # RANGE frames are closed; (ts - W, ts] == [ts - (W - 1us), ts] at microsecond resolution
+    return f"INTERVAL '{pd.Timedelta(win) // pd.Timedelta('1us') - 1} microseconds'"
+
+
+def feature_query(tx_cols, windows=WINDOWS) -> str:
+    """SELECT producing `build_features` columns, in the same order, sorted by (client_id, ts)."""
+    window_defs = [
+        "peers AS (PARTITION BY client_id, ts ORDER BY tx_id ROWS BETWEEN 1 FOLLOWING AND UNBOUNDED FOLLOWING)",
+        "client AS (PARTITION BY client_id)",
+    ]
+    aggs = ["COUNT(*) OVER peers AS _p_cnt"]
+    aggs += [f"SUM({col}) OVER peers AS _p_{key}" for key, col in SUMMED.items()]
+    aggs += ["AVG(amount_usd) OVER client AS _mu", "STDDEV_POP(amount_usd) OVER client AS _sd"]
+    rolls = []
+    for i, win in enumerate(windows):
+        window_defs.append(
+            f"w{i} AS (PARTITION BY client_id ORDER BY ts RANGE BETWEEN {_interval(win)} PRECEDING AND CURRENT ROW)"
+        )
+        aggs.append(f"COUNT(*) OVER w{i} AS _w{i}_cnt")
+        aggs += [f"SUM({col}) OVER w{i} AS _w{i}_{key}" for key, col in SUMMED.items()]
+
+        # drop same-timestamp rows that come later in tie order
+        def rolled(key):
+            return f"(_w{i}_{key} - COALESCE(_p_{key}, 0))"
+
+        cnt = f"CAST(_w{i}_cnt - _p_cnt AS DOUBLE)"
+        rolls += [
+            f"{cnt} AS roll_cnt_{win}",
+            f"CAST({rolled('amt')} AS DOUBLE) AS roll_amt_sum_{win}",
+            f"CAST({rolled('amt')} AS DOUBLE) / {cnt} AS roll_amt_mean_{win}",
+            f"CAST({rolled('hrc')} AS DOUBLE) AS roll_hrc_cnt_{win}",
+            f"CAST({rolled('cash')} AS DOUBLE) AS roll_cash_cnt_{win}",
+            f"CAST({rolled('swift')} AS DOUBLE) AS roll_swift_cnt_{win}",
+        ]
+    rolls.append("GREATEST(LEAST((amount_usd - _mu) / CASE WHEN _sd = 0 THEN 1 ELSE _sd END, 10), -5) AS amt_z")
+
+    base_cols = ", ".join(f't."{c}"' for c in tx_cols)
+    out_cols = ", ".join(f'"{c}"' for c in list(tx_cols) + FLAG_COLS)
+    return f"""
+        WITH base AS (
+            SELECT {base_cols},
+                   CAST(COALESCE(cr.risk_score, 5) AS BIGINT) AS counterparty_risk,
+                   CAST(COALESCE(cr.is_high_risk, 0) AS BIGINT) AS counterparty_is_high_risk,
+                   CAST(t.amount_usd >= 100000 AS BIGINT) AS is_large_tx_abs,
+                   CAST(CAST(t.channel AS VARCHAR) = 'cash' AS BIGINT) AS is_cash,
+                   CAST(CAST(t.channel AS VARCHAR) = 'swift' AS BIGINT) AS is_swift,
+                   CAST(CAST(t.tx_type AS VARCHAR) = 'transfer' AS BIGINT) AS is_transfer
+            FROM transactions t
+            LEFT JOIN country_risk cr ON CAST(t.counterparty_country AS VARCHAR) = cr.country
+        ),
+        agg AS (
+            SELECT *, {", ".join(aggs)}
+            FROM base
+            WINDOW {", ".join(window_defs)}
+        )
+        SELECT {out_cols}, {", ".join(rolls)}
+        FROM agg
+        ORDER BY client_id, ts, tx_id
+    """
+
+
+def _tx_columns(con) -> list:
+    return [d[0] for d in con.execute("SELECT * FROM transactions LIMIT 0").description]
+
+
+def build_features_sql(transactions, country_risk, con=None, windows=WINDOWS) -> pd.DataFrame:
+    """`build_features` computed by DuckDB; returns the same columns in the same order."""
+    con = con or connect()
+    register_sources(con, transactions, country_risk)
+    feats = con.execute(feature_query(_tx_columns(con), windows)).df()
+    if isinstance(transactions, pd.DataFrame):
+        # keep the caller's categoricals / int widths for the pass-through columns
+        for c in transactions.columns:
+            if c != "ts" and feats[c].dtype != transactions[c].dtype:
+                feats[c] = feats[c].astype(transactions[c].dtype)
+    return feats
+
+
+def export_features_sql(transactions, country_risk, out_path, con=None, windows=WINDOWS) -> Path:
+    """Stream features to a Parquet file without materializing them in Python."""
+    con = con or connect()
+    register_sources(con, transactions, country_risk)
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    con.execute(f"COPY ({feature_query(_tx_columns(con), windows)}) TO '{out_path.as_posix()}' (FORMAT parquet)")
+    return out_path
+
+
+# -------------------------------
+# Main
+# -------------------------------
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--transactions", default="./data/transactions.csv",
+                    help="CSV, Parquet file, or partitioned dataset directory")
+    ap.add_argument("--country-risk", default="./data/country_risk.csv")
+    ap.add_argument("--out", default="./data/features.parquet")
+    ap.add_argument("--db", default=":memory:", help="DuckDB database file (spill space for large runs)")
+    ap.add_argument("--memory-limit", help='e.g. "2GB"')
+    ap.add_argument("--temp-dir")
+    ap.add_argument("--threads", type=int)
+    args = ap.parse_args()
+
+    con = connect(args.db, memory_limit=args.memory_limit, temp_directory=args.temp_dir, threads=args.threads)
+    t0 = time.perf_counter()
+    out = export_features_sql(args.transactions, args.country_risk, args.out, con=con)
+    n = con.execute(f"SELECT COUNT(*) FROM read_parquet('{out.as_posix()}')").fetchone()[0]
+    print(f"Wrote: {out} ({n:,} rows in {time.perf_counter() - t0:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+storage.py
+----------------------------------
+Columnar storage for the AML pipeline: partitioned Parquet with typed columns.
+
+- transactions are written as a hive-partitioned Parquet dataset, either by
+  month (`month=2024-01/`) or by client hash bucket (`client_bucket=17/`),
+- low-cardinality strings are stored as categoricals (Arrow dictionaries) and
+  `ts` as a real timestamp, so nothing is re-parsed on load,
+- reads support column projection and predicate pushdown: asking for one
+  client or one month only opens the matching partitions/row groups.
+
+CSV stays the import/export format (`import_csv` / `export_csv`).
+Requires `pyarrow` for the Parquet paths.
+"""
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+CATEGORICAL_COLS = ["currency", "channel", "tx_type", "direction", "counterparty_country"]
+INT_COLS = ["tx_id", "client_id", "is_international", "label_suspicious_injected"]
+LAYOUT_FILE = "_layout.json"
+PARTITION_COLS = {"month": "month", "client_hash": "client_bucket"}
+
+
+def to_typed(tx: pd.DataFrame) -> pd.DataFrame:
+    """Apply the transaction schema: datetime64 `ts`, categoricals, int64 ids/flags."""
+    tx = tx.copy()
+    if "ts" in tx.columns:
+        tx["ts"] = pd.to_datetime(tx["ts"])
+    for c in CATEGORICAL_COLS:
+        if c in tx.columns:
+            tx[c] = tx[c].astype("category")
+    for c in INT_COLS:
+        if c in tx.columns:
+            tx[c] = tx[c].astype("int64")
+    if "amount_usd" in tx.columns:
+        tx["amount_usd"] = tx["amount_usd"].astype("float64")
+    return tx
+
+
+def client_bucket(client_ids, n_buckets: int) -> np.ndarray:
+    """Stable hash bucket per client id (same value on every run and machine)."""
+    hashed = pd.util.hash_array(np.asarray(client_ids))
+    return (hashed % np.uint64(n_buckets)).astype(np.int32)
+
+
+# -------------------------------
+# Writes
+# -------------------------------
+def write_transactions(tx: pd.DataFrame, root, partition_by="month", n_buckets=64,
+                       basename_template=None, overwrite=True) -> Path:
+    """Write `tx` as a partitioned Parquet dataset under `root`.
+
+    Pass a distinct `basename_template` (e.g. "part-{chunk}-{{i}}.parquet") with
+    `overwrite=False` to append chunks to the same dataset.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    if partition_by not in PARTITION_COLS:
+        raise ValueError(f"partition_by must be one of {sorted(PARTITION_COLS)}, got {partition_by!r}")
+    root = Path(root)
+    layout = {"partition_by": partition_by, "n_buckets": n_buckets}
+    if not overwrite and (root / LAYOUT_FILE).exists():
+        existing = json.loads((root / LAYOUT_FILE).read_text())
+        if existing != layout:
+            raise ValueError(f"{root} was written with layout {existing}, not {layout}")
+
+    if overwrite and root.exists():
+        if not (root / LAYOUT_FILE).exists() and any(root.iterdir()):
+            raise ValueError(f"Refusing to overwrite {root}: not a transactions dataset")
+        shutil.rmtree(root)
+
+    tx = to_typed(tx)
+    part_col = PARTITION_COLS[partition_by]
+    if partition_by == "month":
+        tx[part_col] = tx["ts"].dt.strftime("%Y-%m")
+    else:
+        tx[part_col] = client_bucket(tx["client_id"], n_buckets)
+    tx = tx.sort_values(["client_id", "ts"], kind="mergesort")
+
+    table = pa.Table.from_pandas(tx, preserve_index=False)
+    ds.write_dataset(
+        table, root, format="parquet",
+        partitioning=ds.partitioning(pa.schema([table.schema.field(part_col)]), flavor="hive"),
+        basename_template=basename_template or "part-{i}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        max_rows_per_group=1 << 20,
+    )
+    root.mkdir(parents=True, exist_ok=True)
+    (root / LAYOUT_FILE).write_text(json.dumps(layout))
+    return root
+
+
+def write_country_risk(cr: pd.DataFrame, path) -> Path:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    cr.to_parquet(path, index=False)
+    return path
+
+
+# -------------------------------
+# Reads
+# -------------------------------
+def read_transactions(root, columns=None, client_ids=None, start=None, end=None) -> pd.DataFrame:
+    """Load transactions, touching only the partitions/row groups that can match.
+
+    columns     projection (partition columns are dropped from the result)
+    client_ids  only these clients
+    start, end  inclusive `ts` bounds (anything `pd.Timestamp` accepts)
+    """
+    import pyarrow.dataset as ds
+
+    root = Path(root)
+    layout = json.loads((root / LAYOUT_FILE).read_text())
+    part_col = PARTITION_COLS[layout["partition_by"]]
+    dataset = ds.dataset(root, format="parquet", partitioning="hive", exclude_invalid_files=True)
+
+    expr = None
+
+    def _and(e):
+        return e if expr is None else expr & e
+
+    if client_ids is not None:
+        ids = [int(c) for c in np.atleast_1d(client_ids)]
+        expr = _and(ds.field("client_id").isin(ids))
+        if part_col == "client_bucket":
+            buckets = sorted(set(client_bucket(np.asarray(ids, dtype=np.int64), layout["n_buckets"]).tolist()))
+            expr = _and(ds.field(part_col).isin(buckets))
+    if start is not None:
+        start = pd.Timestamp(start)
+        expr = _and(ds.field("ts") >= start)
+        if part_col == "month":
+            expr = _and(ds.field(part_col) >= start.strftime("%Y-%m"))
+    if end is not None:
+        end = pd.Timestamp(end)
+        expr = _and(ds.field("ts") <= end)
+        if part_col == "month":
+            expr = _and(ds.field(part_col) <= end.strftime("%Y-%m"))
+
+    cols = None if columns is None else [c for c in columns if c != part_col]
+    df = dataset.to_table(columns=cols, filter=expr).to_pandas()
+    return df.drop(columns=[part_col], errors="ignore")
+
+
+def load_transactions(data_dir, columns=None, client_ids=None, start=None, end=None) -> pd.DataFrame:
+    """Typed transactions from `data_dir/transactions/` (Parquet) or `transactions.csv`.
+
+    Takes the `read_transactions` arguments. The CSV fallback reads the whole
+    file and applies the same filters in memory.
+    """
+    data_dir = Path(data_dir)
+    if (data_dir / "transactions" / LAYOUT_FILE).exists():
+        return read_transactions(data_dir / "transactions", columns=columns, client_ids=client_ids,
+                                 start=start, end=end)
+    usecols = None
+    if columns is not None:
+        usecols = set(columns)
+        usecols |= {"client_id"} if client_ids is not None else set()
+        usecols |= {"ts"} if start is not None or end is not None else set()
+    tx = to_typed(pd.read_csv(data_dir / "transactions.csv", usecols=usecols))
+    keep = np.ones(len(tx), dtype=bool)
+    if client_ids is not None:
+        keep &= tx["client_id"].isin([int(c) for c in np.atleast_1d(client_ids)]).to_numpy()
+    if start is not None:
+        keep &= (tx["ts"] >= pd.Timestamp(start)).to_numpy()
+    if end is not None:
+        keep &= (tx["ts"] <= pd.Timestamp(end)).to_numpy()
+    if not keep.all():
+        tx = tx[keep].reset_index(drop=True)
+    return tx if columns is None else tx[list(columns)]
+
+
+def load_country_risk(data_dir) -> pd.DataFrame:
+    data_dir = Path(data_dir)
+    if (data_dir / "country_risk.parquet").exists():
+        return pd.read_parquet(data_dir / "country_risk.parquet")
+    return pd.read_csv(data_dir / "country_risk.csv")
+
+
+# -------------------------------
+# CSV import / export
+# -------------------------------
+def import_csv(csv_path, root, partition_by="month", n_buckets=64, chunksize=1_000_000) -> Path:
+    """Convert a transactions CSV into a partitioned dataset, chunk by chunk."""
+    for i, chunk in enumerate(pd.read_csv(csv_path, chunksize=chunksize)):
+        write_transactions(chunk, root, partition_by=partition_by, n_buckets=n_buckets,
+                           basename_template=f"part-{i:05d}-{{i}}.parquet", overwrite=(i == 0))
+    return Path(root)
+
+
+def export_csv(root, csv_path, **read_kwargs) -> Path:
+    df = read_transactions(root, **read_kwargs).sort_values("ts", kind="mergesort")
+    df.to_csv(csv_path, index=False)
+    return Path(csv_path)
@@ -1,4 +1,5 @@
 import pathlib
+import sys
 
 import numpy as np
 import pandas as pd
@@ -8,16 +9,16 @@ import streamlit as st
 # CONFIG
 # -------------------------------------------------------------------
 BASE_DIR = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+from rule_engine import RULES  # noqa: E402
+from rule_eval import COUNT_COLS, SEGMENT_COLUMNS, ThresholdSweep, evaluate_frame, metrics_frame, segment_codes  # noqa: E402
+from schema import read_transactions  # noqa: E402
+
 TXN_PATH = BASE_DIR / "data" / "transactions_with_scenarios.csv"
 EVAL_PATH = BASE_DIR / "data" / "rule_evaluation_summary.csv"
 
-RULE_COLUMNS = [
-    "R1_velocity",
-    "R2_cashout",
-    "R3_device_farming",
-    "R4_new_account_abuse",
-    "R5_geo_anomaly",
-]
+RULE_COLUMNS = list(RULES)
 
 
 # -------------------------------------------------------------------
@@ -25,10 +26,7 @@ RULE_COLUMNS = [
 # -------------------------------------------------------------------
 @st.cache_data
 def load_transactions() -> pd.DataFrame:
-    df = pd.read_csv(TXN_PATH)
-    df["txn_ts"] = pd.to_datetime(df["txn_ts"])
-    df["txn_date"] = pd.to_datetime(df["txn_date"])
-    return df
+    return read_transactions(TXN_PATH)
 
 
 @st.cache_data
@@ -37,29 +35,52 @@ def load_rule_eval() -> pd.DataFrame:
 
 
 # -------------------------------------------------------------------
-# METRIC HELPERS
+# PRECOMPUTED INDEXES
+# Built once per session; slider moves only do lookups against them.
 # -------------------------------------------------------------------
-def compute_metrics(y_pred: np.ndarray, y_true: np.ndarray) -> dict:
-    tp = int(((y_pred == 1) & (y_true == 1)).sum())
-    fp = int(((y_pred == 1) & (y_true == 0)).sum())
-    fn = int(((y_pred == 0) & (y_true == 1)).sum())
-    tn = int(((y_pred == 0) & (y_true == 0)).sum())
-
-    precision = tp / (tp + fp) if (tp + fp) > 0 else np.nan
-    recall = tp / (tp + fn) if (tp + fn) > 0 else np.nan
-    fpr = fp / (fp + tn) if (fp + tn) > 0 else np.nan
-    tpr = recall
-
-    return {
-        "tp": tp,
-        "fp": fp,
-        "fn": fn,
-        "tn": tn,
-        "precision": precision,
-        "recall": recall,
-        "fpr": fpr,
-        "tpr": tpr,
-    }
+@st.cache_resource
+def load_sweep(score_col: str) -> ThresholdSweep:
+    """Threshold sweep over a score (or 0/1 rule) column; flagged rows come out
+    highest score first, then fraud first, then largest amount."""
+    tx = load_transactions()
+    y_true = tx["is_fraud"].values
+    return ThresholdSweep(tx[score_col].values, y_true, tiebreak=(y_true, tx["amount"].values))
+
+
+@st.cache_resource
+def load_segment_codes(segment_col: str) -> tuple:
+    return segment_codes(load_transactions(), segment_col)
+
+
+@st.cache_data
+def rule_overlap() -> tuple:
+    """Co-fire matrix and marginal contribution of the individual rules."""
+    tx = load_transactions()
+    rules = [r for r in RULE_COLUMNS if r in tx.columns]
+    evaluator = evaluate_frame(tx, rules)
+    return evaluator.cofire_frame(), evaluator.marginal()
+
+
+@st.cache_data
+def score_histogram(n_bins: int = 19) -> pd.DataFrame:
+    """Per-class risk score counts over fixed bins."""
+    tx = load_transactions()
+    scores = tx["risk_score_rules"].values
+    is_fraud = tx["is_fraud"].values == 1
+    edges = np.linspace(scores.min(), scores.max(), n_bins + 1)
+    # right-closed bins, lowest one closed on both sides (as pd.cut(..., include_lowest=True)):
+    # scores are sums of weights and often sit exactly on an edge
+    bins = np.clip(np.searchsorted(edges, scores, side="left"), 1, n_bins) - 1
+    normal = np.bincount(bins[~is_fraud], minlength=n_bins)
+    fraud = np.bincount(bins[is_fraud], minlength=n_bins)
+    labels = [f"{'[' if i == 0 else '('}{lo:0.2f}, {hi:0.2f}]" for i, (lo, hi) in enumerate(zip(edges[:-1], edges[1:]))]
+    return pd.DataFrame({"normal": normal, "fraud": fraud}, index=labels)
+
+
+def segment_metrics(sweep: ThresholdSweep, threshold: float, segment_col: str) -> pd.DataFrame:
+    codes, levels = load_segment_codes(segment_col)
+    counts = sweep.segment_counts(threshold, codes, len(levels))
+    return metrics_frame(counts, segment=np.asarray(levels, dtype=object))
 
 
 def format_pct(x):
@@ -104,11 +125,11 @@ def show_rule_metrics(metrics: dict):
     c3.metric("False positive rate (FPR)", format_pct(metrics["fpr"]))
 
 
-def show_flagged_distribution(tx: pd.DataFrame, y_pred: np.ndarray):
-    tx = tx.copy()
-    tx["is_flagged"] = y_pred
-    fraud_rate_flagged = tx.loc[tx["is_flagged"] == 1, "is_fraud"].mean()
-    fraud_rate_unflagged = tx.loc[tx["is_flagged"] == 0, "is_fraud"].mean()
+def show_flagged_distribution(metrics: dict):
+    n_flagged = metrics["tp"] + metrics["fp"]
+    n_unflagged = metrics["fn"] + metrics["tn"]
+    fraud_rate_flagged = metrics["tp"] / n_flagged if n_flagged else np.nan
+    fraud_rate_unflagged = metrics["fn"] / n_unflagged if n_unflagged else np.nan
 
     st.markdown("#### Fraud rate: flagged vs not flagged")
     dist_df = pd.DataFrame(
@@ -124,13 +145,11 @@ def show_flagged_distribution(tx: pd.DataFrame, y_pred: np.ndarray):
     st.caption("Fraud prevalence among flagged vs non-flagged transactions.")
 
 
-def show_sample_transactions(tx: pd.DataFrame, y_pred: np.ndarray, title_suffix: str):
-    tx = tx.copy()
-    tx["is_flagged"] = y_pred
-
+def show_sample_transactions(tx: pd.DataFrame, sweep: ThresholdSweep, threshold: float, title_suffix: str):
     st.markdown(f"#### Sample flagged transactions ({title_suffix})")
 
-    flagged = tx[tx["is_flagged"] == 1].copy()
+    # prefix of the score-sorted index: no full filter or sort per slider move
+    flagged = tx.iloc[sweep.flagged_rows(threshold, limit=50)]
     if flagged.empty:
         st.info("No transactions flagged under current settings.")
         return
@@ -150,15 +169,38 @@ def show_sample_transactions(tx: pd.DataFrame, y_pred: np.ndarray, title_suffix:
     ]
     cols = [c for c in cols if c in flagged.columns]
 
-    # Prioritize suspicious-looking transactions: fraud first, then high amount
-    flagged = flagged.sort_values(["is_fraud", "amount"], ascending=[False, False])
+    st.dataframe(
+        flagged[cols],
+        use_container_width=True,
+        hide_index=True,
+    )
+    st.caption("Top 50 flagged transactions (highest score first, then fraud, then largest amounts).")
+
 
+def show_segment_breakdown(tx: pd.DataFrame, sweep: ThresholdSweep, threshold: float):
+    st.markdown("#### Breakdown by segment")
+
+    options = [c for c in SEGMENT_COLUMNS if c in tx.columns or (c == "week" and "txn_ts" in tx.columns)]
+    segment_col = st.selectbox("Segment by", options=options)
+    seg_df = segment_metrics(sweep, threshold, segment_col)
     st.dataframe(
-        flagged[cols].head(50),
+        seg_df[["segment"] + COUNT_COLS + ["precision", "recall", "fpr"]],
         use_container_width=True,
         hide_index=True,
     )
-    st.caption("Top 50 flagged transactions (fraud first, then largest amounts).")
+
+
+def show_rule_overlap():
+    st.markdown("#### Rule overlap")
+
+    cofire, marginal = rule_overlap()
+    left, right = st.columns(2)
+    with left:
+        st.dataframe(cofire, use_container_width=True)
+        st.caption("Transactions on which both rules fire (diagonal: each rule's own hits).")
+    with right:
+        st.dataframe(marginal, use_container_width=True, hide_index=True)
+        st.caption("Fraud / normal transactions flagged by this rule and no other.")
 
 
 def show_risk_score_distribution(tx: pd.DataFrame):
@@ -168,21 +210,8 @@ def show_risk_score_distribution(tx: pd.DataFrame):
         st.info("No `risk_score_rules` column found in transactions.")
         return
 
-    # simple binned distribution per class
-    bins = np.linspace(tx["risk_score_rules"].min(), tx["risk_score_rules"].max(), 20)
-    tx["score_bin"] = pd.cut(tx["risk_score_rules"], bins=bins, include_lowest=True)
-
-    dist = (
-        tx.groupby(["score_bin", "is_fraud"])["txn_id"]
-        .count()
-        .reset_index(name="count")
-    )
-    # pivot for stacked-style view
-    pivot = dist.pivot(index="score_bin", columns="is_fraud", values="count").fillna(0)
-    pivot.columns = ["normal", "fraud"] if len(pivot.columns) == 2 else pivot.columns
-
-    pivot.index = pivot.index.astype(str)
-    st.bar_chart(pivot, height=260)
+    # binned once per session, not per slider move
+    st.bar_chart(score_histogram(), height=260)
     st.caption("Higher scores should concentrate more fraud transactions if rules are effective.")
 
 
@@ -241,10 +270,8 @@ def page_rule_console():
             f"Using **risk_score_rules ≥ {threshold:0.1f}** as the flagging threshold for the combined ruleset."
         )
 
-        y_pred = (tx["risk_score_rules"].values >= threshold).astype(int)
-        y_true = tx["is_fraud"].values
-
-        metrics = compute_metrics(y_pred, y_true)
+        sweep = load_sweep("risk_score_rules")
+        metrics = sweep.metrics(threshold)
 
         # layout
         top_row = st.container()
@@ -257,12 +284,17 @@ def page_rule_console():
         with bottom_row:
             left, right = st.columns([1.2, 1])
             with left:
-                show_flagged_distribution(tx, y_pred)
+                show_flagged_distribution(metrics)
             with right:
                 show_risk_score_distribution(tx)
 
+        show_segment_breakdown(tx, sweep, threshold)
+
+        st.markdown("---")
+        show_rule_overlap()
+
         st.markdown("---")
-        show_sample_transactions(tx, y_pred, title_suffix=f"risk_score_rules ≥ {threshold:0.1f}")
+        show_sample_transactions(tx, sweep, threshold, title_suffix=f"risk_score_rules ≥ {threshold:0.1f}")
 
     else:
         # Single rule view
@@ -272,9 +304,9 @@ def page_rule_console():
             st.error(f"Column '{rule}' not found in transactions. Did you run the simulation script?")
             return
 
-        y_pred = tx[rule].values
-        y_true = tx["is_fraud"].values
-        metrics = compute_metrics(y_pred, y_true)
+        # rule columns are 0/1, so "fires" is score >= 1
+        sweep = load_sweep(rule)
+        metrics = sweep.metrics(1)
 
         # show precomputed summary if available
         row_eval = eval_df[eval_df["rule"] == rule]
@@ -294,12 +326,14 @@ def page_rule_console():
         with bottom_row:
             left, right = st.columns([1.2, 1])
             with left:
-                show_flagged_distribution(tx, y_pred)
+                show_flagged_distribution(metrics)
             with right:
                 show_risk_score_distribution(tx)
 
+        show_segment_breakdown(tx, sweep, 1)
+
         st.markdown("---")
-        show_sample_transactions(tx, y_pred, title_suffix=rule)
+        show_sample_transactions(tx, sweep, 1, title_suffix=rule)
 
 
 # -------------------------------------------------------------------
@@ -0,0 +1,98 @@
+"""
+Scale test for the device-graph features.
+
+Builds a synthetic user–device graph (most devices have one or two users,
+plus a heavy tail of farmed devices) and times the array union-find and
+the blocked 2-hop degree. On a small graph, component sizes are checked
+against a per-node BFS like `Quick Python Practice/graph_lite.py`, which is
+also timed.
+
+USAGE
+-----
+python benchmarks/bench_graph_features.py --users 5000000 --edges 20000000
+"""
+import argparse
+import sys
+import time
+from collections import defaultdict, deque
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from graph_features import connected_components, csr, two_hop_user_degree  # noqa: E402
+
+
+def make_edges(rng, n_users, n_edges):
+    n_devices = int(n_edges * 0.7)
+    users = rng.integers(0, n_users, n_edges)
+    devices = rng.integers(0, n_devices, n_edges)
+    farmed = rng.random(n_edges) < 0.01  # 1% of edges land on a few hundred farm devices
+    devices[farmed] = rng.integers(0, 500, farmed.sum())
+    edge = np.unique(users.astype(np.int64) * n_devices + devices)
+    u, d = np.divmod(edge, n_devices)
+    return u, d, n_devices
+
+
+def bfs_component_sizes(u, d, n_users):
+    """Per-node BFS over a dict-of-sets graph, as in graph_lite.py."""
+    g = defaultdict(set)
+    for a, b in zip(u.tolist(), d.tolist()):
+        g[("u", a)].add(("d", b))
+        g[("d", b)].add(("u", a))
+    size = np.ones(n_users, dtype=np.int64)
+    seen = set()
+    for a in range(n_users):
+        if ("u", a) in seen:
+            continue
+        q, comp = deque([("u", a)]), []
+        seen.add(("u", a))
+        while q:
+            x = q.popleft()
+            if x[0] == "u":
+                comp.append(x[1])
+            for y in g[x]:
+                if y not in seen:
+                    seen.add(y)
+                    q.append(y)
+        size[comp] = len(comp)
+    return size
+
+
+def component_sizes(u, d, n_users, n_devices):
+    labels = connected_components(n_users + n_devices, u, d + n_users)[:n_users]
+    _, comp_id, counts = np.unique(labels, return_inverse=True, return_counts=True)
+    return counts[comp_id]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=5_000_000)
+    ap.add_argument("--edges", type=int, default=20_000_000)
+    ap.add_argument("--check-users", type=int, default=50_000)
+    args = ap.parse_args()
+    rng = np.random.default_rng(0)
+
+    u, d, n_devices = make_edges(rng, args.check_users, args.check_users * 2)
+    t0 = time.perf_counter()
+    ref = bfs_component_sizes(u, d, args.check_users)
+    bfs_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    got = component_sizes(u, d, args.check_users, n_devices)
+    uf_s = time.perf_counter() - t0
+    assert (ref == got).all()
+    print(f"check: {len(u):,} edges  BFS {bfs_s:.2f}s  union-find {uf_s:.3f}s  component sizes match")
+
+    u, d, n_devices = make_edges(rng, args.users, args.edges)
+    print(f"graph: users={args.users:,} devices={n_devices:,} edges={len(u):,}")
+    t0 = time.perf_counter()
+    labels = connected_components(args.users + n_devices, u, d + args.users)
+    n_comp = len(np.unique(labels[:args.users]))
+    print(f"components: {n_comp:,} in {time.perf_counter() - t0:.2f}s")
+    t0 = time.perf_counter()
+    two_hop = two_hop_user_degree(csr(u, d, args.users), csr(d, u, n_devices))
+    print(f"2-hop degree: max={two_hop.max():,} mean={two_hop.mean():.2f} in {time.perf_counter() - t0:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
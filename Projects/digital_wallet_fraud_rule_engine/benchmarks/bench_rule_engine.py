@@ -0,0 +1,65 @@
+"""
+Batch vs streaming parity and per-event latency of `RuleEngine`.
+
+Loads the `generate` and `features` stage outputs of the last pipeline run.
+The feature frame is scored with `score_batch`. The raw transactions are then
+replayed in txn_id order through `score_event`, with reference state from
+the users, device mapping and graph features. Every rule hit, score and flag
+must match the batch result. Per-event decision latency is reported as
+p50/p99.
+
+USAGE
+-----
+python run_fraud_sim_and_rules.py
+python benchmarks/bench_rule_engine.py
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from graph_features import user_graph_features  # noqa: E402
+from rule_engine import RuleEngine, latency_profile  # noqa: E402
+from run_fraud_sim_and_rules import CACHE_DIR  # noqa: E402
+from stage_cache import StageCache  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--cache-dir", default=str(CACHE_DIR))
+    args = ap.parse_args()
+
+    cache = StageCache(args.cache_dir)
+    tx, users, _, mapping = cache.resume("generate", ("tx", "users", "devices", "mapping"))
+    (features,) = cache.resume("features", ("tx",))
+    engine = RuleEngine()
+
+    t0 = time.perf_counter()
+    batch = engine.score_batch(features).set_index("txn_id").loc[tx["txn_id"]]
+    batch_s = time.perf_counter() - t0
+    print(f"batch:  {len(batch):,} rows in {batch_s:.3f}s ({len(batch) / batch_s:,.0f} rows/s)")
+
+    engine.load_reference(users, mapping, graph=user_graph_features(tx, mapping))
+    events = tx.sort_values("txn_id")
+    t0 = time.perf_counter()
+    online = engine.replay(events, latency=True)
+    replay_s = time.perf_counter() - t0
+    print(f"replay: {len(online):,} events in {replay_s:.2f}s ({len(online) / replay_s:,.0f} events/s)")
+
+    cols = list(engine.rules) + ["risk_score_rules", "is_flagged_by_rules"]
+    for col in cols:
+        a, b = batch[col].to_numpy(dtype=float), online[col].to_numpy(dtype=float)
+        if not np.array_equal(a, b):
+            raise AssertionError(f"{col}: batch and replay differ on {(a != b).sum():,} transactions")
+    print(f"replay matches batch on {', '.join(cols)}: ok "
+          f"({int(batch['is_flagged_by_rules'].sum()):,} flagged)")
+
+    stats = latency_profile(online["latency_us"])
+    print("score_event latency (us): " + "  ".join(f"{k}={v:.1f}" for k, v in stats.items()))
+
+
+if __name__ == "__main__":
+    main()
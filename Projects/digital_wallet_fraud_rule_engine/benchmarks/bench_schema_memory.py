@@ -0,0 +1,100 @@
+"""
+Memory report for the transaction schema: default `read_csv` dtypes vs
+`schema.read_transactions`.
+
+The scored transactions written by `run_fraud_sim_and_rules.py` are tiled
+to the requested row count (txn_id kept unique) and written as one CSV.
+Each loader then runs in a fresh process, which reports its peak RSS
+growth and the loaded frame's deep memory usage. On the source file, the
+values of both loads are checked to be equal.
+
+USAGE
+-----
+python run_fraud_sim_and_rules.py
+python benchmarks/bench_schema_memory.py --rows 10000000
+"""
+import argparse
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+from schema import read_transactions  # noqa: E402
+
+
+def write_tiled(src, dst, n_rows, chunk_rows=1_000_000):
+    base = pd.read_csv(src)
+    for start in range(0, n_rows, chunk_rows):
+        rows = np.arange(start, min(start + chunk_rows, n_rows))
+        chunk = base.iloc[rows % len(base)].assign(txn_id=rows + 1)
+        chunk.to_csv(dst, mode="w" if start == 0 else "a", header=start == 0, index=False)
+
+
+def load(kind, path):
+    """Runs in a child process; prints 'rss_mb frame_mb seconds'."""
+    rss0 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    t0 = time.perf_counter()
+    if kind == "default":
+        # what the console did before the schema layer
+        df = pd.read_csv(path)
+        df["txn_ts"] = pd.to_datetime(df["txn_ts"])
+        df["txn_date"] = pd.to_datetime(df["txn_date"])
+    else:
+        df = read_transactions(path)
+    secs = time.perf_counter() - t0
+    rss = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss0) / 1024
+    print(f"{rss:.0f} {df.memory_usage(deep=True).sum() / 2**20:.0f} {secs:.1f}")
+
+
+def run_child(kind, path):
+    """(rss_mb, frame_mb, seconds), or None if the loader died (e.g. OOM-killed)."""
+    proc = subprocess.run([sys.executable, __file__, "--child", kind, str(path)], capture_output=True, text=True)
+    if proc.returncode != 0:
+        return None
+    out = proc.stdout.split()
+    return float(out[0]), float(out[1]), float(out[2])
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=10_000_000)
+    ap.add_argument("--source", default=str(ROOT / "data" / "transactions_with_scenarios.csv"))
+    ap.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.child:
+        load(*args.child)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "transactions.csv"
+        t0 = time.perf_counter()
+        write_tiled(args.source, path, args.rows)
+        print(f"rows={args.rows:,}  csv={path.stat().st_size / 2**20:,.0f} MB  written in {time.perf_counter() - t0:.0f}s")
+        for kind in ("default", "schema"):
+            result = run_child(kind, path)
+            if result is None:
+                print(f"{kind:<8} loader process died (out of memory?)")
+                continue
+            rss, frame, secs = result
+            print(f"{kind:<8} peak RSS +{rss:8,.0f} MB   frame {frame:8,.0f} MB   load {secs:6.1f}s")
+
+    sample, typed = pd.read_csv(args.source), read_transactions(args.source)
+    for col in sample.columns:
+        a, b = sample[col], typed[col]
+        if col in ("txn_ts", "txn_date", "signup_ts"):
+            a = pd.to_datetime(a)
+        same = (a.astype(str) == b.astype(str)) | (a.isna() & b.isna())
+        if not same.all() and not np.allclose(a.astype(float), b.astype(float), equal_nan=True):
+            raise AssertionError(f"{col} differs after schema load")
+    print(f"values identical after schema load ({len(sample):,} source rows): ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Rows/sec of the baseline transaction simulator.
+
+Streams `iter_normal_transaction_chunks` for each requested size (chunks are
+generated and dropped, so sizes in the hundreds of millions fit in memory),
+and times the former per-transaction loop on a small sample for comparison.
+The per-type amount means of both versions are checked against each other.
+
+USAGE
+-----
+python benchmarks/bench_simulator.py --rows 10000000 100000000 --users 1000000 --chunk-size 5000000
+"""
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import run_fraud_sim_and_rules as sim
+
+
+def reference_simulate(users, mapping, start_date, n_days, n_txn, rng):
+    """The former per-transaction loop (amounts and device picks only)."""
+    end_date = start_date + timedelta(days=n_days)
+    weights = rng.gamma(2.0, 1.0, size=len(users))
+    weights = weights / weights.sum()
+    chosen_users = rng.choice(users["user_id"].values, size=n_txn, p=weights)
+    tx_ts = pd.to_datetime(rng.uniform(start_date.timestamp(), end_date.timestamp(), n_txn), unit="s")
+    tx_type = rng.choice(sim.TXN_TYPES, size=n_txn, p=sim.TXN_TYPE_P)
+    amounts = []
+    for t in tx_type:
+        amounts.append(float(np.clip(rng.gamma(*sim.AMOUNT_GAMMA[t]), 1, 4000)))
+    user_dev = mapping.groupby("user_id")["device_id"].apply(list).to_dict()
+    device_ids = []
+    for u in chosen_users:
+        devs = user_dev.get(u, [])
+        device_ids.append(int(rng.choice(devs)) if devs else np.nan)
+    return pd.DataFrame({"user_id": chosen_users, "device_id": device_ids, "txn_ts": tx_ts,
+                         "txn_type": tx_type, "amount": np.array(amounts).round(2)})
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, nargs="+", default=[10_000_000])
+    ap.add_argument("--users", type=int, default=1_000_000)
+    ap.add_argument("--devices", type=int, default=750_000)
+    ap.add_argument("--chunk-size", type=int, default=5_000_000)
+    ap.add_argument("--reference-rows", type=int, default=200_000)
+    args = ap.parse_args()
+
+    start_date, n_days = datetime(2025, 1, 1), 90
+    t0 = time.perf_counter()
+    users = sim.generate_base_users(n_users=args.users, start_date=start_date, n_days=n_days)
+    users, devices, mapping = sim.generate_base_devices(users, n_devices=args.devices)
+    print(f"users={args.users:,} devices={args.devices:,}  setup={time.perf_counter() - t0:.2f}s")
+
+    for n in args.rows:
+        t0 = time.perf_counter()
+        kept = 0
+        for chunk in sim.iter_normal_transaction_chunks(users, mapping, start_date, n_days, n, args.chunk_size):
+            kept += len(chunk)
+        secs = time.perf_counter() - t0
+        print(f"rows={n:>13,}  kept={kept:>13,}  {secs:8.2f}s  {n / secs:12,.0f} rows/s", flush=True)
+
+    n = args.reference_rows
+    t0 = time.perf_counter()
+    ref = reference_simulate(users, mapping, start_date, n_days, n, np.random.default_rng(0))
+    secs = time.perf_counter() - t0
+    print(f"per-transaction loop: rows={n:,}  {secs:.2f}s  {n / secs:,.0f} rows/s")
+
+    new = sim.simulate_normal_transactions(users, mapping, start_date, n_days, n_txn=n)
+    ref_means = ref.groupby("txn_type")["amount"].mean()
+    new_means = new.groupby("txn_type", observed=True)["amount"].mean().reindex(ref_means.index)
+    assert np.allclose(new_means, ref_means, rtol=0.05), pd.concat([ref_means, new_means], axis=1)
+    print("per-type amount means within 5% of the loop version: ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Slider-move latency of the tuning console: `ThresholdSweep` lookups vs the
+former full recompute (boolean mask, confusion matrix, filter + sort for the
+top-50 sample).
+
+The sweep is built once (one lexsort + two cumsums); each threshold is then
+a searchsorted plus a prefix slice. Results are checked against the full
+recompute at every benchmarked threshold.
+
+USAGE
+-----
+python benchmarks/bench_threshold_sweep.py --rows 10000000 --lookups 200
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from rule_eval import ThresholdSweep, confusion_counts  # noqa: E402
+
+
+def full_recompute(tx, threshold):
+    """What the console did on every slider move."""
+    y_pred = (tx["risk_score_rules"].values >= threshold).astype(int)
+    counts = confusion_counts(y_pred, tx["is_fraud"].values)[0, 0]
+    flagged = tx[y_pred == 1].sort_values(["risk_score_rules", "is_fraud", "amount"], ascending=False)
+    return counts, flagged.head(50)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=10_000_000)
+    ap.add_argument("--lookups", type=int, default=200)
+    args = ap.parse_args()
+    rng = np.random.default_rng(0)
+
+    n = args.rows
+    is_fraud = (rng.random(n) < 0.05).astype(np.int64)
+    hits = rng.random((5, n)) < np.where(is_fraud == 1, 0.3, 0.03)
+    weights = np.array([1.5, 1.8, 1.2, 1.6, 1.0])
+    tx = pd.DataFrame({
+        "risk_score_rules": (weights[:, None] * hits).sum(axis=0).round(1),
+        "is_fraud": is_fraud,
+        "amount": rng.gamma(2.0, 50.0, n).round(2),
+    })
+
+    t0 = time.perf_counter()
+    sweep = ThresholdSweep(tx["risk_score_rules"].values, is_fraud, tiebreak=(is_fraud, tx["amount"].values))
+    print(f"rows={n:,}  build={time.perf_counter() - t0:.2f}s")
+
+    thresholds = rng.choice(np.arange(0.0, 7.2, 0.1), size=args.lookups)
+    lat = []
+    for thr in thresholds:
+        t0 = time.perf_counter()
+        sweep.metrics(thr)
+        tx.iloc[sweep.flagged_rows(thr, limit=50)]
+        lat.append(time.perf_counter() - t0)
+    lat = np.array(lat) * 1000
+    print(f"sweep lookup: p50={np.percentile(lat, 50):.2f}ms  p99={np.percentile(lat, 99):.2f}ms")
+
+    lat = []
+    for thr in thresholds[:5]:
+        t0 = time.perf_counter()
+        counts, sample = full_recompute(tx, thr)
+        lat.append(time.perf_counter() - t0)
+        assert (sweep.counts(thr) == counts).all()
+        assert (tx.iloc[sweep.flagged_rows(thr, limit=50)].index == sample.index).all()
+    print(f"full recompute: mean={np.mean(lat) * 1000:.0f}ms  (results match)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+Rule engine for the wallet: one rule definition, two ways to run it.
+
+- `RuleEngine.score_batch(frame)`: vectorized over a feature frame built by
+  `run_fraud_sim_and_rules.build_derived_features`; this is what backtests and
+  the pipeline run.
+- `RuleEngine.score_event(event)`: one raw transaction at a time, for online
+  decisions. Velocity comes from per-user sliding windows
+  (`velocity.StreamingVelocity`). Per-user and per-device reference features
+  (signup time, device user count, device-ring graph features) are refreshed
+  offline and loaded with `load_reference`.
+
+Rules are lists of (feature, op, value) clauses that are AND-ed together.
+Both paths evaluate the same clauses with the same operators and sum the same
+weights in the same order. Replaying a history through `score_event`, in
+txn_id order, therefore gives exactly the flags that `score_batch` gives on
+that history (`python benchmarks/bench_rule_engine.py` checks this and reports
+per-event p50/p99 latency).
+"""
+import operator
+import time
+
+import numpy as np
+import pandas as pd
+
+from velocity import VELOCITY_WINDOWS, StreamingVelocity
+
+HIGH_RISK_COUNTRIES = ["ID", "PH", "VN"]
+
+RULES = {
+    # R1: velocity – many tx and high amount in the trailing 24h
+    "R1_velocity": [("txn_count_24h", ">=", 8), ("txn_amount_24h", ">=", 1500)],
+    # R2: cashout after topup – withdrawal/p2p with high trailing-24h amount
+    "R2_cashout": [("txn_type", "in", ("withdrawal", "p2p_transfer")), ("txn_amount_24h", ">=", 2000)],
+    # R3: device farming – device shared across many users with decent amount
+    "R3_device_farming": [("device_user_count", ">=", 3), ("amount", ">=", 200)],
+    # R4: new account high spend within 24h
+    "R4_new_account_abuse": [
+        ("time_since_signup_hours", ">=", 0), ("time_since_signup_hours", "<=", 24), ("amount", ">=", 250),
+    ],
+    # R5: geo anomaly – high amount from high-risk country
+    "R5_geo_anomaly": [("is_high_risk_country", "==", 1), ("amount", ">=", 600)],
+    # R6: device ring – user linked through shared devices to many other users. No component fraud rate
+    # clause: it needs labels from an earlier period, which the pipeline does not have (graph_features.py)
+    "R6_device_ring": [("two_hop_user_degree", ">=", 3)],
+}
+
+# combined score = weighted sum of rule hits. R1-R5 weights and the threshold are the original hand-set
+# values, not optimizer output; rule_optimizer.py searches alternatives (and `--apply` re-scores the saved
+# transactions with its best), but nothing it finds is written back here
+RULE_WEIGHTS = {
+    "R1_velocity": 1.5,
+    "R2_cashout": 1.8,
+    "R3_device_farming": 1.2,
+    "R4_new_account_abuse": 1.6,
+    "R5_geo_anomaly": 1.0,
+    # input only until rule_optimizer.py shows a weight that helps: without the leaked fraud rate R6 fires on
+    # ~30% of transactions at ~0.085 precision (0.065 base rate) and mostly repeats R3's device-sharing signal
+    "R6_device_ring": 0.0,
+}
+FLAG_THRESHOLD = 1.5
+
+# op -> (vectorized on a Series, scalar on one value); NaN / missing never matches
+_OPS = {
+    ">=": (operator.ge, operator.ge),
+    ">": (operator.gt, operator.gt),
+    "<=": (operator.le, operator.le),
+    "<": (operator.lt, operator.lt),
+    "==": (operator.eq, operator.eq),
+    "in": (lambda col, values: col.isin(values), lambda x, values: x in values),
+}
+
+# per-user reference features looked up by score_event
+USER_REFERENCE = ["signup_ts", "two_hop_user_degree"]
+
+
+def device_user_counts(mapping):
+    """
+    Distinct users per device, indexed by device_id.
+    """
+    return mapping.groupby("device_id")["user_id"].nunique().rename("device_user_count")
+
+
+def _missing(x):
+    return x is None or x is pd.NA or (isinstance(x, float) and x != x)
+
+
+class RuleEngine:
+    """
+    Weighted rule set scored over a frame (`score_batch`) or event by event
+    (`score_event`, after `load_reference`).
+    """
+
+    def __init__(self, rules=RULES, weights=RULE_WEIGHTS, threshold=FLAG_THRESHOLD, windows=VELOCITY_WINDOWS):
+        for name, clauses in rules.items():
+            for feature, op, _ in clauses:
+                if op not in _OPS:
+                    raise ValueError(f"Rule {name!r}: unknown operator {op!r} on {feature!r}")
+        unknown = set(weights) - set(rules)
+        if unknown:
+            raise ValueError(f"Weights for undefined rules: {sorted(unknown)}")
+        self.rules = rules
+        self.weights = weights
+        self.threshold = threshold
+        self.windows = tuple(windows)
+        self.velocity = StreamingVelocity(self.windows)
+        self._users, self._devices = {}, {}
+
+    # -------------------------------------------------------------------
+    # Batch
+    # -------------------------------------------------------------------
+
+    def rule_hits(self, frame):
+        """
+        {rule: uint8 hit array} over a feature frame.
+        """
+        hits = {}
+        for name, clauses in self.rules.items():
+            hit = np.ones(len(frame), dtype=bool)
+            for feature, op, value in clauses:
+                hit &= _OPS[op][0](frame[feature], value).to_numpy(dtype=bool, na_value=False)
+            hits[name] = hit.astype(np.uint8)
+        return hits
+
+    def score_frame(self, frame):
+        """
+        Add risk_score_rules / is_flagged_by_rules from the rule columns
+        already in `frame` (re-scoring needs no re-evaluation).
+        """
+        score = np.zeros(len(frame))
+        for rule, w in self.weights.items():
+            score += frame[rule].to_numpy() * w
+        return frame.assign(
+            risk_score_rules=score,
+            is_flagged_by_rules=(score >= self.threshold).astype(np.uint8),
+        )
+
+    def score_batch(self, frame):
+        """
+        `frame` plus one 0/1 column per rule, risk_score_rules and
+        is_flagged_by_rules.
+        """
+        return self.score_frame(frame.assign(**self.rule_hits(frame)))
+
+    # -------------------------------------------------------------------
+    # Streaming
+    # -------------------------------------------------------------------
+
+    def reset(self):
+        """
+        Drop all per-user velocity state (reference tables are kept).
+        """
+        self.velocity = StreamingVelocity(self.windows)
+
+    def load_reference(self, users, mapping, graph=None):
+        """
+        Per-user / per-device lookups for score_event: signup time from
+        `users`, distinct users per device from `mapping`, and the columns of
+        `graph` (e.g. `graph_features.user_graph_features`, indexed by user).
+        """
+        profile = users.set_index("user_id")[["signup_ts"]].copy()
+        profile["signup_ts"] = pd.to_datetime(profile["signup_ts"]).to_numpy().astype("datetime64[ns]").view("int64")
+        if graph is not None:
+            profile = profile.join(graph[[c for c in USER_REFERENCE if c in graph.columns]])
+        self._users = profile.to_dict("index")
+        self._devices = device_user_counts(mapping).to_dict()
+
+    def event_features(self, event):
+        """
+        Rule features for one raw transaction, updating its user's velocity
+        windows. `event` needs user_id, device_id, txn_ts, txn_type, amount and
+        country.
+        """
+        user_id, ts = event["user_id"], pd.Timestamp(event["txn_ts"]).as_unit("ns")
+        feats = self.velocity.update(user_id, ts, float(event["amount"]))
+        profile = self._users.get(user_id, {})
+        signup = profile.get("signup_ts")
+        device_id = event.get("device_id")
+        feats.update(
+            txn_type=event["txn_type"],
+            amount=event["amount"],
+            # same arithmetic as Series.dt.total_seconds() / 3600
+            time_since_signup_hours=np.nan if signup is None else (ts.value - signup) / 1e9 / 3600,
+            device_user_count=1 if _missing(device_id) else self._devices.get(device_id, 1),
+            is_high_risk_country=int(event["country"] in HIGH_RISK_COUNTRIES),
+            two_hop_user_degree=profile.get("two_hop_user_degree", np.nan),
+        )
+        return feats
+
+    def score_event(self, event):
+        """
+        Decision for one transaction: {rule: 0/1, "risk_score_rules",
+        "is_flagged_by_rules"}. Events of a user must arrive in time order.
+        """
+        feats = self.event_features(event)
+        out, score = {}, 0.0
+        for name, clauses in self.rules.items():
+            hit = True
+            for feature, op, value in clauses:
+                x = feats[feature]
+                if _missing(x) or not _OPS[op][1](x, value):
+                    hit = False
+                    break
+            out[name] = int(hit)
+        for rule, w in self.weights.items():
+            score += out[rule] * w
+        out["risk_score_rules"] = score
+        out["is_flagged_by_rules"] = int(score >= self.threshold)
+        return out
+
+    def replay(self, events, latency=False):
+        """
+        score_event over every row of `events` in order, as a frame aligned to
+        `events.index`; with `latency`, adds each decision's wall time in
+        microseconds (`latency_us`).
+        """
+        rows, elapsed = [], []
+        records = events[["user_id", "device_id", "txn_ts", "txn_type", "amount", "country"]].to_dict("records")
+        clock = time.perf_counter_ns
+        for event in records:
+            t0 = clock()
+            rows.append(self.score_event(event))
+            elapsed.append(clock() - t0)
+        out = pd.DataFrame(rows, index=events.index)
+        if latency:
+            out["latency_us"] = np.array(elapsed) / 1e3
+        return out
+
+
+def latency_profile(latency_us, quantiles=(0.5, 0.9, 0.99, 0.999)):
+    """
+    {"p50": ..., "p99": ..., "max": ...} in microseconds.
+    """
+    latency_us = np.asarray(latency_us)
+    stats = {f"p{q * 100:g}": float(np.quantile(latency_us, q)) for q in quantiles}
+    stats["max"] = float(latency_us.max())
+    return stats
@@ -0,0 +1,295 @@
+"""
+Rule evaluation kernel for the wallet rule engine.
+
+All rule hit columns are stacked into one uint8 matrix (rules x rows), and
+every rule's confusion counts come from a single `bincount`:
+
+- A flat nonzero scan of the hit matrix lists the fired (rule, row) cells, and one
+  bincount over `rule * K + segment * 2 + is_fraud` gives TP/FP for every rule
+  and segment at once. FN/TN are the per-segment class totals minus those, so
+  rows where a rule does not fire are never visited.
+- The same fired cells give each rule's marginal contribution (fraud / normal
+  rows that no other rule flags). One matmul over the rows where two or more
+  rules fire gives the rule x rule co-fire matrix.
+
+`RuleEvaluator` accumulates all of this over row chunks, so the hit matrix
+never has to exist for the whole dataset at once (500 rules x 100M rows is
+50 GB as uint8).
+"""
+import numpy as np
+import pandas as pd
+
+SEGMENT_COLUMNS = ("country", "risk_segment", "txn_type", "week")
+COUNT_COLS = ["tp", "fp", "fn", "tn"]
+
+
+def _stack_hits(cols, rows):
+    parts = [col[rows] for col in cols]
+    hits = np.empty((len(parts), len(parts[0]) if parts else 0), dtype=np.uint8)
+    for i, part in enumerate(parts):
+        np.not_equal(part, 0, out=hits[i], casting="unsafe")
+    return hits
+
+
+def hit_matrix(tx, rule_cols):
+    """
+    Rules x rows uint8 matrix of the rule flag columns (any non-zero is a hit).
+    """
+    return _stack_hits([tx[c].to_numpy() for c in rule_cols], slice(None))
+
+
+def segment_codes(tx, col):
+    """
+    (codes, levels) for a segment column. "week" is derived from txn_ts
+    (week start date) when the frame has no such column.
+    """
+    if col == "week" and col not in tx.columns:
+        values = pd.to_datetime(tx["txn_ts"]).dt.to_period("W").dt.start_time
+    else:
+        values = tx[col]
+    codes, levels = pd.factorize(values, sort=True, use_na_sentinel=False)
+    return codes, levels
+
+
+def _fired_cells(hits):
+    # flat indices of a row-major matrix: much faster than 2-D np.nonzero
+    flat = np.flatnonzero(hits.view(bool) if hits.dtype == np.uint8 else hits)
+    return np.divmod(flat, hits.shape[1])
+
+
+def _counts(rule_idx, fired_key, key, n_rules, n_segments):
+    k = 2 * n_segments
+    fired = np.bincount(rule_idx * k + fired_key, minlength=n_rules * k).reshape(n_rules, n_segments, 2)
+    totals = np.bincount(key, minlength=k).reshape(n_segments, 2)
+    tp, fp = fired[..., 1], fired[..., 0]
+    return np.stack([tp, fp, totals[:, 1] - tp, totals[:, 0] - fp], axis=-1)
+
+
+def confusion_counts(hits, y_true, seg_codes=None, n_segments=1):
+    """
+    Confusion counts of every rule in every segment: int64 array of shape
+    (rules, segments, 4) in COUNT_COLS order.
+    """
+    hits = np.atleast_2d(hits)
+    y = (np.asarray(y_true) != 0).astype(np.int64)
+    key = y if seg_codes is None else np.asarray(seg_codes, dtype=np.int64) * 2 + y
+    rule_idx, row_idx = _fired_cells(np.ascontiguousarray(hits))
+    return _counts(rule_idx, key[row_idx], key, hits.shape[0], n_segments)
+
+
+def metrics_frame(counts, **keys):
+    """
+    DataFrame of `keys` columns plus tp/fp/fn/tn, precision, recall and fpr
+    for an (n, 4) count array. Undefined ratios are NaN.
+    """
+    counts = np.asarray(counts, dtype=np.int64).reshape(-1, 4)
+    tp, fp, fn, tn = counts.T
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = np.where(tp + fp > 0, tp / (tp + fp), np.nan)
+        recall = np.where(tp + fn > 0, tp / (tp + fn), np.nan)
+        fpr = np.where(fp + tn > 0, fp / (fp + tn), np.nan)
+    frame = pd.DataFrame(keys)
+    for name, values in zip(COUNT_COLS, (tp, fp, fn, tn)):
+        frame[name] = values
+    return frame.assign(precision=precision, recall=recall, fpr=fpr)
+
+
+# -------------------------------------------------------------------
+# Chunked evaluator
+# -------------------------------------------------------------------
+
+class RuleEvaluator:
+    """
+    Confusion counts (overall and per segment column), marginal contribution
+    and co-fire counts, accumulated over row chunks.
+
+    `segment_levels` maps each segment column to its levels; every chunk
+    passes codes into those levels, so chunks must be encoded consistently.
+    """
+
+    def __init__(self, rule_names, segment_levels=None):
+        self.rule_names = list(rule_names)
+        self.segment_levels = {c: list(levels) for c, levels in (segment_levels or {}).items()}
+        n_rules = len(self.rule_names)
+        self.overall = np.zeros((n_rules, 1, 4), dtype=np.int64)
+        self.by_segment = {c: np.zeros((n_rules, len(lv), 4), dtype=np.int64) for c, lv in self.segment_levels.items()}
+        self.sole = np.zeros((n_rules, 2), dtype=np.int64)  # [normal, fraud] rows flagged by this rule only
+        self.cofire = np.zeros((n_rules, n_rules), dtype=np.int64)
+        self.n_rows = 0
+
+    def update(self, hits, y_true, segment_codes=None):
+        """
+        Add one chunk: `hits` is a rules x rows 0/1 matrix, `segment_codes`
+        maps segment columns to per-row codes.
+        """
+        n_rules = len(self.rule_names)
+        if hits.shape[0] != n_rules:
+            raise ValueError(f"Expected {n_rules} rule rows, got {hits.shape[0]}")
+        segment_codes = segment_codes or {}
+        missing = set(self.segment_levels) - set(segment_codes)
+        if missing:
+            raise ValueError(f"Missing segment codes for: {sorted(missing)}")
+
+        hits = np.ascontiguousarray(hits)
+        y = (np.asarray(y_true) != 0).astype(np.int64)
+        rule_idx, row_idx = _fired_cells(hits)
+        fired_y = y[row_idx]
+        self.overall += _counts(rule_idx, fired_y, y, n_rules, 1)
+        for col, levels in self.segment_levels.items():
+            key = np.asarray(segment_codes[col], dtype=np.int64) * 2 + y
+            self.by_segment[col] += _counts(rule_idx, key[row_idx], key, n_rules, len(levels))
+
+        n_fired = np.bincount(row_idx, minlength=hits.shape[1])
+        sole = n_fired[row_idx] == 1
+        self.sole += np.bincount(rule_idx[sole] * 2 + fired_y[sole], minlength=2 * n_rules).reshape(n_rules, 2)
+
+        # the diagonal is each rule's hit count; only rows where 2+ rules fire add off-diagonal pairs
+        self.cofire[np.diag_indices(n_rules)] += np.bincount(rule_idx, minlength=n_rules)
+        multi = hits[:, n_fired > 1]
+        if multi.shape[1]:
+            multi = multi.astype(np.float32 if multi.shape[1] < 2**24 else np.float64)  # float32 counts are exact below 2**24
+            pairs = (multi @ multi.T).astype(np.int64)
+            np.fill_diagonal(pairs, 0)
+            self.cofire += pairs
+        self.n_rows += hits.shape[1]
+
+    # ---------------------------------------------------------------
+    # Results
+    # ---------------------------------------------------------------
+
+    def summary(self):
+        return metrics_frame(self.overall[:, 0], rule=self.rule_names)
+
+    def segments(self):
+        """
+        Long frame: one row per (segment column, segment, rule).
+        """
+        frames = []
+        for col, levels in self.segment_levels.items():
+            counts = self.by_segment[col]
+            frames.append(metrics_frame(
+                counts.reshape(-1, 4),
+                segment_col=col,
+                segment=np.tile(np.asarray(levels, dtype=object), len(self.rule_names)),
+                rule=np.repeat(self.rule_names, len(levels)),
+            ))
+        if not frames:
+            return metrics_frame(np.zeros((0, 4)), segment_col=[], segment=[], rule=[])
+        return pd.concat(frames, ignore_index=True)
+
+    def marginal(self):
+        """
+        Per rule: fraud (`sole_tp`) and normal (`sole_fp`) rows no other rule
+        flags, i.e. what an OR of the other rules would lose without it.
+        """
+        tp = self.overall[:, 0, 0]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            share = np.where(tp > 0, self.sole[:, 1] / tp, np.nan)
+        return pd.DataFrame({
+            "rule": self.rule_names,
+            "sole_tp": self.sole[:, 1],
+            "sole_fp": self.sole[:, 0],
+            "sole_tp_share": share,
+        })
+
+    def cofire_frame(self):
+        """
+        Rule x rule counts of rows where both fire (diagonal: rows each fires on).
+        """
+        return pd.DataFrame(self.cofire, index=self.rule_names, columns=self.rule_names)
+
+
+def evaluate_frame(tx, rule_cols, label_col="is_fraud", segment_cols=(), chunk_rows=65_536):
+    """
+    Run a `RuleEvaluator` over a frame in row chunks of `chunk_rows`.
+    """
+    if chunk_rows < 1:
+        raise ValueError(f"chunk_rows must be positive, got {chunk_rows}")
+    segments = {c: segment_codes(tx, c) for c in segment_cols}
+    evaluator = RuleEvaluator(rule_cols, {c: levels for c, (_, levels) in segments.items()})
+    cols = [tx[c].to_numpy() for c in rule_cols]
+    y = tx[label_col].to_numpy()
+    for start in range(0, len(tx), chunk_rows):
+        rows = slice(start, start + chunk_rows)
+        evaluator.update(
+            _stack_hits(cols, rows),
+            y[rows],
+            {c: codes[rows] for c, (codes, _) in segments.items()},
+        )
+    return evaluator
+
+
+# -------------------------------------------------------------------
+# Threshold sweep
+# -------------------------------------------------------------------
+
+class ThresholdSweep:
+    """
+    Confusion counts of `score >= threshold` for every threshold, from one sort.
+
+    Rows are sorted by descending score, with ties broken by the `tiebreak`
+    columns (also descending). Cumulative sums of positives and negatives
+    along that order give TP/FP for any flagged prefix. A threshold is then a
+    single searchsorted, and the flagged rows are a prefix of `order`, best
+    first.
+    """
+
+    def __init__(self, scores, y_true, tiebreak=()):
+        scores = np.asarray(scores, dtype=float)
+        self._y = (np.asarray(y_true) != 0).astype(np.int64)
+        # lexsort sorts by its last key first
+        keys = [-np.asarray(t, dtype=float) for t in reversed(tiebreak)] + [-scores]
+        self.order = np.lexsort(keys) if len(scores) else np.zeros(0, dtype=np.intp)
+        self._neg_sorted = -scores[self.order]  # ascending, for searchsorted
+        y_sorted = self._y[self.order]
+        self.cum_tp = np.r_[0, np.cumsum(y_sorted)]
+        self.cum_fp = np.r_[0, np.cumsum(1 - y_sorted)]
+
+    def n_flagged(self, threshold):
+        return np.searchsorted(self._neg_sorted, -np.asarray(threshold, dtype=float), side="right")
+
+    def counts(self, threshold):
+        """
+        (..., 4) counts in COUNT_COLS order for a threshold or array of thresholds.
+        """
+        k = self.n_flagged(threshold)
+        tp, fp = self.cum_tp[k], self.cum_fp[k]
+        return np.stack([tp, fp, self.cum_tp[-1] - tp, self.cum_fp[-1] - fp], axis=-1)
+
+    def metrics(self, threshold):
+        """
+        tp/fp/fn/tn, precision, recall (= tpr), fpr and flagged volume at one threshold.
+        """
+        row = metrics_frame(self.counts(threshold)).iloc[0]
+        out = {c: int(row[c]) for c in COUNT_COLS}
+        out.update(precision=float(row["precision"]), recall=float(row["recall"]), fpr=float(row["fpr"]))
+        out["tpr"] = out["recall"]
+        out["flagged"] = out["tp"] + out["fp"]
+        return out
+
+    def table(self, thresholds=None):
+        """
+        Threshold sweep as a frame (default: every distinct score), i.e. the
+        ROC / precision-recall curve.
+        """
+        if thresholds is None:
+            thresholds = np.unique(-self._neg_sorted)[::-1]
+        thresholds = np.asarray(thresholds, dtype=float)
+        counts = self.counts(thresholds)
+        return metrics_frame(counts, threshold=thresholds).assign(flagged=counts[:, 0] + counts[:, 1])
+
+    def flagged_rows(self, threshold, limit=None):
+        """
+        Row positions with score >= threshold, best first.
+        """
+        k = int(self.n_flagged(threshold))
+        return self.order[:k if limit is None else min(k, limit)]
+
+    def segment_counts(self, threshold, seg_codes, n_segments):
+        """
+        (segments, 4) counts at one threshold; only the flagged rows are visited
+        besides the class totals.
+        """
+        rows = self.flagged_rows(threshold)
+        key = np.asarray(seg_codes, dtype=np.int64) * 2 + self._y
+        return _counts(np.zeros(len(rows), dtype=np.int64), key[rows], key, 1, n_segments)[0]
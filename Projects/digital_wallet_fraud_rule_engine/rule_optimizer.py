@@ -0,0 +1,235 @@
+"""
+Rule weight / threshold optimizer for the wallet rule engine.
+
+The combined score only depends on which rules fire, so transactions are
+first compressed into a pattern table: one row per distinct combination of
+rule hits, with its fraud and normal counts (at most 2^6 rows for R1-R6).
+A candidate weight vector then costs O(#patterns): the pattern scores are
+sorted once, and cumulative fraud / normal counts give TP/FP for every
+threshold at the same time.
+
+The weight grid is searched in blocks across processes. The result is the
+best (weights, threshold) for recall under an alert budget and/or precision
+floor, plus the Pareto frontier of alerts vs. caught fraud over all
+candidates.
+
+USAGE
+-----
+python rule_optimizer.py --max-alerts 500 --min-precision 0.2 --workers 4
+python rule_optimizer.py --max-alerts 500 --apply   # re-score the saved transactions
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from rule_eval import hit_matrix
+from schema import read_transactions, write_transactions
+
+DEFAULT_GRID = np.arange(0.0, 2.01, 0.25)
+
+
+def pattern_table(tx, rule_cols, label_col="is_fraud"):
+    """
+    Distinct rule-hit combinations with `n_fraud` / `n_normal` counts.
+    """
+    hits = hit_matrix(tx, rule_cols)
+    codes = np.zeros(len(tx), dtype=np.int64)
+    for i, h in enumerate(hits):
+        codes |= h.astype(np.int64) << i
+    y = (tx[label_col].to_numpy() != 0).astype(np.int64)
+    keys, counts = np.unique(codes * 2 + y, return_counts=True)
+    pattern, is_fraud = np.divmod(keys, 2)
+    patterns, inverse = np.unique(pattern, return_inverse=True)
+    n_fraud = np.bincount(inverse, weights=counts * is_fraud, minlength=len(patterns)).astype(np.int64)
+    n_normal = np.bincount(inverse, weights=counts * (1 - is_fraud), minlength=len(patterns)).astype(np.int64)
+    bits = (patterns[:, None] >> np.arange(len(rule_cols))) & 1
+    table = pd.DataFrame(bits, columns=list(rule_cols))
+    return table.assign(n_fraud=n_fraud, n_normal=n_normal)
+
+
+def _grid_weights(values, n_rules, start, stop):
+    """
+    Rows start..stop of the full grid product, in itertools.product order.
+    """
+    k = len(values)
+    idx = np.arange(start, stop, dtype=np.int64)
+    digits = (idx[:, None] // k ** np.arange(n_rules - 1, -1, -1, dtype=np.int64)) % k
+    return values[digits]
+
+
+def _sweep(weights, bits, n_fraud, n_normal):
+    """
+    For a block of weight vectors: every cut of the score-sorted patterns.
+
+    Returns (scores, tp, fp, valid) shaped (candidates, patterns); cut j
+    flags the first j + 1 patterns, valid where the next score is lower.
+    """
+    scores = weights @ bits.T
+    order = np.argsort(-scores, axis=1, kind="stable")
+    scores = np.take_along_axis(scores, order, axis=1)
+    tp = np.cumsum(n_fraud[order], axis=1)
+    fp = np.cumsum(n_normal[order], axis=1)
+    valid = np.ones_like(scores, dtype=bool)
+    valid[:, :-1] = scores[:, :-1] > scores[:, 1:]
+    return scores, tp, fp, valid
+
+
+def _threshold(scores, j):
+    # midway to the next lower score, so float noise in re-scoring cannot flip the cut
+    nxt = scores[j + 1] if j + 1 < len(scores) else scores[j] - 1.0
+    return float((scores[j] + nxt) / 2)
+
+
+def _frontier(alerts, tp):
+    """
+    Positions of the points not dominated by any other (fewer alerts, more fraud).
+    """
+    order = np.lexsort((-tp, alerts))
+    best = np.maximum.accumulate(tp[order])
+    keep = np.r_[True, best[1:] > best[:-1]]
+    return order[keep]
+
+
+def _search_block(values, bits, n_fraud, n_normal, start, stop, max_alerts, min_precision):
+    weights = _grid_weights(values, bits.shape[1], start, stop)
+    scores, tp, fp, valid = _sweep(weights, bits, n_fraud, n_normal)
+    alerts = tp + fp
+    cand, cut = np.nonzero(valid)
+    pts_tp, pts_alerts = tp[cand, cut], alerts[cand, cut]
+
+    feasible = np.ones(len(cand), dtype=bool)
+    if max_alerts is not None:
+        feasible &= pts_alerts <= max_alerts
+    if min_precision is not None:
+        feasible &= pts_tp >= min_precision * pts_alerts
+    best = None
+    if feasible.any():
+        # most fraud caught, then fewest alerts
+        rank = np.flatnonzero(feasible)
+        i = rank[np.lexsort((pts_alerts[rank], -pts_tp[rank]))[0]]
+        best = (int(pts_tp[i]), int(pts_alerts[i]), weights[cand[i]], _threshold(scores[cand[i]], cut[i]))
+
+    keep = _frontier(pts_alerts, pts_tp)
+    frontier = [
+        (int(pts_tp[i]), int(pts_alerts[i]), weights[cand[i]], _threshold(scores[cand[i]], cut[i]))
+        for i in keep
+    ]
+    return best, frontier
+
+
+def _point(tp, alerts, weights, threshold, rule_cols, n_fraud_total):
+    row = {r: float(w) for r, w in zip(rule_cols, weights)}
+    row.update(
+        threshold=threshold,
+        alerts=alerts,
+        tp=tp,
+        fp=alerts - tp,
+        precision=tp / alerts if alerts else np.nan,
+        recall=tp / n_fraud_total if n_fraud_total else np.nan,
+    )
+    return row
+
+
+def optimize_rules(patterns, rule_cols, weight_grid=DEFAULT_GRID, max_alerts=None, min_precision=None,
+                   workers=None, block_size=4096):
+    """
+    Search weights (every combination of `weight_grid` values) and thresholds.
+
+    Returns (best, frontier): `best` is the dict for the highest recall
+    meeting `max_alerts` / `min_precision` (None if nothing does), and
+    `frontier` the Pareto-optimal operating points, fewest alerts first.
+    """
+    if max_alerts is None and min_precision is None:
+        raise ValueError("Give max_alerts and/or min_precision")
+    values = np.asarray(weight_grid, dtype=float)
+    bits = patterns[list(rule_cols)].to_numpy(dtype=float)
+    n_fraud = patterns["n_fraud"].to_numpy(dtype=np.int64)
+    n_normal = patterns["n_normal"].to_numpy(dtype=np.int64)
+    n_candidates = len(values) ** len(rule_cols)
+    blocks = [(s, min(s + block_size, n_candidates)) for s in range(0, n_candidates, block_size)]
+    args = [(values, bits, n_fraud, n_normal, s, e, max_alerts, min_precision) for s, e in blocks]
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(blocks) == 1:
+        results = [_search_block(*a) for a in args]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            results = list(ex.map(_search_block, *zip(*args)))
+
+    total_fraud = int(n_fraud.sum())
+    feasible = [b for b, _ in results if b is not None]
+    best = None
+    if feasible:
+        best = _point(*min(feasible, key=lambda b: (-b[0], b[1])), rule_cols, total_fraud)
+
+    points = [p for _, f in results for p in f]
+    keep = _frontier(np.array([p[1] for p in points]), np.array([p[0] for p in points]))
+    frontier = pd.DataFrame([_point(*points[i], rule_cols, total_fraud) for i in keep])
+    return best, frontier
+
+
+def evaluate_config(patterns, rule_cols, weights, threshold):
+    """
+    The operating point of one (weights, threshold) on the pattern table.
+    """
+    bits = patterns[list(rule_cols)].to_numpy(dtype=float)
+    flagged = bits @ np.array([weights[r] for r in rule_cols]) >= threshold
+    tp = int(patterns["n_fraud"].to_numpy()[flagged].sum())
+    alerts = tp + int(patterns["n_normal"].to_numpy()[flagged].sum())
+    return _point(tp, alerts, [weights[r] for r in rule_cols], threshold, rule_cols, int(patterns["n_fraud"].sum()))
+
+
+# -------------------------------------------------------------------
+# MAIN
+# -------------------------------------------------------------------
+
+def main():
+    import run_fraud_sim_and_rules as sim
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--max-alerts", type=int, help="Alert budget: most transactions that may be flagged")
+    ap.add_argument("--min-precision", type=float, help="Precision floor, e.g. 0.2")
+    ap.add_argument("--grid", type=float, nargs="+", help="Weight values to try per rule. Default: 0, 0.25, ..., 2")
+    ap.add_argument("--workers", type=int, default=None, help="Default: all cores")
+    ap.add_argument("--apply", action="store_true",
+                    help="Re-score the saved transactions with the best weights and rewrite the evaluation")
+    args = ap.parse_args()
+    if args.max_alerts is None and args.min_precision is None:
+        ap.error("give --max-alerts and/or --min-precision")
+
+    tx = read_transactions(sim.TXN_PATH)
+    t0 = time.perf_counter()
+    patterns = pattern_table(tx, sim.RULE_COLUMNS)
+    grid = DEFAULT_GRID if args.grid is None else np.array(args.grid)
+    best, frontier = optimize_rules(patterns, sim.RULE_COLUMNS, grid, args.max_alerts, args.min_precision,
+                                    workers=args.workers)
+    n_candidates = len(grid) ** len(sim.RULE_COLUMNS)
+    print(f"{len(tx):,} transactions -> {len(patterns)} patterns; "
+          f"{n_candidates:,} weight vectors searched in {time.perf_counter() - t0:.2f}s")
+
+    frontier_path = sim.DATA_DIR / "rule_pareto_frontier.csv"
+    frontier.to_csv(frontier_path, index=False)
+    print(f"Saved Pareto frontier ({len(frontier)} points) to {frontier_path}")
+
+    current = evaluate_config(patterns, sim.RULE_COLUMNS, sim.RULE_WEIGHTS, sim.FLAG_THRESHOLD)
+    print("\nCurrent :", {k: round(v, 4) for k, v in current.items()})
+    if best is None:
+        print("No weights meet the constraints.")
+        return
+    print("Best    :", {k: round(v, 4) for k, v in best.items()})
+
+    if args.apply:
+        weights = {r: best[r] for r in sim.RULE_COLUMNS}
+        tx = sim.score_rules(tx, weights, best["threshold"])
+        sim.evaluate_rules(tx)
+        write_transactions(tx, sim.TXN_PATH)
+        print(f"Re-scored transactions saved to {sim.TXN_PATH}")
+        print("Set RULE_WEIGHTS / FLAG_THRESHOLD in rule_engine.py to keep them for new simulations.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,21 @@
+import argparse
+import time
+
 import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 from pathlib import Path
 
+from graph_features import user_graph_features
+from rule_engine import FLAG_THRESHOLD, HIGH_RISK_COUNTRIES, RULE_WEIGHTS, RULES, RuleEngine, device_user_counts
+from rule_eval import SEGMENT_COLUMNS, evaluate_frame
+from schema import COUNTRIES, RISK_SEGMENTS, STATUSES, TXN_TYPES, apply_schema, write_transactions
+from stage_cache import StageCache
+from velocity import sliding_velocity
+
 
-RNG = np.random.default_rng(123)
+SEED = 123
+RNG = np.random.default_rng(SEED)
 
 BASE_DIR = Path(__file__).resolve().parent
 DATA_DIR = BASE_DIR / "data"
@@ -12,6 +23,14 @@ DATA_DIR.mkdir(exist_ok=True)
 
 TXN_PATH = DATA_DIR / "transactions_with_scenarios.csv"
 EVAL_PATH = DATA_DIR / "rule_evaluation_summary.csv"
+SEGMENT_EVAL_PATH = DATA_DIR / "rule_evaluation_by_segment.csv"
+CACHE_DIR = DATA_DIR / ".cache"
+
+# cached pipeline stages, in order; evaluation always runs
+STAGES = ["generate", "features", "rules"]
+
+# rule definitions, weights and threshold live in rule_engine.py
+RULE_COLUMNS = list(RULES)
 
 
 # -------------------------------------------------------------------
@@ -21,15 +40,17 @@ EVAL_PATH = DATA_DIR / "rule_evaluation_summary.csv"
 def random_ts(start: datetime, end: datetime, size: int):
     start_u = start.timestamp()
     end_u = end.timestamp()
-    return pd.to_datetime(RNG.uniform(start_u, end_u, size), unit="s")
+    # integer ns arithmetic: same values as to_datetime(seconds, unit="s"), without its slow float path
+    ns = (RNG.uniform(start_u, end_u, size) * 1e9).astype(np.int64)
+    return pd.DatetimeIndex(ns.view("datetime64[ns]"))
 
 
 def generate_base_users(n_users=4000, start_date=datetime(2025, 1, 1), n_days=60):
     signup_dates = RNG.integers(0, n_days, size=n_users)
     signup_dates = [start_date + timedelta(days=int(d)) for d in signup_dates]
-    countries = RNG.choice(["SG", "ID", "MY", "PH", "TH", "VN"], size=n_users,
+    countries = RNG.choice(COUNTRIES, size=n_users,
                            p=[0.3, 0.25, 0.15, 0.1, 0.1, 0.1])
-    risk_segment = RNG.choice(["low", "medium", "high"], size=n_users,
+    risk_segment = RNG.choice(RISK_SEGMENTS, size=n_users,
                               p=[0.6, 0.3, 0.1])
 
     users = pd.DataFrame({
@@ -43,18 +64,17 @@ def generate_base_users(n_users=4000, start_date=datetime(2025, 1, 1), n_days=60
 
 def generate_base_devices(users, n_devices=3000):
     device_ids = np.arange(1, n_devices + 1)
-    # each user 1–2 devices
+    # each user 1–2 distinct devices: a second pick is offset from the first, never equal
     n_dev_per_user = RNG.choice([1, 2], size=len(users), p=[0.8, 0.2])
-
-    rows = []
-    for idx, row in users.iterrows():
-        uid = row["user_id"]
-        k = n_dev_per_user[idx]
-        chosen = RNG.choice(device_ids, size=k, replace=False)
-        for d in chosen:
-            rows.append({"user_id": uid, "device_id": int(d)})
-
-    mapping = pd.DataFrame(rows)
+    first = RNG.integers(0, n_devices, size=len(users))
+    second = (first + 1 + RNG.integers(0, max(n_devices - 1, 1), size=len(users))) % n_devices
+    picks = np.column_stack([first, second])
+    keep = np.arange(2) < n_dev_per_user[:, None]
+
+    mapping = pd.DataFrame({
+        "user_id": np.repeat(users["user_id"].to_numpy(), n_dev_per_user),
+        "device_id": device_ids[picks[keep]],
+    })
 
     # device risk features
     devices = pd.DataFrame({
@@ -71,15 +91,32 @@ def generate_base_devices(users, n_devices=3000):
     return users, devices, mapping
 
 
-def simulate_normal_transactions(users, mapping, start_date, n_days, n_txn=80_000):
+TXN_TYPE_P = [0.35, 0.25, 0.3, 0.1]
+# gamma (shape, scale) of the base amount per type
+AMOUNT_GAMMA = {
+    "topup": (2.0, 60),             # ~120
+    "p2p_transfer": (1.5, 40),      # ~60
+    "merchant_payment": (2.0, 50),  # ~100
+    "withdrawal": (2.0, 80),        # ~160
+}
+
+
+def iter_normal_transaction_chunks(users, mapping, start_date, n_days, n_txn=80_000, chunk_size=5_000_000):
     """
     Generate mostly normal behavior: topups, p2p, merchant payments, withdrawals.
     Fraud will be overlaid later.
+
+    Yields DataFrames of up to `chunk_size` draws (fewer rows after dropping
+    pre-signup activity), with txn_id running on across chunks, so `n_txn`
+    can be far larger than memory.
     """
     end_date = start_date + timedelta(days=n_days)
 
-    user_ids = users["user_id"].values
-    signup_ts = pd.to_datetime(users["signup_ts"]).values
+    user_ids = users["user_id"].to_numpy()
+    signup_ts = pd.to_datetime(users["signup_ts"]).to_numpy()
+    # low-cardinality strings travel as categorical codes: building string arrays dominates otherwise
+    countries = pd.Categorical(users["country"])
+    risk_segments = pd.Categorical(users["risk_segment"])
 
     # activity weight: high-risk segments slightly more active
     base_activity = RNG.gamma(2.0, 1.0, size=len(users))
@@ -87,175 +124,163 @@ def simulate_normal_transactions(users, mapping, start_date, n_days, n_txn=80_00
     weights = base_activity * risk_mult
     weights = weights / weights.sum()
 
-    chosen_users = RNG.choice(user_ids, size=n_txn, p=weights)
-    tx_ts = random_ts(start_date, end_date, size=n_txn)
-    tx_type = RNG.choice(
-        ["topup", "p2p_transfer", "merchant_payment", "withdrawal"],
-        size=n_txn,
-        p=[0.35, 0.25, 0.3, 0.1],
-    )
-
-    # base amounts
-    amounts = []
-    for t in tx_type:
-        if t == "topup":
-            amt = RNG.gamma(2.0, 60)   # ~120
-        elif t == "p2p_transfer":
-            amt = RNG.gamma(1.5, 40)   # ~60
-        elif t == "merchant_payment":
-            amt = RNG.gamma(2.0, 50)   # ~100
-        else:  # withdrawal
-            amt = RNG.gamma(2.0, 80)   # ~160
-        amounts.append(float(np.clip(amt, 1, 4000)))
-    amounts = np.array(amounts).round(2)
-
-    # status mostly success
-    status = RNG.choice(
-        ["success", "failed"],
-        size=n_txn,
-        p=[0.94, 0.06],
-    )
-
-    # sample device per user
-    user_dev = mapping.groupby("user_id")["device_id"].apply(list).to_dict()
-    device_ids = []
-    for u in chosen_users:
-        devs = user_dev.get(u, [])
-        if devs:
-            device_ids.append(int(RNG.choice(devs)))
-        else:
-            device_ids.append(np.nan)
-
-    users_idx = users.set_index("user_id")
-    countries = users_idx.loc[chosen_users, "country"].values
-    risk_segment = users_idx.loc[chosen_users, "risk_segment"].values
+    # CSR user -> devices: user k (by position) owns dev_sorted[dev_start[k]:dev_start[k + 1]]
+    dev_pos = pd.Index(user_ids).get_indexer(mapping["user_id"].to_numpy())
+    dev_order = np.argsort(dev_pos, kind="stable")
+    dev_sorted = mapping["device_id"].to_numpy()[dev_order].astype(float)
+    dev_start = np.searchsorted(dev_pos[dev_order], np.arange(len(users) + 1))
+    dev_count = np.diff(dev_start)
+
+    next_id = 1
+    for offset in range(0, n_txn, chunk_size):
+        n = min(chunk_size, n_txn - offset)
+        pos = RNG.choice(len(users), size=n, p=weights)
+        tx_ts = random_ts(start_date, end_date, size=n)
+        type_code = RNG.choice(len(TXN_TYPES), size=n, p=TXN_TYPE_P)
+
+        # base amounts: one masked gamma draw per type
+        amounts = np.empty(n)
+        for code, t in enumerate(TXN_TYPES):
+            mask = type_code == code
+            amounts[mask] = RNG.gamma(*AMOUNT_GAMMA[t], size=int(mask.sum()))
+        amounts = np.clip(amounts, 1, 4000).round(2)
+
+        # status mostly success
+        status = RNG.choice(len(STATUSES), size=n, p=[0.94, 0.06])
+
+        # sample device per user: random offset inside the user's device range
+        counts = dev_count[pos]
+        pick = dev_start[pos] + (RNG.random(n) * counts).astype(np.int64)
+        device_ids = np.where(counts > 0, dev_sorted[np.minimum(pick, len(dev_sorted) - 1)], np.nan)
+
+        # ensure no tx before signup
+        keep = tx_ts.to_numpy() >= signup_ts[pos]
+        pos, tx_ts = pos[keep], tx_ts[keep]
+        n_kept = len(pos)
+
+        # initial "normal" fraud label = 0, scenario = normal
+        yield pd.DataFrame({
+            "txn_id": np.arange(next_id, next_id + n_kept),
+            "user_id": user_ids[pos],
+            "device_id": device_ids[keep],
+            "txn_ts": tx_ts,
+            "txn_date": tx_ts.normalize(),
+            "txn_type": pd.Categorical.from_codes(type_code[keep], TXN_TYPES),
+            "amount": amounts[keep],
+            "status": pd.Categorical.from_codes(status[keep], STATUSES),
+            "country": countries.take(pos),
+            "risk_segment": risk_segments.take(pos),
+            "fraud_scenario": "normal",
+            "is_fraud": 0,
+        })
+        next_id += n_kept
 
-    # initial "normal" fraud label = 0, scenario = normal
-    tx = pd.DataFrame({
-        "txn_id": np.arange(1, n_txn + 1),
-        "user_id": chosen_users,
-        "device_id": device_ids,
-        "txn_ts": tx_ts,
-        "txn_date": pd.to_datetime(tx_ts).date,
-        "txn_type": tx_type,
-        "amount": amounts,
-        "status": status,
-        "country": countries,
-        "risk_segment": risk_segment,
-        "fraud_scenario": "normal",
-        "is_fraud": 0,
-    })
 
-    # ensure no tx before signup
-    users_signup = users.set_index("user_id")["signup_ts"]
-    tx["signup_ts"] = tx["user_id"].map(users_signup)
-    tx["signup_ts"] = pd.to_datetime(tx["signup_ts"])
-    tx = tx[tx["txn_ts"] >= tx["signup_ts"]].copy()
-    tx.drop(columns=["signup_ts"], inplace=True)
-    tx.reset_index(drop=True, inplace=True)
-    tx["txn_id"] = np.arange(1, len(tx) + 1)
-
-    return tx
+def simulate_normal_transactions(users, mapping, start_date, n_days, n_txn=80_000, chunk_size=5_000_000):
+    chunks = iter_normal_transaction_chunks(users, mapping, start_date, n_days, n_txn, chunk_size)
+    return pd.concat(list(chunks), ignore_index=True)
 
 
 # -------------------------------------------------------------------
 # 2) Overlay fraud scenarios
 # -------------------------------------------------------------------
 
-def inject_velocity_attacks(tx, n_attacks=150):
+def user_row_ranges(tx):
     """
-    For chosen users, create short bursts of many outgoing transactions.
+    Index over `tx` sorted by (user_id, txn_ts): returns (order, user_ids,
+    starts, counts) so that user k's rows, oldest first, are
+    tx.iloc[order[starts[k]:starts[k] + counts[k]]].
     """
-    tx = tx.copy()
-    victim_users = RNG.choice(tx["user_id"].unique(), size=n_attacks, replace=False)
-
-    attack_rows = []
-    attack_id_base = tx["txn_id"].max() + 1
-    attack_count = 0
-
-    for u in victim_users:
-        # choose a random time window
-        user_tx = tx[tx["user_id"] == u]
-        if user_tx.empty:
-            continue
-        base_time = user_tx["txn_ts"].sample(1, random_state=int(RNG.integers(0, 1e6))).iloc[0]
-        for _ in range(RNG.integers(5, 20)):  # many small tx
-            ts = base_time + timedelta(minutes=int(RNG.integers(0, 20)))
-            amt = float(np.clip(RNG.gamma(1.0, 50), 5, 800))  # small-mid sized
-            attack_rows.append({
-                "txn_id": attack_id_base + attack_count,
-                "user_id": u,
-                "device_id": tx.loc[user_tx.index[0], "device_id"],
-                "txn_ts": ts,
-                "txn_date": ts.date(),
-                "txn_type": RNG.choice(["p2p_transfer", "merchant_payment"]),
-                "amount": amt,
-                "status": "success",
-                "country": tx.loc[user_tx.index[0], "country"],
-                "risk_segment": tx.loc[user_tx.index[0], "risk_segment"],
-                "fraud_scenario": "velocity_attack",
-                "is_fraud": 1,
-            })
-            attack_count += 1
-
-    if attack_rows:
-        tx_attack = pd.DataFrame(attack_rows)
-        tx = pd.concat([tx, tx_attack], ignore_index=True)
-        tx = tx.sort_values("txn_ts").reset_index(drop=True)
-        tx["txn_id"] = np.arange(1, len(tx) + 1)
+    ts = pd.to_datetime(tx["txn_ts"]).to_numpy()
+    users = tx["user_id"].to_numpy()
+    order = np.lexsort((ts, users))
+    user_ids, starts, counts = np.unique(users[order], return_index=True, return_counts=True)
+    return order, user_ids, starts, counts
 
-    return tx
+
+def velocity_attack_rows(tx, n_attacks=150):
+    """
+    For chosen users, create short bursts of many outgoing transactions.
+    Returns the new rows only; merge them with `merge_injected_rows`.
+    """
+    order, user_ids, starts, counts = user_row_ranges(tx)
+    victims = RNG.choice(len(user_ids), size=min(n_attacks, len(user_ids)), replace=False)
+
+    # burst anchored on a random transaction of the victim; identity from their first one
+    anchor = order[starts[victims] + (RNG.random(len(victims)) * counts[victims]).astype(int)]
+    first = order[starts[victims]]
+    n_burst = RNG.integers(5, 20, size=len(victims))  # many small tx
+    rep_anchor, rep_first = np.repeat(anchor, n_burst), np.repeat(first, n_burst)
+    n = len(rep_anchor)
+
+    ts = pd.to_datetime(tx["txn_ts"]).to_numpy()[rep_anchor] + RNG.integers(0, 20, size=n).astype("timedelta64[m]")
+    rows = pd.DataFrame({
+        "user_id": tx["user_id"].to_numpy()[rep_first],
+        "device_id": tx["device_id"].to_numpy()[rep_first],
+        "txn_ts": ts,
+        "txn_type": RNG.choice(["p2p_transfer", "merchant_payment"], size=n),
+        "amount": np.clip(RNG.gamma(1.0, 50, size=n), 5, 800),  # small-mid sized
+        "status": "success",
+        "country": tx["country"].to_numpy()[rep_first],
+        "risk_segment": tx["risk_segment"].to_numpy()[rep_first],
+        "fraud_scenario": "velocity_attack",
+        "is_fraud": 1,
+    })
+    return rows
 
 
-def inject_cashout_after_topup(tx, n_patterns=200):
+def cashout_after_topup_rows(tx, n_patterns=200):
     """
     Identify large topups and create immediate withdrawals / p2p transfers.
+    Returns the new rows only; merge them with `merge_injected_rows`.
     """
-    tx = tx.copy()
     # choose candidate high-value topups
-    candidates = tx[(tx["txn_type"] == "topup") & (tx["amount"] > 800)].copy()
+    candidates = tx[(tx["txn_type"] == "topup") & (tx["amount"] > 800)]
     if candidates.empty:
-        return tx
+        return tx.iloc[:0].drop(columns=["txn_id", "txn_date"], errors="ignore")
 
     chosen = candidates.sample(min(n_patterns, len(candidates)), random_state=42)
-    new_rows = []
-    new_id_base = tx["txn_id"].max() + 1
-    count = 0
-
-    for _, row in chosen.iterrows():
-        u = row["user_id"]
-        base_time = row["txn_ts"]
-        # simulate 1–3 cashout moves
-        num_moves = int(RNG.integers(1, 4))
-        remaining = row["amount"]
-        for _ in range(num_moves):
-            frac = RNG.uniform(0.3, 0.7)
-            amt = float(np.clip(remaining * frac, 10, remaining))
-            remaining -= amt
-            ts = base_time + timedelta(minutes=int(RNG.integers(5, 60)))
-            new_rows.append({
-                "txn_id": new_id_base + count,
-                "user_id": u,
-                "device_id": row["device_id"],
-                "txn_ts": ts,
-                "txn_date": ts.date(),
-                "txn_type": RNG.choice(["p2p_transfer", "withdrawal"]),
-                "amount": amt,
-                "status": "success",
-                "country": row["country"],
-                "risk_segment": row["risk_segment"],
-                "fraud_scenario": "cashout_after_topup",
-                "is_fraud": 1,
-            })
-            count += 1
-
-    if new_rows:
-        tx_new = pd.DataFrame(new_rows)
-        tx = pd.concat([tx, tx_new], ignore_index=True)
-        tx = tx.sort_values("txn_ts").reset_index(drop=True)
-        tx["txn_id"] = np.arange(1, len(tx) + 1)
+    # simulate 1–3 cashout moves, each taking 30–70% of what is left
+    num_moves = RNG.integers(1, 4, size=len(chosen))
+    remaining = chosen["amount"].to_numpy(dtype=float).copy()
+    parts, src = [], []
+    for k in range(3):
+        active = np.flatnonzero(num_moves > k)
+        frac = RNG.uniform(0.3, 0.7, size=len(active))
+        amt = np.clip(remaining[active] * frac, 10, remaining[active])
+        remaining[active] -= amt
+        parts.append(amt)
+        src.append(active)
+    src, amount = np.concatenate(src), np.concatenate(parts)
+    base = chosen.iloc[src]
+    n = len(src)
+
+    rows = pd.DataFrame({
+        "user_id": base["user_id"].to_numpy(),
+        "device_id": base["device_id"].to_numpy(),
+        "txn_ts": pd.to_datetime(base["txn_ts"]).to_numpy() + RNG.integers(5, 60, size=n).astype("timedelta64[m]"),
+        "txn_type": RNG.choice(["p2p_transfer", "withdrawal"], size=n),
+        "amount": amount,
+        "status": "success",
+        "country": base["country"].to_numpy(),
+        "risk_segment": base["risk_segment"].to_numpy(),
+        "fraud_scenario": "cashout_after_topup",
+        "is_fraud": 1,
+    })
+    return rows
 
-    return tx
+
+def merge_injected_rows(tx, *new_rows):
+    """
+    Append all injected rows in one concat. Rows are left unordered and without
+    txn_id; the dataset is sorted and renumbered once at the end.
+    """
+    new_rows = [r for r in new_rows if len(r)]
+    if not new_rows:
+        return tx
+    added = pd.concat(new_rows, ignore_index=True)
+    added["txn_date"] = added["txn_ts"].dt.normalize()
+    return pd.concat([tx, added], ignore_index=True)
 
 
 def inject_device_farming(tx, device_mapping, n_devices=80):
@@ -290,29 +315,24 @@ def inject_new_account_abuse(tx, users, n_users_abuse=200):
     New users with high spending within first 24h of signup.
     """
     tx = tx.copy()
-    users = users.copy()
 
-    users["signup_ts"] = pd.to_datetime(users["signup_ts"])
+    signup = pd.to_datetime(users.set_index("user_id")["signup_ts"])
     chosen_users = users.sample(min(n_users_abuse, len(users)), random_state=99)["user_id"].values
 
-    # for each chosen user, mark some early high spend as fraud
+    # one vectorized pass: early high spend of chosen users, then half of each user's rows
     tx["txn_ts"] = pd.to_datetime(tx["txn_ts"])
-    users_signup = users.set_index("user_id")["signup_ts"]
-
-    for u in chosen_users:
-        signup = users_signup.loc[u]
-        early_window = signup + timedelta(hours=24)
-        user_early_tx = tx[
-            (tx["user_id"] == u) &
-            (tx["txn_ts"] >= signup) &
-            (tx["txn_ts"] <= early_window) &
-            (tx["amount"] > 200)
-        ]
-        if user_early_tx.empty:
-            continue
-        idx = user_early_tx.sample(frac=0.5, random_state=int(RNG.integers(0, 1e6))).index
-        tx.loc[idx, "fraud_scenario"] = "new_account_abuse"
-        tx.loc[idx, "is_fraud"] = 1
+    user_signup = tx["user_id"].map(signup)
+    early = (
+        tx["user_id"].isin(chosen_users) &
+        (tx["txn_ts"] >= user_signup) &
+        (tx["txn_ts"] <= user_signup + timedelta(hours=24)) &
+        (tx["amount"] > 200)
+    )
+    if not early.any():
+        return tx
+    idx = tx[early].groupby("user_id").sample(frac=0.5, random_state=RNG).index
+    tx.loc[idx, "fraud_scenario"] = "new_account_abuse"
+    tx.loc[idx, "is_fraud"] = 1
 
     return tx
 
@@ -322,8 +342,7 @@ def inject_geo_anomaly(tx, n_events=300):
     Randomly label some large high-risk-country transactions as fraud.
     """
     tx = tx.copy()
-    high_risk_countries = ["ID", "PH", "VN"]
-    mask = (tx["country"].isin(high_risk_countries)) & (tx["amount"] > 500)
+    mask = (tx["country"].isin(HIGH_RISK_COUNTRIES)) & (tx["amount"] > 500)
     candidates = tx[mask]
     if candidates.empty:
         return tx
@@ -347,21 +366,21 @@ def generate_fraud_dataset():
     tx = simulate_normal_transactions(users, mapping, start_date, n_days, n_txn=80_000)
 
     print("Injecting fraud scenarios...")
-    tx = inject_velocity_attacks(tx)
-    tx = inject_cashout_after_topup(tx)
+    # row-adding scenarios are built from the baseline and merged in one pass
+    tx = merge_injected_rows(tx, velocity_attack_rows(tx), cashout_after_topup_rows(tx))
     tx = inject_device_farming(tx, mapping)
     tx = inject_new_account_abuse(tx, users)
     tx = inject_geo_anomaly(tx)
 
-    # final ordering
-    tx = tx.sort_values("txn_ts").reset_index(drop=True)
+    # final ordering: the only sort of the full frame
+    tx = tx.sort_values("txn_ts", kind="stable").reset_index(drop=True)
     tx["txn_id"] = np.arange(1, len(tx) + 1)
 
-    tx.to_csv(TXN_PATH, index=False)
+    tx = write_transactions(tx, TXN_PATH)
     print(f"Saved transactions with fraud scenarios to {TXN_PATH}")
 
     # return also mapping for later use
-    return tx, users, devices, mapping
+    return tx, apply_schema(users), apply_schema(devices), apply_schema(mapping)
 
 
 # -------------------------------------------------------------------
@@ -379,78 +398,35 @@ def build_derived_features(tx, users, mapping):
     tx["signup_ts"] = tx["user_id"].map(users_signup)
     tx["time_since_signup_hours"] = (tx["txn_ts"] - tx["signup_ts"]).dt.total_seconds() / 3600
 
-    # user-level rolling velocity features (coarse: same-day approximation)
+    # user-level sliding-window velocity (10min / 1h / 24h), aligned on the index: no merge
     tx["txn_date"] = tx["txn_ts"].dt.date
-    # group by user & date for counts/sums
-    agg_daily = tx.groupby(["user_id", "txn_date"]).agg(
-        daily_txn_count=("txn_id", "count"),
-        daily_txn_amount=("amount", "sum"),
-    ).reset_index()
-    tx = tx.merge(agg_daily, on=["user_id", "txn_date"], how="left")
+    tx = tx.join(sliding_velocity(tx))
 
     # device-level user count
-    dev_users = mapping.groupby("device_id")["user_id"].nunique().rename("device_user_count").reset_index()
-    tx = tx.merge(dev_users, on="device_id", how="left")
-    tx["device_user_count"].fillna(1, inplace=True)
+    tx = tx.merge(device_user_counts(mapping).reset_index(), on="device_id", how="left")
+    tx["device_user_count"] = tx["device_user_count"].fillna(1)
+
+    # user-device graph: component id / size, 2-hop user degree (no component fraud rate: that needs
+    # labels from an earlier period, never this history's own)
+    tx = tx.join(user_graph_features(tx, mapping), on="user_id")
 
     # country risk flag
-    tx["is_high_risk_country"] = tx["country"].isin(["ID", "PH", "VN"]).astype(int)
+    tx["is_high_risk_country"] = tx["country"].isin(HIGH_RISK_COUNTRIES).astype(int)
     tx["is_high_risk_segment"] = (tx["risk_segment"] == "high").astype(int)
 
-    return tx
+    return apply_schema(tx)
 
 
-def apply_rules(tx):
-    tx = tx.copy()
+def apply_rules(tx, weights=RULE_WEIGHTS, threshold=FLAG_THRESHOLD):
+    # same rule definitions as online scoring (RuleEngine.score_event)
+    return apply_schema(RuleEngine(weights=weights, threshold=threshold).score_batch(tx))
 
-    # R1: velocity – many tx and high amount in a day
-    tx["R1_velocity"] = (
-        (tx["daily_txn_count"] >= 8) &
-        (tx["daily_txn_amount"] >= 1500)
-    ).astype(int)
-
-    # R2: cashout after topup – withdrawal/p2p with high daily amount
-    tx["R2_cashout"] = (
-        (tx["txn_type"].isin(["withdrawal", "p2p_transfer"])) &
-        (tx["daily_txn_amount"] >= 2000)
-    ).astype(int)
-
-    # R3: device farming – device shared across many users with decent amount
-    tx["R3_device_farming"] = (
-        (tx["device_user_count"] >= 3) &
-        (tx["amount"] >= 200)
-    ).astype(int)
-
-    # R4: new account high spend within 24h
-    tx["R4_new_account_abuse"] = (
-        (tx["time_since_signup_hours"] >= 0) &
-        (tx["time_since_signup_hours"] <= 24) &
-        (tx["amount"] >= 250)
-    ).astype(int)
-
-    # R5: geo anomaly – high amount from high-risk country
-    tx["R5_geo_anomaly"] = (
-        (tx["is_high_risk_country"] == 1) &
-        (tx["amount"] >= 600)
-    ).astype(int)
-
-    # risk score = weighted sum
-    weights = {
-        "R1_velocity": 1.5,
-        "R2_cashout": 1.8,
-        "R3_device_farming": 1.2,
-        "R4_new_account_abuse": 1.6,
-        "R5_geo_anomaly": 1.0,
-    }
-    score = np.zeros(len(tx))
-    for r, w in weights.items():
-        score += tx[r].values * w
-    tx["risk_score_rules"] = score
-
-    # flag as suspicious if risk_score >= threshold
-    tx["is_flagged_by_rules"] = (tx["risk_score_rules"] >= 1.5).astype(int)
 
-    return tx
+def score_rules(tx, weights=RULE_WEIGHTS, threshold=FLAG_THRESHOLD):
+    """
+    Combined score from existing rule columns; re-scoring needs no re-simulation.
+    """
+    return apply_schema(RuleEngine(weights=weights, threshold=threshold).score_frame(tx))
 
 
 # -------------------------------------------------------------------
@@ -458,55 +434,18 @@ def apply_rules(tx):
 # -------------------------------------------------------------------
 
 def evaluate_rules(tx):
-    results = []
-
-    for rule_col in ["R1_velocity", "R2_cashout", "R3_device_farming",
-                     "R4_new_account_abuse", "R5_geo_anomaly"]:
-        y_pred = tx[rule_col].values
-        y_true = tx["is_fraud"].values
-
-        tp = int(((y_pred == 1) & (y_true == 1)).sum())
-        fp = int(((y_pred == 1) & (y_true == 0)).sum())
-        fn = int(((y_pred == 0) & (y_true == 1)).sum())
-        tn = int(((y_pred == 0) & (y_true == 0)).sum())
-
-        precision = tp / (tp + fp) if (tp + fp) > 0 else np.nan
-        recall = tp / (tp + fn) if (tp + fn) > 0 else np.nan
-
-        results.append({
-            "rule": rule_col,
-            "tp": tp,
-            "fp": fp,
-            "fn": fn,
-            "tn": tn,
-            "precision": precision,
-            "recall": recall,
-        })
-
-    # overall ruleset (is_flagged_by_rules)
-    y_pred_all = tx["is_flagged_by_rules"].values
-    y_true = tx["is_fraud"].values
-    tp = int(((y_pred_all == 1) & (y_true == 1)).sum())
-    fp = int(((y_pred_all == 1) & (y_true == 0)).sum())
-    fn = int(((y_pred_all == 0) & (y_true == 1)).sum())
-    tn = int(((y_pred_all == 0) & (y_true == 0)).sum())
-    precision = tp / (tp + fp) if (tp + fp) > 0 else np.nan
-    recall = tp / (tp + fn) if (tp + fn) > 0 else np.nan
-
-    results.append({
-        "rule": "ALL_RULES_COMBINED",
-        "tp": tp,
-        "fp": fp,
-        "fn": fn,
-        "tn": tn,
-        "precision": precision,
-        "recall": recall,
-    })
-
-    eval_df = pd.DataFrame(results)
+    # all rules plus the combined flag go through one confusion-count kernel
+    evaluator = evaluate_frame(tx, RULE_COLUMNS + ["is_flagged_by_rules"], segment_cols=SEGMENT_COLUMNS)
+    eval_df = evaluator.summary()[["rule", "tp", "fp", "fn", "tn", "precision", "recall"]]
+    eval_df["rule"] = eval_df["rule"].replace({"is_flagged_by_rules": "ALL_RULES_COMBINED"})
     eval_df.to_csv(EVAL_PATH, index=False)
     print(f"Saved rule evaluation summary to {EVAL_PATH}")
 
+    segment_df = evaluator.segments()
+    segment_df["rule"] = segment_df["rule"].replace({"is_flagged_by_rules": "ALL_RULES_COMBINED"})
+    segment_df.to_csv(SEGMENT_EVAL_PATH, index=False)
+    print(f"Saved per-segment rule evaluation to {SEGMENT_EVAL_PATH}")
+
     return eval_df
 
 
@@ -515,21 +454,42 @@ def evaluate_rules(tx):
 # -------------------------------------------------------------------
 
 def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--from-stage", choices=STAGES,
+                    help="Re-run from this stage, reusing the last run's outputs for earlier stages")
+    ap.add_argument("--no-cache", action="store_true", help="Run every stage and store nothing")
+    args = ap.parse_args()
+
     print("=== Digital Wallet Fraud Simulation & Rule Engine ===")
-    tx, users, devices, mapping = generate_fraud_dataset()
+    cache = StageCache(CACHE_DIR, enabled=not args.no_cache)
+    start = STAGES.index(args.from_stage) if args.from_stage else 0
+
+    def stage(name, fn, inputs, output_names, upstream, config=None):
+        t0 = time.perf_counter()
+        if STAGES.index(name) < start:
+            outputs, status = cache.resume(name, output_names), "resumed"
+        else:
+            outputs, hit = cache.run(name, fn, inputs, output_names, upstream, config, force=args.from_stage is not None)
+            status = "cached" if hit else "ran"
+        print(f"[{name}] {status} in {time.perf_counter() - t0:.2f}s")
+        return outputs
+
+    tx, users, devices, mapping = stage(
+        "generate", generate_fraud_dataset, (), ("tx", "users", "devices", "mapping"), (), config=SEED)
     print(f"Total transactions after fraud injection: {len(tx):,}")
 
     print("Building derived features for rules...")
-    tx_feat = build_derived_features(tx, users, mapping)
+    (tx_feat,) = stage("features", build_derived_features, (tx, users, mapping), ("tx",), ("generate",))
 
     print("Applying rules...")
-    tx_rules = apply_rules(tx_feat)
+    (tx_rules,) = stage("rules", apply_rules, (tx_feat,), ("tx",), ("features",))
+    cache.write_manifest()
 
     print("Evaluating rules vs fraud labels...")
     eval_df = evaluate_rules(tx_rules)
 
     # Save enriched transactions as well
-    tx_rules.to_csv(TXN_PATH, index=False)
+    write_transactions(tx_rules, TXN_PATH)
     print(f"Saved enriched transactions with rule flags to {TXN_PATH}")
 
     print("\nRule evaluation summary:")
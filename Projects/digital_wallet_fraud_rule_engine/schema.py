@@ -0,0 +1,125 @@
+"""
+Column dtypes shared by the simulator, the feature builder, the stage cache
+and the rule console.
+
+One table maps a column name to a compact dtype, whichever frame the column
+appears in (users, device mapping, transactions, scored transactions):
+
+- low-cardinality strings are categoricals over fixed vocabularies, so
+  separately built frames concatenate without falling back to object, and an
+  unknown value raises instead of silently becoming NaN,
+- ids are int32, and `device_id` is nullable Int32 instead of float64 with NaN,
+- 0/1 flags (labels, rule hits) are uint8 and counts are int32.
+
+Money (`amount` and the windowed sums) and every score or rate compared against
+a rule threshold stay float64. float32 would move cent amounts (26.8 becomes
+26.799999) and could flip threshold comparisons.
+"""
+import re
+from pathlib import Path
+
+import pandas as pd
+
+TXN_TYPES = ["topup", "p2p_transfer", "merchant_payment", "withdrawal"]
+STATUSES = ["success", "failed"]
+COUNTRIES = ["SG", "ID", "MY", "PH", "TH", "VN"]
+RISK_SEGMENTS = ["low", "medium", "high"]
+FRAUD_SCENARIOS = [
+    "normal", "velocity_attack", "cashout_after_topup", "device_farming", "new_account_abuse", "geo_anomaly",
+]
+
+SCHEMA = {
+    "txn_id": "int64",
+    "user_id": "int32",
+    "device_id": "Int32",
+    "txn_type": pd.CategoricalDtype(TXN_TYPES),
+    "status": pd.CategoricalDtype(STATUSES),
+    "country": pd.CategoricalDtype(COUNTRIES),
+    "risk_segment": pd.CategoricalDtype(RISK_SEGMENTS),
+    "fraud_scenario": pd.CategoricalDtype(FRAUD_SCENARIOS),
+    "is_fraud": "uint8",
+    "device_user_count": "int32",
+    "component_id": "int32",
+    "component_size": "int32",
+    "two_hop_user_degree": "int32",
+    "is_high_risk_country": "uint8",
+    "is_high_risk_segment": "uint8",
+    "is_flagged_by_rules": "uint8",
+}
+# column families whose members depend on configuration (windows, rule set)
+PATTERNS = [
+    (re.compile(r"^txn_count_\w+$"), "int32"),
+    (re.compile(r"^R\d+_\w+$"), "uint8"),
+]
+DATE_COLUMNS = ["txn_ts", "txn_date", "signup_ts"]
+
+
+def column_dtype(col):
+    """
+    Schema dtype for a column name, or None if the column is not covered.
+    """
+    if col in SCHEMA:
+        return SCHEMA[col]
+    if col in DATE_COLUMNS:
+        return "datetime64[ns]"
+    for pattern, dtype in PATTERNS:
+        if pattern.match(col):
+            return dtype
+    return None
+
+
+def apply_schema(df):
+    """
+    Return `df` with every covered column cast to its schema dtype.
+    """
+    casts = {}
+    for col in df.columns:
+        dtype = column_dtype(col)
+        if dtype is None:
+            continue
+        dtype = pd.api.types.pandas_dtype(dtype)
+        if df[col].dtype == dtype:
+            continue
+        if isinstance(dtype, pd.CategoricalDtype):
+            cat = df[col].astype(dtype)
+            unknown = cat.isna() & df[col].notna()
+            if unknown.any():
+                raise ValueError(f"Unknown {col} values: {sorted(df.loc[unknown, col].astype(str).unique())[:10]}")
+            casts[col] = cat
+        elif col in DATE_COLUMNS:
+            casts[col] = pd.to_datetime(df[col]).astype(dtype)
+        else:
+            casts[col] = df[col].astype(dtype)
+    return df.assign(**casts) if casts else df
+
+
+def read_transactions(path):
+    """
+    Load a transaction frame (CSV or Parquet) in schema dtypes.
+    """
+    path = Path(path)
+    if path.suffix == ".parquet":
+        return apply_schema(pd.read_parquet(path))
+    header = pd.read_csv(path, nrows=0).columns
+    dtypes = {}
+    for col in header:
+        dtype = column_dtype(col)
+        if isinstance(dtype, pd.CategoricalDtype):
+            dtypes[col] = "category"  # exact vocabulary (and unknown-value check) applied below
+        elif dtype is not None and col not in DATE_COLUMNS:
+            dtypes[col] = dtype
+    df = pd.read_csv(path, dtype=dtypes, parse_dates=[c for c in DATE_COLUMNS if c in header])
+    return apply_schema(df)
+
+
+def write_transactions(df, path):
+    """
+    Write a transaction frame in schema dtypes; `.parquet` keeps them on disk.
+    """
+    path = Path(path)
+    df = apply_schema(df)
+    if path.suffix == ".parquet":
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+    return df
@@ -0,0 +1,165 @@
+"""
+Content-addressed cache for the stages of run_fraud_sim_and_rules.main.
+
+A stage's key hashes:
+
+- its name,
+- the source of its function and, transitively, of every project function or
+  class it references, plus the module-level config values and default
+  arguments they use (editing `apply_rules` or `RULE_WEIGHTS` changes the key),
+- its own config and the keys of its upstream stages, so a changed stage
+  invalidates everything downstream of it.
+
+Outputs are stored as Parquet under `<cache_dir>/<stage>/<key>/`. A stage
+whose key is already on disk is loaded instead of run. Every run records its
+stage keys in `last_run.json`, and `resume` uses that manifest to start from a
+later stage after a failure, reusing the previous run's upstream outputs.
+"""
+import hashlib
+import inspect
+import json
+import types
+from pathlib import Path
+
+import pandas as pd
+
+MANIFEST = "last_run.json"
+_CONFIG_TYPES = (dict, list, tuple, str, int, float, bool, type(None))
+
+
+def _in_root(obj, root: Path) -> bool:
+    try:
+        return Path(inspect.getsourcefile(obj)).resolve().is_relative_to(root)
+    except (TypeError, OSError):
+        return False
+
+
+def _code_names(code):
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):  # nested functions, lambdas, comprehensions
+            names |= _code_names(const)
+    return names
+
+
+def _config_repr(value, funcs):
+    """
+    repr of a config value with functions inside containers replaced by their
+    name (their default repr holds a per-process address); the functions are
+    collected in `funcs` so their source is hashed too.
+    """
+    if inspect.isfunction(value):
+        funcs.append(value)
+        return f"<{value.__module__}.{value.__qualname__}>"
+    if isinstance(value, dict):
+        return "{" + ", ".join(f"{k!r}: {_config_repr(v, funcs)}" for k, v in value.items()) + "}"
+    if isinstance(value, (list, tuple)):
+        return type(value).__name__ + "(" + ", ".join(_config_repr(v, funcs) for v in value) + ")"
+    return repr(value)
+
+
+def code_fingerprint(fn, root=None) -> str:
+    """
+    Hash of `fn`'s source plus everything under `root` it reaches (default:
+    the directory of `fn`'s module).
+    """
+    root = Path(root or Path(inspect.getsourcefile(fn)).parent).resolve()
+    h = hashlib.sha256()
+    seen, stack = set(), [fn]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        h.update(inspect.getsource(obj).encode())
+        funcs = [obj] if inspect.isfunction(obj) else [
+            f for f in vars(obj).values() if inspect.isfunction(f)
+        ]
+        for f in funcs:
+            h.update(repr(f.__defaults__).encode())
+            for name in sorted(_code_names(f.__code__)):
+                if name not in f.__globals__:
+                    continue
+                value = f.__globals__[name]
+                if (inspect.isfunction(value) or inspect.isclass(value)) and _in_root(value, root):
+                    stack.append(value)
+                elif isinstance(value, _CONFIG_TYPES):
+                    funcs_in_config = []
+                    h.update(f"{name}={_config_repr(value, funcs_in_config)}".encode())
+                    stack.extend(f for f in funcs_in_config if _in_root(f, root))
+    return h.hexdigest()
+
+
+class StageCache:
+    """
+    Parquet-backed stage outputs keyed by content hash.
+    """
+
+    def __init__(self, cache_dir, enabled=True):
+        self.cache_dir = Path(cache_dir)
+        self.enabled = enabled
+        self.keys = {}
+
+    def key(self, name, fn, upstream=(), config=None) -> str:
+        payload = {
+            "stage": name,
+            "code": code_fingerprint(fn),
+            "config": repr(config),
+            "upstream": [self.keys[u] for u in upstream],
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:16]
+
+    def _dir(self, name, key) -> Path:
+        return self.cache_dir / name / key
+
+    def load(self, name, key):
+        """
+        {output name: DataFrame} for a stored stage, or None.
+        """
+        path = self._dir(name, key)
+        if not (path / "_SUCCESS").exists():
+            return None
+        return {p.stem: pd.read_parquet(p) for p in sorted(path.glob("*.parquet"))}
+
+    def save(self, name, key, outputs: dict):
+        path = self._dir(name, key)
+        path.mkdir(parents=True, exist_ok=True)
+        for out_name, frame in outputs.items():
+            frame.to_parquet(path / f"{out_name}.parquet")
+        (path / "_SUCCESS").touch()  # written last: a crash mid-save leaves no usable entry
+
+    def run(self, name, fn, args=(), output_names=("out",), upstream=(), config=None, force=False):
+        """
+        Return (outputs, hit) for one stage: `outputs` is the tuple of frames
+        `fn(*args)` returns, loaded from cache when the key is already stored.
+        """
+        key = self.key(name, fn, upstream, config)
+        self.keys[name] = key
+        if self.enabled and not force:
+            stored = self.load(name, key)
+            if stored is not None:
+                return tuple(stored[o] for o in output_names), True
+        result = fn(*args)
+        outputs = result if isinstance(result, tuple) else (result,)
+        if len(outputs) != len(output_names):
+            raise ValueError(f"Stage {name!r} returned {len(outputs)} outputs, expected {len(output_names)}")
+        if self.enabled:
+            self.save(name, key, dict(zip(output_names, outputs)))
+        return outputs, False
+
+    def resume(self, name, output_names=("out",)):
+        """
+        Outputs of `name` from the last recorded run, whatever the current code.
+        """
+        manifest = self.cache_dir / MANIFEST
+        keys = json.loads(manifest.read_text()) if manifest.exists() else {}
+        stored = self.load(name, keys[name]) if name in keys else None
+        if stored is None:
+            raise ValueError(f"No cached output of stage {name!r} from a previous run to resume from")
+        self.keys[name] = keys[name]
+        return tuple(stored[o] for o in output_names)
+
+    def write_manifest(self):
+        if self.enabled:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            (self.cache_dir / MANIFEST).write_text(json.dumps(self.keys, indent=2))
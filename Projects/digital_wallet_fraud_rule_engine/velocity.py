@@ -0,0 +1,108 @@
+"""
+Sliding-window velocity features for the wallet rule engine.
+
+For every transaction: how many transactions the same user made, and how much
+they moved, in the trailing window (t - W, t] (current transaction included),
+for each configured window. Windows are real sliding windows, so a burst that
+straddles midnight is counted as one burst.
+
+- `sliding_velocity`: batch version. After one sort by (user, time), every
+  window start is found in a single vectorized merge pass (the two-pointer
+  sweep: both pointers only move forward), and sums are prefix-sum differences.
+- `StreamingVelocity`: event-at-a-time version with a bounded deque per user,
+  same semantics, for scoring transactions as they arrive.
+"""
+from collections import defaultdict, deque
+
+import numpy as np
+import pandas as pd
+
+VELOCITY_WINDOWS = ("10min", "1h", "24h")
+
+
+def _window_ns(windows):
+    return [pd.Timedelta(w).value for w in windows]
+
+
+# -------------------------------------------------------------------
+# Batch
+# -------------------------------------------------------------------
+
+def sliding_velocity(tx, windows=VELOCITY_WINDOWS, user_col="user_id", ts_col="txn_ts", amount_col="amount"):
+    """
+    Return a frame aligned to `tx.index` with `txn_count_<w>` and
+    `txn_amount_<w>` per window. Rows sharing a user and timestamp see only
+    the rows before them in input order, as in the streaming version.
+    """
+    codes, _ = pd.factorize(tx[user_col], sort=True)
+    ts = pd.to_datetime(tx[ts_col]).to_numpy().astype("datetime64[ns]").view("int64")
+    amount = tx[amount_col].to_numpy(dtype=float)
+    order = np.lexsort((np.arange(len(tx)), ts, codes))
+    codes, ts, amount = codes[order], ts[order], amount[order]
+
+    # (user, time rank) packed into one monotone int64 key: a window start never
+    # crosses into the previous user, so one searchsorted covers all users
+    sorted_ts = np.sort(ts)
+    base = codes.astype(np.int64) * (len(ts) + 1)
+    keys = base + np.searchsorted(sorted_ts, ts, side="right")
+    amt_cum = pd.Series(amount).groupby(codes).cumsum().to_numpy()  # per user: no cross-user float drift
+    idx = np.arange(len(ts))
+    new_user = np.r_[True, codes[1:] != codes[:-1]] if len(ts) else np.zeros(0, dtype=bool)
+    user_first = np.maximum.accumulate(np.where(new_user, idx, 0))
+
+    out = {}
+    for name, window_ns in zip(windows, _window_ns(windows)):
+        # first row with ts > t - W
+        start = np.searchsorted(keys, base + np.searchsorted(sorted_ts, ts - window_ns, side="right"), side="right")
+        prev = np.where(start > user_first, amt_cum[np.maximum(start - 1, 0)], 0.0)
+        out[f"txn_count_{name}"] = idx - start + 1
+        out[f"txn_amount_{name}"] = np.round(amt_cum - prev, 6)
+
+    result = pd.DataFrame(out)
+    result.index = tx.index[order]
+    return result.reindex(tx.index)
+
+
+# -------------------------------------------------------------------
+# Streaming
+# -------------------------------------------------------------------
+
+class StreamingVelocity:
+    """
+    Per-user sliding windows over an event stream.
+
+    Keeps one deque of (ts, amount) per user and window plus running totals;
+    events older than the window are evicted on arrival, so memory per user is
+    bounded by the number of events inside the longest window. Events for a
+    user must arrive in time order.
+    """
+
+    def __init__(self, windows=VELOCITY_WINDOWS):
+        self.windows = tuple(windows)
+        self.window_ns = _window_ns(self.windows)
+        self._events = defaultdict(lambda: [deque() for _ in self.windows])
+        self._sums = defaultdict(lambda: [0.0] * len(self.windows))
+
+    def update(self, user_id, ts, amount):
+        """
+        Add one transaction; return its velocity features (itself included).
+        """
+        t = pd.Timestamp(ts).value
+        queues, sums = self._events[user_id], self._sums[user_id]
+        feats = {}
+        for i, (name, window_ns) in enumerate(zip(self.windows, self.window_ns)):
+            dq = queues[i]
+            if dq and t < dq[-1][0]:
+                raise ValueError(f"Out-of-order event for user {user_id}: {ts} is before {pd.Timestamp(dq[-1][0])}")
+            dq.append((t, amount))
+            sums[i] += amount
+            while t - dq[0][0] >= window_ns:
+                sums[i] -= dq.popleft()[1]
+            if len(dq) == 1:
+                sums[i] = amount  # reset float drift whenever the window empties
+            feats[f"txn_count_{name}"] = len(dq)
+            feats[f"txn_amount_{name}"] = round(sums[i], 6)
+        return feats
+
+    def n_buffered(self):
+        return sum(max(len(q) for q in qs) for qs in self._events.values())
@@ -0,0 +1,141 @@
+"""
+bench_behavioral_features.py
+----------------------------
+Single-pass `main.build_behavioral_features` vs the former filter / groupby /
+merge version (frozen below) on a synthetic client book and transaction
+history: missing and unknown counterparty countries, unparseable timestamps,
+transactions of unknown clients and clients without transactions.
+
+Parity is checked on a sample (values, column order and dtypes), on a
+dense sample where every client trades in every window, and with no
+transactions or no parseable timestamps (all-zero features). Both versions are
+then timed at full size.
+
+USAGE
+-----
+python benchmarks/bench_behavioral_features.py --clients 500000 --tx 10000000
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+from main import DATA_DIR, build_behavioral_features  # noqa: E402
+
+
+def legacy_build_behavioral_features(clients, tx, country_risk):
+    """The per-window filter / groupby / merge version this replaced, frozen for parity."""
+    tx = tx.copy()
+    tx["ts"] = pd.to_datetime(tx["ts"], errors="coerce")
+    tx["dt"] = tx["ts"].dt.date
+
+    tx = tx.merge(
+        clients[["client_id", "residency_country"]],
+        on="client_id",
+        how="left",
+        suffixes=("", "_client"),
+    )
+    cr = country_risk[["country", "is_high_risk"]].rename(columns={"country": "cp_country"})
+    tx = tx.merge(cr, left_on="counterparty_country", right_on="cp_country", how="left")
+
+    tx["is_hrc"] = tx["is_high_risk"].fillna(0).astype(int)
+    tx["is_swift_out"] = ((tx["channel"] == "swift") & (tx["direction"] == "out")).astype(int)
+    tx["is_structuring"] = ((tx["channel"] == "cash") & (tx["amount_usd"].between(8000, 9999))).astype(int)
+    tx["is_large"] = (tx["amount_usd"] >= 100000).astype(int)
+    tx["is_intl"] = (tx["counterparty_country"] != tx["residency_country"]).astype(int)
+
+    as_of = tx["ts"].max().date()
+
+    def window_mask(days):
+        return tx["dt"] >= (as_of - pd.Timedelta(days=days))
+
+    agg_90 = tx[window_mask(90)].groupby("client_id").agg(
+        tx_90d=("ts", "count"),
+        intl_rate_90d=("is_intl", "mean"),
+        hrc_hits_90d=("is_hrc", "sum"),
+        swift_out_90d=("is_swift_out", "sum"),
+    )
+    agg_30 = tx[window_mask(30)].groupby("client_id").agg(
+        cash_structuring_hits_30d=("is_structuring", "sum"),
+    )
+    agg_180 = tx[window_mask(180)].groupby("client_id").agg(
+        large_value_rate_180d=("is_large", "mean"),
+        geo_diversity_180d=("counterparty_country", "nunique"),
+    )
+
+    beh = pd.DataFrame({"client_id": clients["client_id"].unique()})
+    beh = beh.merge(agg_90, on="client_id", how="left")
+    beh = beh.merge(agg_30, on="client_id", how="left")
+    beh = beh.merge(agg_180, on="client_id", how="left")
+    return beh.fillna(0)
+
+
+def make_book(rng, n_clients, n_tx, countries, days=365, dense=False):
+    clients = pd.DataFrame({
+        "client_id": rng.permutation(np.arange(1, n_clients + 1)),
+        "residency_country": rng.choice(countries, size=n_clients),
+    })
+    cid = rng.integers(1, n_clients + 1 if dense else int(n_clients * 1.02) + 1, size=n_tx)  # > n_clients: unknown
+    if dense:
+        cid[:n_clients] = clients["client_id"].to_numpy()
+    seconds = rng.integers(0, days * 86400, size=n_tx)
+    if dense:
+        seconds[:n_clients] = days * 86400 - 1
+    ts = (pd.Timestamp("2024-01-01") + pd.to_timedelta(seconds, unit="s")).strftime("%Y-%m-%d %H:%M:%S")
+    ts = ts.to_numpy(dtype=object)
+    cp = rng.choice(np.r_[countries, ["XX", "ZZ"]], size=n_tx).astype(object)
+    if not dense:
+        ts[rng.random(n_tx) < 0.001] = "not a timestamp"
+        cp[rng.random(n_tx) < 0.01] = np.nan
+    tx = pd.DataFrame({
+        "client_id": cid,
+        "ts": ts,
+        "amount_usd": np.round(np.exp(rng.normal(8.5, 1.6, size=n_tx)), 2),
+        "channel": rng.choice(["cash", "card", "wire", "swift"], size=n_tx),
+        "direction": rng.choice(["in", "out"], size=n_tx),
+        "counterparty_country": cp,
+    })
+    return clients, tx
+
+
+def check(label, clients, tx, country_risk):
+    ref = legacy_build_behavioral_features(clients, tx, country_risk)
+    got = build_behavioral_features(clients, tx, country_risk)
+    pd.testing.assert_frame_equal(got, ref)
+    print(f"parity ({label}, {len(clients):,} clients x {len(tx):,} tx): identical values and dtypes")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clients", type=int, default=500_000)
+    ap.add_argument("--tx", type=int, default=10_000_000)
+    ap.add_argument("--check-clients", type=int, default=20_000)
+    ap.add_argument("--check-tx", type=int, default=400_000)
+    args = ap.parse_args()
+    rng = np.random.default_rng(5)
+    country_risk = pd.read_csv(DATA_DIR / "country_risk.csv")
+    countries = country_risk["country"].to_numpy()
+
+    check("sparse", *make_book(rng, args.check_clients, args.check_tx, countries), country_risk)
+    check("dense", *make_book(rng, 2_000, 50_000, countries, dense=True), country_risk)
+    clients, tx = make_book(rng, 2_000, 50_000, countries)
+    check("no transactions", clients, tx.iloc[:0], country_risk)
+    check("no parseable ts", clients, tx.assign(ts="not a timestamp"), country_risk)
+
+    clients, tx = make_book(rng, args.clients, args.tx, countries)
+    timings = {}
+    for label, fn in (("single pass", build_behavioral_features), ("legacy", legacy_build_behavioral_features)):
+        t0 = time.perf_counter()
+        fn(clients, tx, country_risk)
+        timings[label] = time.perf_counter() - t0
+        print(f"{label}: {len(clients):,} clients x {len(tx):,} tx in {timings[label]:.2f}s")
+    print(f"speed-up: {timings['legacy'] / timings['single pass']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+bench_screening.py
+------------------
+Fuzzy watchlist screening at sanctions-list scale: `screening.WatchlistIndex`
+on a synthetic watchlist (names plus aliases) and client book, where some
+clients are exact or lightly misspelled copies of watchlist names.
+
+Parity: on a sample, every client's (score, row) must equal a full
+`scorecard.best_fuzzy_match` scan whenever that scan reaches the threshold,
+for several thresholds (including one low enough to hit the fallback scan).
+The full scan is also timed on the sample and extrapolated to the full size.
+
+USAGE
+-----
+python benchmarks/bench_screening.py --clients 100000 --watchlist 1000000
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from scorecard import best_fuzzy_match  # noqa: E402
+from screening import WatchlistIndex  # noqa: E402
+
+SYLLABLES = ["al", "an", "ar", "ba", "be", "chen", "da", "de", "el", "fa", "go", "ha", "i", "ja", "ka", "ko",
+             "la", "li", "ma", "mi", "mo", "na", "ni", "o", "pa", "ra", "ri", "ro", "sa", "se", "shi", "ta",
+             "to", "u", "va", "vi", "wa", "ya", "yo", "za", "zh", "ov", "ski", "son", "ez", "in"]
+
+
+def make_names(rng, n):
+    parts = []
+    for n_syll in ([2, 3], [2, 3, 4]):
+        k = rng.choice(n_syll, size=n)
+        idx = rng.integers(0, len(SYLLABLES), size=(n, max(n_syll)))
+        parts.append(["".join(SYLLABLES[j] for j in row[:m]).capitalize() for row, m in zip(idx, k)])
+    return [f"{first} {last}" for first, last in zip(*parts)]
+
+
+def misspell(rng, name):
+    chars = list(name)
+    for _ in range(rng.integers(1, 3)):
+        i = int(rng.integers(0, len(chars)))
+        op = rng.integers(0, 3)
+        if op == 0:
+            chars[i] = chr(ord("a") + int(rng.integers(0, 26)))
+        elif op == 1 and len(chars) > 3:
+            del chars[i]
+        else:
+            chars.insert(i, chr(ord("a") + int(rng.integers(0, 26))))
+    return "".join(chars)
+
+
+def make_watchlist(rng, n):
+    names = make_names(rng, n)
+    first_initial = [f"{nm[0]}. {nm.split(' ', 1)[1]}" for nm in names]
+    alias_1 = np.where(rng.random(n) < 0.6, first_initial, "")
+    alias_2 = np.where(rng.random(n) < 0.3, [misspell(rng, nm) for nm in names], "")
+    return pd.DataFrame({
+        "name": names,
+        "alias_1": alias_1,
+        "alias_2": alias_2,
+        "type": rng.choice(["PEP", "SANCTION"], size=n, p=[0.7, 0.3]),
+        "country": rng.choice(["SG", "IN", "IT", "RU", "PK"], size=n),
+    })
+
+
+def make_clients(rng, n, watchlist):
+    names = np.array(make_names(rng, n), dtype=object)
+    src = watchlist["name"].to_numpy()[rng.integers(0, len(watchlist), size=n)]
+    kind = rng.random(n)
+    names[kind < 0.02] = src[kind < 0.02]
+    fuzzy = (kind >= 0.02) & (kind < 0.10)
+    names[fuzzy] = [misspell(rng, nm) for nm in src[fuzzy]]
+    return list(names)
+
+
+def check_parity(rng, watchlist, clients, thresholds):
+    full_scan_s = 0.0
+    for t in thresholds:
+        index = WatchlistIndex(watchlist, threshold=t)
+        scores, rows = index.best_matches(clients)
+        n_hits = 0
+        for name, score, row in zip(clients, scores, rows):
+            t0 = time.perf_counter()
+            ref_score, ref_row = best_fuzzy_match(name, watchlist)
+            full_scan_s += time.perf_counter() - t0
+            if ref_score >= t:
+                n_hits += 1
+                assert score == ref_score and row == ref_row.name, (name, t, score, ref_score)
+            else:
+                assert row == -1, (name, t)
+        print(f"  threshold {t:.2f}: {n_hits} matches identical to the full scan")
+    return full_scan_s / (len(thresholds) * len(clients))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clients", type=int, default=100_000)
+    ap.add_argument("--watchlist", type=int, default=1_000_000)
+    ap.add_argument("--threshold", type=float, default=0.88)
+    ap.add_argument("--check-clients", type=int, default=200)
+    ap.add_argument("--check-watchlist", type=int, default=2_000)
+    args = ap.parse_args()
+    rng = np.random.default_rng(7)
+
+    print(f"parity on {args.check_clients} clients x {args.check_watchlist:,} watchlist rows:")
+    small = make_watchlist(rng, args.check_watchlist)
+    per_entry_s = check_parity(rng, small, make_clients(rng, args.check_clients, small), (0.75, 0.88, 0.95))
+    per_entry_s /= args.check_watchlist
+
+    watchlist = make_watchlist(rng, args.watchlist)
+    clients = make_clients(rng, args.clients, watchlist)
+    t0 = time.perf_counter()
+    index = WatchlistIndex(watchlist, threshold=args.threshold)
+    build_s = time.perf_counter() - t0
+    print(f"index: {len(index):,} names/aliases from {len(watchlist):,} rows in {build_s:.1f}s")
+
+    t0 = time.perf_counter()
+    scores, rows = index.best_matches(clients)
+    screen_s = time.perf_counter() - t0
+    full_scan_h = per_entry_s * args.watchlist * args.clients / 3600
+    print(f"screen: {len(clients):,} clients in {screen_s:.1f}s ({len(clients) / screen_s:,.0f}/s), "
+          f"{(rows >= 0).sum():,} matches >= {args.threshold}")
+    print(f"full scan (extrapolated from the parity sample): ~{full_scan_h:,.0f} hours")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+bench_screening_cache.py
+------------------------
+Re-run cost of `screening.screen_names` with its on-disk cache, on a
+synthetic watchlist and client book:
+
+1. cold run: every name is screened (in parallel);
+2. same clients, same watchlist: everything comes from the cache;
+3. some clients renamed and the watchlist edited (rows added, removed
+   and changed, including rows that were best matches): renamed clients
+   are screened, everyone else only against the added rows;
+4. surviving watchlist rows reordered: full re-screen (tie-breaks follow
+   scan order).
+
+After every run the results must equal an uncached screen of the current
+watchlist.
+
+USAGE
+-----
+python benchmarks/bench_screening_cache.py --clients 100000 --watchlist 200000 --workers 4
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from bench_screening import make_clients, make_watchlist  # noqa: E402
+from screening import WatchlistIndex, screen_names  # noqa: E402
+
+
+def run(label, clients, watchlist, args, cache_dir):
+    t0 = time.perf_counter()
+    score, row, stats = screen_names(clients, watchlist, args.threshold, cache_dir=cache_dir,
+                                     workers=args.workers, chunk_size=args.chunk_size)
+    secs = time.perf_counter() - t0
+    ref_score, ref_row = WatchlistIndex(watchlist, threshold=args.threshold).best_matches(clients)
+    assert np.array_equal(score, ref_score) and np.array_equal(row, ref_row), label
+    print(f"{label:<26} {secs:7.1f}s   cached={stats['cached']:,} delta={stats['delta']:,} "
+          f"screened={stats['screened']:,}   matches={(row >= 0).sum():,}  identical to uncached: ok")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clients", type=int, default=100_000)
+    ap.add_argument("--watchlist", type=int, default=200_000)
+    ap.add_argument("--threshold", type=float, default=0.88)
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--chunk-size", type=int, default=2000)
+    args = ap.parse_args()
+    rng = np.random.default_rng(11)
+
+    watchlist = make_watchlist(rng, args.watchlist)
+    clients = make_clients(rng, args.clients, watchlist)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        run("cold", clients, watchlist, args, cache_dir)
+        run("unchanged", clients, watchlist, args, cache_dir)
+
+        # 2% of clients renamed; watchlist: 1% added, 0.5% removed, 0.5% edited
+        renamed = rng.random(len(clients)) < 0.02
+        clients = [new if r else old for old, new, r in zip(clients, make_clients(rng, len(clients), watchlist), renamed)]
+        n = len(watchlist)
+        wl = watchlist.drop(index=rng.choice(n, size=n // 200, replace=False))
+        edit = rng.choice(wl.index, size=n // 200, replace=False)
+        wl.loc[edit, "alias_2"] = wl.loc[edit, "name"].str.upper()
+        added = make_watchlist(rng, n // 100)
+        added["name"] = [c.title() for c in make_clients(rng, len(added), watchlist)]  # lands near clients
+        wl = pd.concat([wl, added], ignore_index=True)
+        run("renames + watchlist delta", clients, wl, args, cache_dir)
+
+        wl = wl.sample(frac=1.0, random_state=1).reset_index(drop=True)
+        run("watchlist reordered", clients, wl, args, cache_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,106 @@
-"""Data quality checks for KYC risk scoring."""
+"""Data quality checks for KYC risk scoring.
+
+Checks are declared in `DQ_RULES` and evaluated column-wise. Each client gets
+a `qc_mask` bitmask (bit j = DQ_RULES[j]); the `qc_flags` text is rendered
+from it only when needed, and `violation_counts` feeds the run manifest.
+"""
 from __future__ import annotations
+from typing import Any, Dict, List
+
 import pandas as pd
 import numpy as np
 
+# Bit order = rendered order (alphabetical, as the comma-joined flags have always been sorted).
+# check kinds: range (NaN fails), parseable_date (missing passes), not_null, member (of a reference column)
+DQ_RULES: List[Dict[str, Any]] = [
+    {"name": "birth_year_invalid", "column": "birth_year", "check": "range", "min": 1900, "max": 2025},
+    {"name": "onboard_date_invalid", "column": "onboard_date", "check": "parseable_date"},
+    {"name": "pep_flag_missing", "column": "pep_flag", "check": "not_null"},
+    {"name": "residency_country_unknown", "column": "residency_country", "check": "member",
+     "reference": "country", "upper": True},
+]
+
+
+def _scalar_date_fails(value: Any) -> bool:
+    try:
+        pd.to_datetime(value)
+    except Exception:
+        return True
+    return False
+
+
+def _check_range(col: pd.Series | None, rule: Dict[str, Any], n: int, reference: pd.DataFrame) -> np.ndarray:
+    if col is None:
+        return np.ones(n, dtype=bool)
+    x = pd.to_numeric(col, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    return np.isnan(x) | (x < rule["min"]) | (x > rule["max"])
+
+
+def _check_parseable_date(col: pd.Series | None, rule: Dict[str, Any], n: int, reference: pd.DataFrame) -> np.ndarray:
+    if col is None:
+        return np.zeros(n, dtype=bool)
+    # one coerced ISO-8601 parse for the column; what it rejects is re-parsed once per distinct
+    # value (mixed formats, then the scalar parser, so "" / "NaT" and other no-raise values still pass);
+    # utc=True because only parse-ability matters and mixed offsets would otherwise raise
+    failed = (pd.to_datetime(col, errors="coerce", format="ISO8601", utc=True).isna() & col.notna()).to_numpy(copy=True)
+    if failed.any():
+        suspects = col[failed].astype(object)
+        distinct = pd.Series(suspects.unique())
+        retry = distinct[pd.to_datetime(distinct, errors="coerce", format="mixed", utc=True).isna().to_numpy()]
+        bad = {v for v in retry if _scalar_date_fails(v)}
+        failed[failed] = suspects.isin(bad).to_numpy()
+    return failed
+
+
+def _check_not_null(col: pd.Series | None, rule: Dict[str, Any], n: int, reference: pd.DataFrame) -> np.ndarray:
+    return np.ones(n, dtype=bool) if col is None else col.isna().to_numpy()
+
+
+def _check_member(col: pd.Series | None, rule: Dict[str, Any], n: int, reference: pd.DataFrame) -> np.ndarray:
+    valid = set(reference[rule["reference"]].astype(str).unique())
+    values = pd.Series([""] * n) if col is None else col.astype(object).astype(str)
+    if rule.get("upper"):
+        values = values.str.upper()
+    return ~values.isin(valid).to_numpy()
+
+
+_CHECKS = {
+    "range": _check_range,
+    "parseable_date": _check_parseable_date,
+    "not_null": _check_not_null,
+    "member": _check_member,
+}
+
+
+def dq_mask(clients: pd.DataFrame, country_risk: pd.DataFrame,
+            rules: List[Dict[str, Any]] = DQ_RULES) -> pd.Series:
+    """qc_mask per client_id: OR of rule violations over the client's rows."""
+    n = len(clients)
+    hits = pd.DataFrame(
+        {j: _CHECKS[rule["check"]](clients[rule["column"]] if rule["column"] in clients.columns else None,
+                                   rule, n, country_risk)
+         for j, rule in enumerate(rules)},
+        index=clients["client_id"].to_numpy(),
+    )
+    if hits.index.has_duplicates:
+        hits = hits.groupby(level=0, sort=False).any()
+    bits = np.left_shift(np.int64(1), np.arange(len(rules), dtype=np.int64))
+    return pd.Series(hits.to_numpy(dtype=np.int64) @ bits, index=hits.index, name="qc_mask")
+
+
+def render_qc_flags(mask: pd.Series, rules: List[Dict[str, Any]] = DQ_RULES) -> pd.Series:
+    """Comma-joined rule names per client, rendered once per distinct mask."""
+    names = [r["name"] for r in rules]
+    text = {int(m): ",".join(nm for j, nm in enumerate(names) if int(m) >> j & 1) for m in pd.unique(mask)}
+    return pd.Series(mask).map(text).rename("qc_flags")
+
+
+def violation_counts(mask: pd.Series, rules: List[Dict[str, Any]] = DQ_RULES) -> Dict[str, int]:
+    """Clients violating each rule."""
+    m = np.asarray(mask, dtype=np.int64)
+    return {r["name"]: int((m >> j & 1).sum()) for j, r in enumerate(rules)}
+
+
 def run_data_quality(clients: pd.DataFrame, country_risk: pd.DataFrame) -> pd.Series:
     """Return a qc_flags string per client_id summarising simple data quality issues."""
-    df = clients.copy()
-    valid_countries = set(country_risk["country"].astype(str).unique())
-    flags = {cid: [] for cid in df["client_id"].tolist()}
-
-    for _, row in df.iterrows():
-        cid = row["client_id"]
-        # Birth year
-        by = row.get("birth_year", np.nan)
-        if pd.isna(by) or by < 1900 or by > 2025:
-            flags[cid].append("birth_year_invalid")
-        # Onboard date
-        od = row.get("onboard_date", None)
-        try:
-            pd.to_datetime(od)
-        except Exception:
-            flags[cid].append("onboard_date_invalid")
-        # Country
-        rc = str(row.get("residency_country", "")).upper()
-        if rc not in valid_countries:
-            flags[cid].append("residency_country_unknown")
-        # PEP flag
-        pf = row.get("pep_flag", None)
-        if pd.isna(pf):
-            flags[cid].append("pep_flag_missing")
-
-    out = {}
-    for cid, f in flags.items():
-        out[cid] = ",".join(sorted(set(f))) if f else ""
-    return pd.Series(out, name="qc_flags")
+    return render_qc_flags(dq_mask(clients, country_risk))
@@ -1,4 +1,5 @@
 from __future__ import annotations
+import numpy as np
 import pandas as pd
 from pathlib import Path
 from datetime import datetime
@@ -10,8 +11,9 @@ from scorecard import (
     compute_tenure_days,
     enrich_watchlist,
     apply_scorecard,
+    render_top_factors,
 )
-from data_quality import run_data_quality
+from data_quality import dq_mask, render_qc_flags, violation_counts
 
 BASE = Path(__file__).resolve().parents[1]
 DATA_DIR = BASE /"aml_suspicious_activity_monitoring" / "data"
@@ -32,77 +34,97 @@ def build_behavioral_features(
     - cash_structuring_hits_30d
     - large_value_rate_180d
     - geo_diversity_180d
-    """
-    tx = tx.copy()
-    tx["ts"] = pd.to_datetime(tx["ts"], errors="coerce")
-    tx["dt"] = tx["ts"].dt.date
-
-    # join residency to compute cross-border flag
-    tx = tx.merge(
-        clients[["client_id", "residency_country"]],
-        on="client_id",
-        how="left",
-        suffixes=("", "_client"),
-    )
-
-    cr = country_risk[["country", "is_high_risk"]].rename(
-        columns={"country": "cp_country"}
-    )
-    tx = tx.merge(
-        cr,
-        left_on="counterparty_country",
-        right_on="cp_country",
-        how="left",
-    )
 
-    tx["is_hrc"] = tx["is_high_risk"].fillna(0).astype(int)
-    tx["is_swift_out"] = (
-        (tx["channel"] == "swift") & (tx["direction"] == "out")
-    ).astype(int)
-    tx["is_structuring"] = (
-        (tx["channel"] == "cash")
-        & (tx["amount_usd"].between(8000, 9999))
-    ).astype(int)
-    tx["is_large"] = (tx["amount_usd"] >= 100000).astype(int)
-    tx["is_intl"] = (
-        tx["counterparty_country"] != tx["residency_country"]
-    ).astype(int)
-
-    # define "today" as max ts date
-    as_of = tx["ts"].max().date()
-
-    def window_mask(days: int):
-        return tx["dt"] >= (as_of - pd.Timedelta(days=days))
-
-    # 90d window
-    tx_90 = tx[window_mask(90)].groupby("client_id")
-    agg_90 = tx_90.agg(
-        tx_90d=("ts", "count"),
-        intl_rate_90d=("is_intl", "mean"),
-        hrc_hits_90d=("is_hrc", "sum"),
-        swift_out_90d=("is_swift_out", "sum"),
+    One pass over the 180 day rows: window-membership masks, per-client sums
+    after a single sort by client, and counterparty-country bitsets for the
+    distinct count.
+    """
+    ts = pd.to_datetime(tx["ts"], errors="coerce")
+    # "today" is the max ts date; a row is in the d-day window if its date >= today - d
+    as_of = ts.max()
+    windows = (90, 30, 180)
+    if pd.isna(as_of):  # no transactions / no parseable ts: every window is empty, all features 0
+        in_window = {d: np.zeros(len(ts), dtype=bool) for d in windows}
+    else:
+        as_of = as_of.normalize()
+        in_window = {d: (ts >= as_of - pd.Timedelta(days=d)).to_numpy() for d in windows}
+
+    # client / country codes replace the residency and country-risk merges
+    ids = pd.Index(clients["client_id"].unique())
+    cid = ids.get_indexer(tx["client_id"])
+    cid[tx["client_id"].isna().to_numpy()] = -1
+    keep = (cid >= 0) & in_window[max(windows)]
+    cid = cid[keep]
+
+    residency = (
+        clients.drop_duplicates("client_id")
+        .set_index("client_id")["residency_country"]
+        .reindex(ids)
     )
-
-    # 30d window
-    tx_30 = tx[window_mask(30)].groupby("client_id")
-    agg_30 = tx_30.agg(
-        cash_structuring_hits_30d=("is_structuring", "sum"),
+    cp_code, countries = pd.factorize(tx["counterparty_country"][keep])
+    countries = pd.Index(countries)
+    others = pd.concat([residency, country_risk["country"]], ignore_index=True).dropna().unique()
+    countries = countries.append(pd.Index(others).difference(countries, sort=False))
+    res_code = countries.get_indexer(residency)[cid]
+    hrc_by_country = np.zeros(len(countries) + 1, dtype=np.int64)  # last slot: unknown / missing
+    hrc_by_country[countries.get_indexer(country_risk["country"])] = (
+        country_risk["is_high_risk"].fillna(0).astype(int).to_numpy()
     )
 
-    # 180d window
-    tx_180 = tx[window_mask(180)].groupby("client_id")
-    agg_180 = tx_180.agg(
-        large_value_rate_180d=("is_large", "mean"),
-        geo_diversity_180d=("counterparty_country", "nunique"),
+    amount = tx["amount_usd"][keep]
+    in90, in30 = in_window[90][keep], in_window[30][keep]
+    is_hrc = hrc_by_country[cp_code]
+    is_swift_out = ((tx["channel"] == "swift") & (tx["direction"] == "out")).to_numpy()[keep]
+    is_structuring = ((tx["channel"] == "cash") & tx["amount_usd"].between(8000, 9999)).to_numpy()[keep]
+    is_large = (amount >= 100000).to_numpy()
+    is_intl = (cp_code != res_code) | (cp_code < 0) | (res_code < 0)
+
+    # one sorted pass: per-client sums of window-masked flags, OR of country bitsets
+    values = np.column_stack([
+        in90,
+        in90 & is_intl,
+        np.where(in90, is_hrc, 0),
+        in90 & is_swift_out,
+        in30,
+        in30 & is_structuring,
+        np.ones(len(cid), dtype=bool),
+        is_large,
+    ]).astype(np.int64)
+    n_words = max(1, -(-len(countries) // 64))
+    bitsets = np.zeros((len(cid), n_words), dtype=np.uint64)
+    has_cp = cp_code >= 0
+    bitsets[np.flatnonzero(has_cp), cp_code[has_cp] // 64] = (
+        np.uint64(1) << (cp_code[has_cp] % 64).astype(np.uint64)
     )
 
-    beh = pd.DataFrame({"client_id": clients["client_id"].unique()})
-    beh = beh.merge(agg_90, on="client_id", how="left")
-    beh = beh.merge(agg_30, on="client_id", how="left")
-    beh = beh.merge(agg_180, on="client_id", how="left")
-    beh = beh.fillna(0)
-
-    return beh
+    order = np.argsort(cid, kind="stable")
+    cid = cid[order]
+    starts = np.flatnonzero(np.r_[True, cid[1:] != cid[:-1]]) if len(cid) else np.array([], dtype=int)
+    sums = np.zeros((len(ids), values.shape[1]), dtype=np.int64)
+    distinct = np.zeros(len(ids), dtype=np.int64)
+    if len(starts):
+        sums[cid[starts]] = np.add.reduceat(values[order], starts, axis=0)
+        seen = np.bitwise_or.reduceat(bitsets[order], starts, axis=0)
+        distinct[cid[starts]] = np.bitwise_count(seen).sum(axis=1)
+    tx_90, intl_90, hrc_90, swift_90, tx_30, struct_30, tx_180, large_180 = sums.T
+
+    def rate(hits, n):
+        return np.divide(hits, n, out=np.zeros(len(n)), where=n > 0)
+
+    def counts(col, n):
+        # as the per-window merges did: int when every client has rows in the window, else float
+        return col if (n > 0).all() else col.astype(float)
+
+    return pd.DataFrame({
+        "client_id": ids.to_numpy(),
+        "tx_90d": counts(tx_90, tx_90),
+        "intl_rate_90d": rate(intl_90, tx_90),
+        "hrc_hits_90d": counts(hrc_90, tx_90),
+        "swift_out_90d": counts(swift_90, tx_90),
+        "cash_structuring_hits_30d": counts(struct_30, tx_30),
+        "large_value_rate_180d": rate(large_180, tx_180),
+        "geo_diversity_180d": counts(distinct, tx_180),
+    })
 
 
 def main():
@@ -116,9 +138,9 @@ def main():
     watchlist = pd.read_csv(KYC_DIR / "watchlist.csv")
 
     # Data quality flags
-    qc = run_data_quality(clients, country_risk)
+    qc = dq_mask(clients, country_risk)
     clients = clients.merge(
-        qc.rename("qc_flags"),
+        qc,
         left_on="client_id",
         right_index=True,
         how="left",
@@ -152,7 +174,7 @@ def main():
     feats = clients.merge(beh, on="client_id", how="left")
 
     # Watchlist enrichment
-    feats = enrich_watchlist(feats, watchlist, cfg)
+    feats = enrich_watchlist(feats, watchlist, cfg, cache_dir=OUT_DIR / "screening_cache")
 
     # Apply scorecard
     scored = apply_scorecard(feats, cfg)
@@ -182,6 +204,8 @@ def main():
         "name_similarity",
         "qc_flags",
     ]
+    scored["top_factors"] = render_top_factors(scored["factor_mask"])
+    scored["qc_flags"] = render_qc_flags(scored["qc_mask"])
     scored_out = scored[out_cols].copy()
     scored_out["created_at"] = datetime.utcnow().isoformat(timespec="seconds")
 
@@ -199,7 +223,8 @@ def main():
         "dq_summary": {
             "with_issues": int(
                 (scored_out["qc_flags"].astype(str) != "").sum()
-            )
+            ),
+            "rule_counts": violation_counts(scored["qc_mask"]),
         },
         "config_path": str(KYC_DIR / "config.yaml"),
     }
@@ -1,5 +1,6 @@
 """KYC risk scorecard: rule-based, explainable scoring with watchlist enrichment."""
 from __future__ import annotations
+import operator
 import pandas as pd
 import numpy as np
 from pathlib import Path
@@ -7,6 +8,8 @@ from typing import Dict, Any, Tuple
 import yaml
 from difflib import SequenceMatcher
 
+from screening import screen_names
+
 def load_config(path: str | Path) -> Dict[str, Any]:
     with open(path, "r") as f:
         return yaml.safe_load(f)
@@ -43,110 +46,107 @@ def best_fuzzy_match(name: str, watchlist: pd.DataFrame) -> Tuple[float, Any]:
                 best_row = row
     return best_score, best_row
 
-def enrich_watchlist(clients: pd.DataFrame, watchlist: pd.DataFrame, cfg: Dict[str, Any]) -> pd.DataFrame:
+def enrich_watchlist(clients: pd.DataFrame, watchlist: pd.DataFrame, cfg: Dict[str, Any],
+                     cache_dir: str | Path | None = None) -> pd.DataFrame:
+    """Watchlist flags per client; fuzzy results are reused from `cache_dir` across runs when given."""
     wl = watchlist.copy()
     df = clients.copy()
-    thresh = cfg.get("fuzzy_match", {}).get("similarity_threshold", 0.88)
-    enabled = cfg.get("fuzzy_match", {}).get("enabled", True)
-
-    pep_match = []
-    sanc_match = []
-    best_sim = []
-
-    for _, row in df.iterrows():
-        nm = row.get("client_name", "")
-        m = wl[wl["name"].str.lower() == str(nm).lower()]
-        pep = 0
-        sanc = 0
-        sim = 0.0
-        if not m.empty:
-            if (m["type"] == "PEP").any():
-                pep = 1
-                sim = 1.0
-            if (m["type"] == "SANCTION").any():
-                sanc = 1
-                sim = 1.0
-        elif enabled:
-            sim, best_row = best_fuzzy_match(str(nm), wl)
-            if best_row is not None and sim >= thresh:
-                if best_row.get("type") == "PEP":
-                    pep = 1
-                if best_row.get("type") == "SANCTION":
-                    sanc = 1
-        pep_match.append(pep)
-        sanc_match.append(sanc)
-        best_sim.append(sim)
+    fm = cfg.get("fuzzy_match", {})
+    thresh = fm.get("similarity_threshold", 0.88)
+    enabled = fm.get("enabled", True)
+
+    # exact (case-insensitive) name hits: lowercased name -> watchlist types
+    exact: Dict[str, set] = {}
+    for nm, typ in zip(wl["name"].str.lower(), wl["type"]):
+        if isinstance(nm, str):
+            exact.setdefault(nm, set()).add(typ)
+
+    names = df["client_name"].astype(str).tolist() if "client_name" in df.columns else [""] * len(df)
+    types = [exact.get(nm.lower()) for nm in names]
+    pep_match = np.array([int(t is not None and "PEP" in t) for t in types])
+    sanc_match = np.array([int(t is not None and "SANCTION" in t) for t in types])
+    best_sim = np.where(pep_match | sanc_match, 1.0, 0.0)
+
+    # fuzzy screening for names without an exact hit; only matches >= threshold are kept
+    fuzzy = np.array([t is None for t in types], dtype=bool)
+    if enabled and fuzzy.any() and not wl.empty:
+        sim, row, _ = screen_names(
+            [nm for nm, f in zip(names, fuzzy) if f], wl, threshold=thresh,
+            cache_dir=cache_dir if fm.get("cache", True) else None,
+            workers=fm.get("workers", 1), chunk_size=fm.get("chunk_size", 2000),
+        )
+        hit_type = np.where(row >= 0, wl["type"].to_numpy()[np.maximum(row, 0)], None)
+        pep_match[fuzzy] = hit_type == "PEP"
+        sanc_match[fuzzy] = hit_type == "SANCTION"
+        best_sim[fuzzy] = sim
 
     df["pep_match"] = pep_match
     df["sanction_match"] = sanc_match
     df["name_similarity"] = best_sim
     return df
 
+# Scorecard factors in display order: (weight key, column, op, value, label).
+# A string value names a `thresholds` entry in config.yaml; the number after it is its default.
+SCORECARD_FACTORS = [
+    ("pep_flag", "pep_flag", "==", 1, "PEP flag"),
+    ("pep_match", "pep_match", "==", 1, "Watchlist PEP match"),
+    ("sanction_match", "sanction_match", "==", 1, "Watchlist sanction match"),
+    ("residency_country_high", "residency_country_is_high", "==", 1, "High-risk residency"),
+    ("occupation_cash_intensive", "occupation_group", "==", "Cash_Intensive", "Cash-intensive occupation"),
+    ("intl_rate_90d_high", "intl_rate_90d", ">", ("intl_rate_90d_high", 0.5), "High cross-border activity (90d)"),
+    ("hrc_hits_90d_ge_2", "hrc_hits_90d", ">=", 2, "Multiple HRC counterparties (90d)"),
+    ("swift_out_90d_ge_2", "swift_out_90d", ">=", 2, "Multiple SWIFT out wires (90d)"),
+    ("cash_structuring_hits_30d_ge_2", "cash_structuring_hits_30d", ">=", 2, "Cash structuring pattern (30d)"),
+    ("large_value_rate_180d_high", "large_value_rate_180d", ">=", ("large_value_rate_180d_high", 0.2),
+     "High share of large-value tx (180d)"),
+    ("geo_diversity_180d_high", "geo_diversity_180d", ">=", ("geo_diversity_180d_high", 8),
+     "High geographic diversity (180d)"),
+]
+FACTOR_LABELS = [label for *_, label in SCORECARD_FACTORS]
+
+_OPS = {"==": operator.eq, ">": operator.gt, ">=": operator.ge}
+
+
+def factor_matrix(features: pd.DataFrame, cfg: Dict[str, Any]) -> np.ndarray:
+    """Boolean (clients x factors) matrix; a missing column or NaN never triggers a factor."""
+    thr = cfg.get("thresholds", {})
+    out = np.zeros((len(features), len(SCORECARD_FACTORS)), dtype=bool)
+    for j, (_, col, op, value, _) in enumerate(SCORECARD_FACTORS):
+        if col not in features.columns:
+            continue
+        if isinstance(value, tuple):
+            value = thr.get(*value)
+        out[:, j] = _OPS[op](features[col], value).to_numpy(dtype=bool, na_value=False)
+    return out
+
+
+def render_top_factors(factor_mask: pd.Series) -> pd.Series:
+    """Plain-English factor list per client from its factor bitmask, rendered once per distinct mask."""
+    masks = pd.Series(factor_mask)
+    labels = {
+        int(m): ", ".join(label for j, label in enumerate(FACTOR_LABELS) if int(m) >> j & 1)
+        for m in masks.unique()
+    }
+    return masks.map(labels)
+
+
 def apply_scorecard(features: pd.DataFrame, cfg: Dict[str, Any]) -> pd.DataFrame:
+    """Add risk_score, risk_tier and factor_mask (bit j = SCORECARD_FACTORS[j]).
+
+    `top_factors` text is not built here; `render_top_factors(df["factor_mask"])`
+    produces it when the scores are displayed or exported.
+    """
     w = cfg.get("weights", {})
-    thr = cfg.get("thresholds", {})
     tiers_cfg = cfg.get("tiers", {})
     high_cut = tiers_cfg.get("high", 55)
     med_cut = tiers_cfg.get("medium", 30)
 
     df = features.copy()
-    scores = []
-    factors = []
-
-    for _, row in df.iterrows():
-        s = 0.0
-        f = []
-
-        if row.get("pep_flag", 0) == 1:
-            s += w.get("pep_flag", 0); f.append("PEP flag")
-        if row.get("pep_match", 0) == 1:
-            s += w.get("pep_match", 0); f.append("Watchlist PEP match")
-        if row.get("sanction_match", 0) == 1:
-            s += w.get("sanction_match", 0); f.append("Watchlist sanction match")
-
-        if row.get("residency_country_is_high", 0) == 1:
-            s += w.get("residency_country_high", 0); f.append("High-risk residency")
-
-
-        if row.get("occupation_group") == "Cash_Intensive":
-            s += w.get("occupation_cash_intensive", 0); f.append("Cash-intensive occupation")
-
-
-        if row.get("intl_rate_90d", 0.0) > thr.get("intl_rate_90d_high", 0.5):
-            s += w.get("intl_rate_90d_high", 0); f.append("High cross-border activity (90d)")
-
-
-        if row.get("hrc_hits_90d", 0) >= 2:
-            s += w.get("hrc_hits_90d_ge_2", 0); f.append("Multiple HRC counterparties (90d)")
-
-
-        if row.get("swift_out_90d", 0) >= 2:
-            s += w.get("swift_out_90d_ge_2", 0); f.append("Multiple SWIFT out wires (90d)")
-
-
-        if row.get("cash_structuring_hits_30d", 0) >= 2:
-            s += w.get("cash_structuring_hits_30d_ge_2", 0); f.append("Cash structuring pattern (30d)")
-
-
-        if row.get("large_value_rate_180d", 0.0) >= thr.get("large_value_rate_180d_high", 0.2):
-            s += w.get("large_value_rate_180d_high", 0); f.append("High share of large-value tx (180d)")
-
-
-        if row.get("geo_diversity_180d", 0) >= thr.get("geo_diversity_180d_high", 8):
-            s += w.get("geo_diversity_180d_high", 0); f.append("High geographic diversity (180d)")
-
-        scores.append(s)
-        factors.append(", ".join(f))
-
-    df["risk_score"] = scores
-    df["top_factors"] = factors
-
-    def tier(s):
-        if s >= high_cut:
-            return "High"
-        if s >= med_cut:
-            return "Medium"
-        return "Low"
-
-    df["risk_tier"] = df["risk_score"].apply(tier)
+    factors = factor_matrix(df, cfg)
+    weights = np.array([float(w.get(key, 0)) for key, *_ in SCORECARD_FACTORS])
+    df["risk_score"] = factors.astype(float) @ weights
+    df["factor_mask"] = factors.astype(np.int64) @ (1 << np.arange(len(SCORECARD_FACTORS), dtype=np.int64))
+    df["risk_tier"] = np.select(
+        [df["risk_score"] >= high_cut, df["risk_score"] >= med_cut], ["High", "Medium"], default="Low"
+    )
     return df
@@ -0,0 +1,376 @@
+"""Indexed fuzzy watchlist screening.
+
+`WatchlistIndex` finds, for each client name, the watchlist entry (name or
+alias) with the highest `difflib.SequenceMatcher` ratio, provided that ratio
+reaches the similarity threshold. It returns the same score and row as a full
+scan with `scorecard.best_fuzzy_match`, but runs SequenceMatcher only on a
+short candidate list.
+
+Candidate generation is lossless for scores at or above the threshold:
+
+- ratio = 2*M / (la + lb) with M <= min(la, lb), which bounds the candidate
+  length to a range around the query length;
+- M <= LCS, so ratio >= t implies an indel (hence edit) distance of at most
+  d = la + lb - 2*ceil(t*(la + lb)/2); by the q-gram lemma the two padded
+  strings then share at least max(la, lb) + 2 - 3*d trigrams (multiset);
+- a candidate that must share B of the query's n trigrams shares at least one
+  of any n - B + 1 of them, so postings are read only for the query's rarest
+  n - B + 1 trigrams (prefix filter). Reading a couple more than that lets
+  candidates that appear too rarely in those postings be dropped; the exact
+  shared count is then checked on the rest.
+
+Where the bound is not positive (thresholds below about 0.83 on short names)
+every entry in the length range is verified.
+"""
+from __future__ import annotations
+import hashlib
+import math
+from concurrent.futures import ProcessPoolExecutor
+from difflib import SequenceMatcher
+from pathlib import Path
+from typing import Any, Dict, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+WATCHLIST_NAME_COLUMNS = ("name", "alias_1", "alias_2")
+_PAD = "\x01\x01"
+_OCC = 256  # trigram occurrences kept apart per string (multiset trigrams)
+# postings read beyond the minimal prefix: a little more reading buys a count filter
+# that drops most candidates before the exact shared-trigram check
+_EXTRA_POSTINGS = 2
+
+
+def _char_codes(strings: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """(n, width) uint32 code points of `strings` padded with two pad chars each side, and their lengths."""
+    padded = [_PAD + s + _PAD for s in strings]
+    width = max((len(s) for s in padded), default=4)
+    arr = np.array(padded, dtype=f"U{width}").view(np.uint32).reshape(len(padded), width)
+    return arr, np.fromiter((len(s) for s in strings), dtype=np.int64, count=len(strings))
+
+
+def _trigram_keys(codes: np.ndarray, lengths: np.ndarray, char_map: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-string sorted trigram keys as CSR (indptr, keys); repeated trigrams get distinct keys."""
+    n, width = codes.shape
+    base = len(char_map) + 1
+    dense = char_map[np.minimum(codes, len(char_map) - 1)].astype(np.int64)
+    tri = (dense[:, :-2] * base + dense[:, 1:-1]) * base + dense[:, 2:] if width >= 3 else np.zeros((n, 0), np.int64)
+    valid = np.arange(tri.shape[1]) < (lengths + 2)[:, None]
+    owner = np.repeat(np.arange(n), valid.sum(axis=1))
+    keys = tri[valid]
+    order = np.lexsort((keys, owner))
+    owner, keys = owner[order], keys[order]
+    idx = np.arange(len(keys))
+    new = np.r_[True, (keys[1:] != keys[:-1]) | (owner[1:] != owner[:-1])] if len(keys) else np.zeros(0, bool)
+    occ = idx - np.maximum.accumulate(np.where(new, idx, 0))
+    keys = keys * _OCC + np.minimum(occ, _OCC - 1)
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(owner, minlength=n), out=indptr[1:])
+    return indptr, keys
+
+
+class WatchlistIndex:
+    """Trigram inverted index over the normalized names and aliases of a watchlist."""
+
+    def __init__(self, watchlist: pd.DataFrame, threshold: float = 0.88,
+                 columns: Sequence[str] = WATCHLIST_NAME_COLUMNS, chunk_size: int = 250_000):
+        if not 0 < threshold <= 1:
+            raise ValueError(f"threshold must be in (0, 1], got {threshold}")
+        self.threshold = threshold
+        cols = [c for c in columns if c in watchlist.columns]
+        # entries in scan order (row, then column), as best_fuzzy_match visits them
+        cand = pd.DataFrame({c: watchlist[c].astype("string").str.strip().str.lower().fillna("") for c in cols})
+        stacked = cand.to_numpy(dtype=str).ravel()
+        keep = np.flatnonzero(stacked != "")
+        self.entries = stacked[keep]
+        self.entry_row = keep // max(len(cols), 1)
+
+        n_chars = 0x110000
+        present = np.zeros(n_chars, dtype=bool)
+        chunks = [self.entries[i:i + chunk_size] for i in range(0, len(self.entries), chunk_size)]
+        for chunk in chunks:
+            codes, _ = _char_codes(chunk)
+            present |= np.bincount(codes.ravel(), minlength=n_chars) > 0
+        present[0] = False  # array padding, never part of a trigram
+        # dense char codes; 0 = never seen in the watchlist, so it cannot be shared
+        self._char_map = np.where(present, np.cumsum(present), 0).astype(np.int64)
+        if (int(present.sum()) + 1) ** 3 * _OCC >= 2 ** 63:
+            raise ValueError("Watchlist alphabet too large for 64-bit trigram keys")
+
+        ptrs, keys = [], []
+        self.lengths = np.zeros(len(self.entries), dtype=np.int64)
+        start = 0
+        for chunk in chunks:
+            codes, lengths = _char_codes(chunk)
+            indptr, k = _trigram_keys(codes, lengths, self._char_map)
+            ptrs.append(indptr[1:] + (ptrs[-1][-1] if ptrs else 0))
+            keys.append(k)
+            self.lengths[start:start + len(chunk)] = lengths
+            start += len(chunk)
+        self._entry_ptr = np.r_[0, np.concatenate(ptrs)] if ptrs else np.zeros(1, np.int64)
+        self._entry_keys = np.concatenate(keys) if keys else np.zeros(0, np.int64)
+
+        # postings: key -> entries holding it, shortest entries first (a length range is a slice)
+        owner = np.repeat(np.arange(len(self.entries)), np.diff(self._entry_ptr))
+        order = np.lexsort((self.lengths[owner], self._entry_keys))
+        sorted_keys = self._entry_keys[order]
+        first = np.r_[True, sorted_keys[1:] != sorted_keys[:-1]] if len(sorted_keys) else np.zeros(0, bool)
+        self._vocab = sorted_keys[first]
+        self._post_ptr = np.r_[np.flatnonzero(first), len(sorted_keys)]
+        self._postings = owner[order]
+        self._post_len = self.lengths[self._postings]
+        # entries by length, for the fallback scan
+        self._by_length = np.argsort(self.lengths, kind="stable")
+        self._sorted_lengths = self.lengths[self._by_length]
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _length_range(self, la: int) -> Tuple[int, int]:
+        t = self.threshold
+        return math.ceil(t * la / (2 - t) - 1e-9), math.floor(la * (2 - t) / t + 1e-9)
+
+    def _min_shared(self, la: int, lb: np.ndarray) -> np.ndarray:
+        total = la + lb
+        max_indels = total - 2 * np.ceil(self.threshold * total / 2 - 1e-9).astype(np.int64)
+        return np.maximum(la, lb) + 2 - 3 * max_indels
+
+    def _candidates(self, query: str, q_keys: np.ndarray) -> np.ndarray:
+        la = len(query)
+        lo, hi = self._length_range(la)
+        lb = np.arange(lo, hi + 1)
+        need_min = int(self._min_shared(la, lb).min()) if len(lb) else 1
+        if need_min <= 0:
+            a, b = np.searchsorted(self._sorted_lengths, [lo, hi + 1])
+            return np.sort(self._by_length[a:b])
+
+        pos = np.searchsorted(self._vocab, q_keys)
+        known = pos < len(self._vocab)
+        known[known] = self._vocab[pos[known]] == q_keys[known]
+        # postings slice of each known trigram restricted to the length range
+        slices = []
+        for p in pos[known]:
+            s, e = self._post_ptr[p], self._post_ptr[p + 1]
+            lens = self._post_len[s:e]
+            slices.append((s + np.searchsorted(lens, lo), s + np.searchsorted(lens, hi, side="right")))
+        slices.extend([(0, 0)] * int((~known).sum()))  # unknown trigrams: empty postings
+        sizes = np.array([e - s for s, e in slices])
+        n_read = min(len(q_keys), len(q_keys) - need_min + 1 + _EXTRA_POSTINGS)
+        rarest = np.argsort(sizes, kind="stable")[:n_read]
+        parts = [self._postings[slices[i][0]:slices[i][1]] for i in rarest if sizes[i]]
+        if not parts:
+            return np.zeros(0, dtype=np.int64)
+        hits = np.sort(np.concatenate(parts))
+        first = np.flatnonzero(np.r_[True, hits[1:] != hits[:-1]])
+        cand, count = hits[first], np.diff(np.r_[first, len(hits)])
+        # at most len(q_keys) - n_read of the shared trigrams lie outside the postings read
+        cand = cand[count >= self._min_shared(la, self.lengths[cand]) - (len(q_keys) - n_read)]
+        if not len(cand):
+            return cand
+
+        # shared multiset trigrams per candidate
+        lengths = self._entry_ptr[cand + 1] - self._entry_ptr[cand]
+        owner = np.repeat(np.arange(len(cand)), lengths)
+        offsets = np.repeat(self._entry_ptr[cand] - np.r_[0, np.cumsum(lengths)[:-1]], lengths)
+        cand_keys = self._entry_keys[offsets + np.arange(lengths.sum())]
+        at = np.minimum(np.searchsorted(q_keys, cand_keys), len(q_keys) - 1)
+        shared = np.bincount(owner, weights=q_keys[at] == cand_keys, minlength=len(cand))
+        return cand[shared >= self._min_shared(la, self.lengths[cand])]
+
+    def best_matches(self, names: Sequence) -> Tuple[np.ndarray, np.ndarray]:
+        """(score, watchlist row position) of each name's best match at or above the threshold; (0.0, -1) if none."""
+        names = list(names)
+        scores = np.zeros(len(names))
+        rows = np.full(len(names), -1, dtype=np.int64)
+        queries = {}
+        for i, name in enumerate(names):
+            if isinstance(name, str) and name.strip() and len(self):
+                queries.setdefault(name.lower().strip(), []).append(i)
+        if not queries:
+            return scores, rows
+
+        uniq = list(queries)
+        codes, lengths = _char_codes(uniq)
+        q_ptr, q_keys = _trigram_keys(codes, lengths, self._char_map)
+        for j, query in enumerate(uniq):
+            best, best_entry = 0.0, -1
+            for e in self._candidates(query, np.sort(q_keys[q_ptr[j]:q_ptr[j + 1]])):
+                score = SequenceMatcher(None, query, self.entries[e]).ratio()
+                if score > best:  # candidates in scan order: the first best entry wins, as in a full scan
+                    best, best_entry = score, e
+            if best_entry >= 0 and best >= self.threshold:
+                scores[queries[query]] = best
+                rows[queries[query]] = self.entry_row[best_entry]
+        return scores, rows
+
+
+# -------------------------------------------------------------------
+# Cached, parallel screening
+# -------------------------------------------------------------------
+
+_WORKER_INDEX: WatchlistIndex | None = None
+
+
+def _init_worker(watchlist: pd.DataFrame, threshold: float) -> None:
+    global _WORKER_INDEX
+    _WORKER_INDEX = WatchlistIndex(watchlist, threshold=threshold)
+
+
+def _screen_chunk(names: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    return _WORKER_INDEX.best_matches(names)
+
+
+def normalize_name(name: Any) -> str | None:
+    """Screening key of a client name, or None if there is nothing to screen."""
+    if not isinstance(name, str) or not name.strip():
+        return None
+    return name.lower().strip()
+
+
+def watchlist_row_keys(watchlist: pd.DataFrame) -> np.ndarray:
+    """Content hash per watchlist row: an edited row counts as removed + added."""
+    return pd.util.hash_pandas_object(watchlist, index=False).to_numpy()
+
+
+def watchlist_version(row_keys: np.ndarray, threshold: float) -> str:
+    h = hashlib.sha256(repr(threshold).encode())
+    h.update(np.ascontiguousarray(row_keys, dtype=np.uint64).tobytes())
+    return h.hexdigest()[:16]
+
+
+def screen_parallel(names: Sequence[str], watchlist: pd.DataFrame, threshold: float,
+                    workers: int = 1, chunk_size: int = 2000) -> Tuple[np.ndarray, np.ndarray]:
+    """`WatchlistIndex.best_matches` over `names` in chunks across a process pool (each worker builds the index once)."""
+    names = list(names)
+    chunks = [names[i:i + chunk_size] for i in range(0, len(names), chunk_size)]
+    if workers <= 1 or len(chunks) <= 1:
+        return WatchlistIndex(watchlist, threshold=threshold).best_matches(names)
+    cols = [c for c in WATCHLIST_NAME_COLUMNS if c in watchlist.columns]
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), initializer=_init_worker,
+                             initargs=(watchlist[cols], threshold)) as ex:
+        results = list(ex.map(_screen_chunk, chunks))
+    return np.concatenate([s for s, _ in results]), np.concatenate([r for _, r in results])
+
+
+class ScreeningCache:
+    """On-disk screening results keyed by (normalized name, watchlist version).
+
+    `results.parquet` holds one row per name: the version and threshold it was
+    screened against, the best score and the content key of the matched
+    watchlist row (0 if none). `versions/<version>.npy` keeps each referenced version's row
+    keys in order, which is what the delta against the current watchlist is
+    computed from.
+    """
+
+    def __init__(self, cache_dir: str | Path):
+        self.cache_dir = Path(cache_dir)
+        self._results_path = self.cache_dir / "results.parquet"
+
+    def load(self) -> pd.DataFrame:
+        if not self._results_path.exists():
+            return pd.DataFrame({"name": pd.Series(dtype=object), "version": pd.Series(dtype=object),
+                                 "threshold": pd.Series(dtype=float), "score": pd.Series(dtype=float),
+                                 "row_key": pd.Series(dtype=np.uint64)})
+        return pd.read_parquet(self._results_path)
+
+    def version_keys(self, version: str) -> np.ndarray | None:
+        path = self.cache_dir / "versions" / f"{version}.npy"
+        return np.load(path) if path.exists() else None
+
+    def save(self, results: pd.DataFrame, version: str, row_keys: np.ndarray) -> None:
+        versions = self.cache_dir / "versions"
+        versions.mkdir(parents=True, exist_ok=True)
+        np.save(versions / f"{version}.npy", row_keys)
+        tmp = self._results_path.with_suffix(".tmp")
+        results.to_parquet(tmp, index=False)
+        tmp.replace(self._results_path)  # atomic: a crash never leaves a half-written cache
+        for path in versions.glob("*.npy"):
+            if path.stem not in set(results["version"]):
+                path.unlink()
+
+
+def _delta_rescreen(names: list, cached: pd.DataFrame, old_keys: np.ndarray, watchlist: pd.DataFrame,
+                    row_keys: np.ndarray, threshold: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Update results cached against an older watchlist version by screening only the rows added since.
+
+    Returns (ok, score, row) per name; `ok` is False where the delta is not
+    enough (the cached best row was removed or edited, or surviving rows were
+    reordered, which could change scan-order tie-breaks).
+    """
+    n = len(names)
+    first_pos = pd.Series(np.arange(len(row_keys))).groupby(row_keys).min()
+    surviving = first_pos.reindex(pd.unique(old_keys)).dropna().to_numpy()
+    if (np.diff(surviving) < 0).any():
+        return np.zeros(n, bool), np.zeros(n), np.full(n, -1, dtype=np.int64)
+
+    cached_key = cached["row_key"].to_numpy()
+    cached_pos = first_pos.reindex(cached_key).to_numpy()
+    ok = (cached_key == 0) | ~np.isnan(cached_pos)
+    score = np.where(cached_key == 0, 0.0, cached["score"].to_numpy())
+    row = np.where(cached_key == 0, -1, np.nan_to_num(cached_pos, nan=-1)).astype(np.int64)
+
+    added = np.flatnonzero(~np.isin(row_keys, old_keys))
+    if len(added) and ok.any():
+        todo = np.flatnonzero(ok)
+        s, r = WatchlistIndex(watchlist.iloc[added], threshold=threshold).best_matches([names[i] for i in todo])
+        r = np.where(r >= 0, added[np.maximum(r, 0)], -1)
+        # higher score wins; on a tie the row earlier in the current watchlist, as in a full scan
+        better = (r >= 0) & ((s > score[todo]) | ((s == score[todo]) & ((row[todo] < 0) | (r < row[todo]))))
+        score[todo[better]], row[todo[better]] = s[better], r[better]
+    return ok, score, row
+
+
+def screen_names(names: Sequence, watchlist: pd.DataFrame, threshold: float = 0.88,
+                 cache_dir: str | Path | None = None, workers: int = 1,
+                 chunk_size: int = 2000) -> Tuple[np.ndarray, np.ndarray, Dict[str, int]]:
+    """(score, row position, stats) per name, as `WatchlistIndex.best_matches`, reusing cached results.
+
+    Names already screened against this watchlist version come from the
+    cache; names screened against an older version (same threshold) are
+    re-screened against the rows added since; only new or renamed clients,
+    and names whose cached match was removed, get a full screen, in parallel.
+    """
+    keys = [normalize_name(nm) for nm in names]
+    uniq = list(dict.fromkeys(k for k in keys if k is not None))
+    score = pd.Series(0.0, index=pd.Index(uniq, dtype=object))
+    row = pd.Series(-1, index=score.index, dtype=np.int64)
+    stats = {"cached": 0, "delta": 0, "screened": 0}
+
+    row_keys = watchlist_row_keys(watchlist)
+    version = watchlist_version(row_keys, threshold)
+    cache = ScreeningCache(cache_dir) if cache_dir is not None else None
+    stored = cache.load() if cache is not None else None
+    prior = stored[stored["name"].isin(uniq) & (stored["threshold"] == threshold)] if stored is not None else None
+    seen = set(prior["name"]) if prior is not None else set()
+    todo = [k for k in uniq if k not in seen]
+
+    if prior is not None:
+        for old_version, grp in prior.groupby("version", sort=False):
+            old_keys = row_keys if old_version == version else cache.version_keys(old_version)
+            if old_keys is None:
+                todo.extend(grp["name"])
+                continue
+            ok, s, r = _delta_rescreen(grp["name"].tolist(), grp, old_keys, watchlist, row_keys, threshold)
+            stats["cached" if old_version == version else "delta"] += int(ok.sum())
+            score.loc[grp["name"][ok]] = s[ok]
+            row.loc[grp["name"][ok]] = r[ok]
+            todo.extend(grp["name"][~ok])
+
+    if todo:
+        s, r = screen_parallel(todo, watchlist, threshold, workers=workers, chunk_size=chunk_size)
+        score.loc[todo], row.loc[todo] = s, r
+        stats["screened"] = len(todo)
+
+    if cache is not None:
+        r = row.to_numpy()
+        fresh = pd.DataFrame({
+            "name": uniq, "version": version, "threshold": threshold, "score": score.to_numpy(),
+            "row_key": np.where(r >= 0, row_keys[np.maximum(r, 0)], 0).astype(np.uint64),
+        })
+        # names absent from this run are kept: a returning client is still only a delta re-screen
+        kept = stored[~stored["name"].isin(uniq)]
+        cache.save(pd.concat([kept, fresh], ignore_index=True) if len(kept) else fresh, version, row_keys)
+
+    lookup = pd.Index(keys, dtype=object)
+    return (score.reindex(lookup).fillna(0.0).to_numpy(),
+            row.reindex(lookup).fillna(-1).to_numpy(dtype=np.int64), stats)